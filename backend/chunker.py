@@ -1,11 +1,11 @@
-def chunk_text(text, chunk_size=500):
 from typing import List, Dict
-import re
+import re, hashlib, zlib
 import tiktoken
 from .config import CHUNK_TOKENS, CHUNK_OVERLAP
 
 MD_SPLIT = re.compile(r"(^|\n)#{1,6}\s|```", re.MULTILINE)
 _enc = tiktoken.get_encoding("cl100k_base")
+_CDC_SCALE = 1 << 32
 
 def _tok_count(text: str) -> int:
     return len(_enc.encode(text))
@@ -18,6 +18,55 @@ def _window(text: str, max_tokens: int, overlap: int) -> List[str]:
         out.append(_enc.decode(ids[start:start+max_tokens]))
     return out
 
+def _content_split(text: str, max_tokens: int, overlap: int) -> List[str]:
+    """
+    Split at content-defined line boundaries (hash of the line and the two before it),
+    so an insertion only reshapes nearby chunks instead of shifting every window after it.
+    Each chunk after the first carries the previous chunk's trailing lines as overlap.
+    """
+    lines = text.splitlines(keepends=True)
+    counts = [_tok_count(l) for l in lines]
+    limit = max(1, max_tokens - overlap)
+    min_tokens, target = max(1, limit // 8), max(1, limit // 3)
+    pieces, cur, cur_tokens = [], [], 0
+    for i, n in enumerate(counts):
+        if n > limit:
+            if cur:
+                pieces.append(cur)
+            pieces.append([i])
+            cur, cur_tokens = [], 0
+            continue
+        if cur and cur_tokens + n > limit:
+            pieces.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+        window = "".join(lines[max(0, i - 2):i + 1]).encode("utf-8")
+        if cur_tokens >= min_tokens and zlib.crc32(window) * target < n * _CDC_SCALE:
+            pieces.append(cur)
+            cur, cur_tokens = [], 0
+    if cur:
+        pieces.append(cur)
+
+    out, prev = [], []
+    for piece in pieces:
+        if len(piece) == 1 and counts[piece[0]] > limit:
+            out.extend(_window(lines[piece[0]], max_tokens, overlap))
+            prev = []
+            continue
+        lead, budget = [], overlap
+        for j in reversed(prev):
+            if counts[j] > budget:
+                break
+            lead.insert(0, j)
+            budget -= counts[j]
+        out.append("".join(lines[j] for j in lead + piece))
+        prev = piece
+    return out
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
 def smart_chunk(doc: Dict) -> List[Dict]:
     path, text = doc["path"], doc["text"]
     # split by md sections / code fences first
@@ -25,16 +74,20 @@ def smart_chunk(doc: Dict) -> List[Dict]:
     if not segments:
         segments = [text]
 
-    chunks = []
-    idx = 0
+    pieces = []
     for seg in segments:
         if _tok_count(seg) <= CHUNK_TOKENS:
-            chunks.append({"key": f"{path}:{idx}", "path": path, "idx": idx, "text": seg})
-            idx += 1
+            pieces.append(seg)
         else:
-            for w in _window(seg, CHUNK_TOKENS, CHUNK_OVERLAP):
-                chunks.append({"key": f"{path}:{idx}", "path": path, "idx": idx, "text": w})
-                idx += 1
+            pieces.extend(_content_split(seg, CHUNK_TOKENS, CHUNK_OVERLAP))
+
+    # keys are content hashes (plus an occurrence suffix for repeats), not positions
+    chunks, seen = [], {}
+    for idx, piece in enumerate(pieces):
+        h = chunk_hash(piece)
+        n = seen[h] = seen.get(h, 0) + 1
+        key = f"{path}:{h[:16]}" if n == 1 else f"{path}:{h[:16]}#{n}"
+        chunks.append({"key": key, "hash": h, "path": path, "idx": idx, "text": piece})
     return chunks
 
 def chunk_docs(docs: List[Dict]) -> List[Dict]:
@@ -8,9 +8,25 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 EMBED_MODEL    = os.getenv("EMBED_MODEL", "models/text-embedding-004")     # 768d
 GEN_MODEL      = os.getenv("GEN_MODEL", "models/gemini-1.5-flash")         # fast; or 1.5-pro
 
+# Embedding backend: "gemini" (remote) or "local" (CPU hashed n-grams, no network)
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "gemini")
+LOCAL_EMBED_DIM = int(os.getenv("LOCAL_EMBED_DIM", "384"))
+
 # GitHub (recommended to avoid rate limits)
 GITHUB_TOKEN   = os.getenv("GITHUB_TOKEN", "")
 
+# Source: "github" (REST API) or "local" (git mirrors under GIT_MIRROR_ROOT/<owner>/<name>[.git])
+SOURCE_BACKEND = os.getenv("SOURCE_BACKEND", "github")
+GIT_MIRROR_ROOT = os.getenv("GIT_MIRROR_ROOT", "/srv/git-mirrors")
+
+# File filtering: vendored/generated/lockfiles/minified content is skipped before chunking.
+# INDEX_INCLUDE / INDEX_EXCLUDE: comma-separated globs; INDEX_FILTERS_FILE: JSON {"owner/name": {"include": [], "exclude": []}}
+INDEX_SKIP_GENERATED = os.getenv("INDEX_SKIP_GENERATED", "1") == "1"
+INDEX_INCLUDE  = [g for g in os.getenv("INDEX_INCLUDE", "").split(",") if g.strip()]
+INDEX_EXCLUDE  = [g for g in os.getenv("INDEX_EXCLUDE", "").split(",") if g.strip()]
+INDEX_FILTERS_FILE = os.getenv("INDEX_FILTERS_FILE", "")
+INDEX_MAX_JSON_BYTES = int(os.getenv("INDEX_MAX_JSON_BYTES", "65536"))
+
 # Indexing
 CHUNK_TOKENS   = int(os.getenv("CHUNK_TOKENS", "800"))
 CHUNK_OVERLAP  = int(os.getenv("CHUNK_OVERLAP", "200"))
@@ -23,3 +39,15 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 # HTTP timeouts
 HTTP_TIMEOUT   = float(os.getenv("HTTP_TIMEOUT", "30"))
+EMBED_CONNECT_TIMEOUT = float(os.getenv("EMBED_CONNECT_TIMEOUT", "3"))
+EMBED_READ_TIMEOUT    = float(os.getenv("EMBED_READ_TIMEOUT", "15"))
+GEN_CONNECT_TIMEOUT   = float(os.getenv("GEN_CONNECT_TIMEOUT", "5"))
+GEN_READ_TIMEOUT      = float(os.getenv("GEN_READ_TIMEOUT", "60"))
+
+# Pooled HTTP session shared by embedding/generation calls and the crawler
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+
+# Crawler: parallel file fetches, paced against GitHub's X-RateLimit-* budget
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "8"))
+RATE_LIMIT_RESERVE = int(os.getenv("RATE_LIMIT_RESERVE", "50"))      # requests left untouched for other clients
+RATE_LIMIT_LOW_WATER = int(os.getenv("RATE_LIMIT_LOW_WATER", "500"))  # below this, spread requests until reset
@@ -1,9 +1,8 @@
-def embed_text(text):
 from typing import List
-import time
-import requests
+import math, re, time, zlib
 import numpy as np
-from .config import GEMINI_API_KEY, EMBED_MODEL, HTTP_TIMEOUT
+from .config import GEMINI_API_KEY, EMBED_MODEL, EMBED_CONNECT_TIMEOUT, EMBED_READ_TIMEOUT, EMBED_PROVIDER, LOCAL_EMBED_DIM
+from .utils import http_session
 
 EMBED_URL = f"https://generativelanguage.googleapis.com/v1/{EMBED_MODEL}:batchEmbedContents?key={GEMINI_API_KEY}"
 
@@ -17,13 +16,30 @@ def _batch_payload(texts: List[str]):
     }
 
 def _embed_batch(texts: List[str]) -> np.ndarray:
-    r = requests.post(EMBED_URL, json=_batch_payload(texts), timeout=HTTP_TIMEOUT)
+    r = http_session().post(EMBED_URL, json=_batch_payload(texts), timeout=(EMBED_CONNECT_TIMEOUT, EMBED_READ_TIMEOUT))
     r.raise_for_status()
     data = r.json()  # { responses: [{embedding:{values:[..]}} ...] }
     vecs = [resp["embedding"]["values"] for resp in data["responses"]]
     return np.asarray(vecs, dtype="float32")
 
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]*|[0-9]+")
+
+def _local_embed(texts: List[str], dim: int = LOCAL_EMBED_DIM) -> np.ndarray:
+    """Offline embedding: word + bigram features hashed into signed buckets, sublinear TF, L2-normalised."""
+    V = np.zeros((len(texts), dim), dtype="float32")
+    for r, text in enumerate(texts):
+        words = [w.lower() for w in _WORD.findall(text)]
+        counts = {}
+        for f in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            counts[f] = counts.get(f, 0) + 1
+        for f, c in counts.items():
+            h = zlib.crc32(f.encode("utf-8"))
+            V[r, h % dim] += (1.0 if (h >> 31) & 1 else -1.0) * (1.0 + math.log(c))
+    return V / (np.linalg.norm(V, axis=1, keepdims=True) + 1e-12)
+
 def embed_texts(texts: List[str], batch_size: int = 48, max_retries: int = 5) -> np.ndarray:
+    if EMBED_PROVIDER == "local":
+        return _local_embed(texts)
     out = []
     for i in range(0, len(texts), batch_size):
         batch = texts[i:i+batch_size]
@@ -34,7 +50,7 @@ def embed_texts(texts: List[str], batch_size: int = 48, max_retries: int = 5) ->
             except Exception as e:
                 if attempt == max_retries - 1:
                     raise
-                time.sleep(1.2 * (attempt + 1))
+                time.sleep(min(8.0, 0.5 * 2 ** attempt))
     return np.vstack(out)
 
 def embed_query(text: str) -> np.ndarray:
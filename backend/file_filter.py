@@ -0,0 +1,232 @@
+"""Decides which repo files are worth chunking and embedding (same rules as backend_fastapi; its
+tests/test_file_filter.py checks that this copy stays in sync).
+
+Two passes, both recorded in a ``SkipReport``:
+
+- by path, before fetching: per-repo include/exclude globs, ``.gitattributes``
+  ``linguist-generated`` / ``linguist-vendored``, vendor directories, lockfiles and
+  generated-code suffixes;
+- by content, after fetching: binary data, "generated" header markers, minified
+  or high-entropy text (long lines, base64 blobs) and oversized JSON fixtures.
+"""
+import fnmatch
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import (CHUNK_TOKENS, INDEX_EXCLUDE, INDEX_FILTERS_FILE, INDEX_INCLUDE, INDEX_MAX_JSON_BYTES,
+                     INDEX_SKIP_GENERATED)
+
+VENDOR_DIRS = {
+    "node_modules", "vendor", "vendors", "third_party", "third-party", "bower_components", "jspm_packages",
+    "site-packages", ".venv", "venv", "Pods", "Carthage", "dist", "build", "out", ".next", ".nuxt",
+    "__pycache__", ".git", ".tox", ".mypy_cache", "coverage", "target",
+}
+LOCKFILES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb", "poetry.lock",
+    "Pipfile.lock", "pdm.lock", "uv.lock", "Cargo.lock", "composer.lock", "Gemfile.lock", "go.sum",
+    "mix.lock", "pubspec.lock", "Podfile.lock", "packages.lock.json", "flake.lock",
+}
+GENERATED_GLOBS = (
+    "*.min.js", "*.min.css", "*.min.mjs", "*-min.js", "*.bundle.js", "*.chunk.js", "*.map",
+    "*_pb2.py", "*_pb2_grpc.py", "*_pb2.pyi", "*.pb.go", "*.pb.cc", "*.pb.h", "*.pb.swift", "*_pb.js", "*_pb.d.ts",
+    "*.g.dart", "*.freezed.dart", "*.designer.cs", "*.generated.*", "*_generated.*",
+)
+BINARY_EXTS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".pdf", ".zip", ".gz", ".tgz", ".bz2", ".xz",
+    ".7z", ".jar", ".war", ".class", ".so", ".dll", ".dylib", ".exe", ".bin", ".o", ".a", ".pyc", ".whl",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot", ".mp3", ".mp4", ".mov", ".avi", ".wav", ".ogg", ".psd",
+    ".sqlite", ".db", ".parquet", ".npy", ".npz", ".pkl", ".onnx", ".pt",
+}
+_GENERATED_MARKER = re.compile(
+    r"(code generated .* do not edit|@generated|auto-?generated|generated by (the )?protoc|do not edit[.!]? this file)",
+    re.IGNORECASE,
+)
+
+MINIFIED_MAX_LINE = 1000      # any line longer than this in a file with few lines
+MINIFIED_AVG_LINE = 300       # or an average line length above this
+HIGH_ENTROPY_BITS = 5.5       # per character, e.g. base64/hex payloads
+CONTENT_CHECK_MIN_BYTES = 2048  # heuristics only run on files at least this large
+
+
+def _glob_match(pattern: str, path: str) -> bool:
+    """gitignore-flavoured glob: no slash matches the basename anywhere, ``dir/`` matches below dir."""
+    pattern = pattern.strip()
+    if pattern.endswith("/"):
+        d = pattern.strip("/")
+        if "/" in d:
+            return path.startswith(d + "/")
+        return f"/{d}/" in f"/{path}"
+    if "/" not in pattern:
+        return fnmatch.fnmatchcase(os.path.basename(path), pattern)
+    pattern = pattern.lstrip("/")
+    if fnmatch.fnmatchcase(path, pattern):
+        return True
+    # "a/**/b" also matches "a/b"
+    return "**/" in pattern and fnmatch.fnmatchcase(path, pattern.replace("**/", ""))
+
+
+def parse_gitattributes(text: str) -> List[Tuple[str, str, bool]]:
+    """(pattern, attribute, value) for linguist-generated / linguist-vendored lines; later lines win."""
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        pattern, attrs = parts[0], parts[1:]
+        for attr in attrs:
+            name, value = attr, True
+            if name.startswith("-") or name.startswith("!"):
+                name, value = name[1:], False
+            elif "=" in name:
+                name, raw = name.split("=", 1)
+                value = raw.lower() not in ("false", "0")
+            if name in ("linguist-generated", "linguist-vendored"):
+                rules.append((pattern, name.split("-", 1)[1], value))
+    return rules
+
+
+def _entropy(text: str) -> float:
+    counts = Counter(text)
+    n = len(text)
+    return -sum(c / n * math.log2(c / n) for c in counts.values())
+
+
+def estimate_chunks(nbytes: int) -> int:
+    """Chunks a file of this size would have produced (~4 bytes per token)."""
+    return max(1, math.ceil(nbytes / (4 * max(1, CHUNK_TOKENS)))) if nbytes else 0
+
+
+class SkipReport:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.by_reason: Dict[str, Dict[str, int]] = {}
+        self.examples: Dict[str, List[str]] = {}
+
+    def add(self, path: str, reason: str, nbytes: int):
+        est = estimate_chunks(nbytes)
+        self.files += 1
+        self.bytes += nbytes
+        self.chunks += est
+        r = self.by_reason.setdefault(reason, {"files": 0, "bytes": 0, "chunks": 0})
+        r["files"] += 1
+        r["bytes"] += nbytes
+        r["chunks"] += est
+        ex = self.examples.setdefault(reason, [])
+        if len(ex) < 5:
+            ex.append(path)
+
+    def as_dict(self) -> Dict:
+        return {"files": self.files, "bytes": self.bytes, "chunks_estimated": self.chunks,
+                "by_reason": self.by_reason, "examples": self.examples}
+
+
+def _load_repo_filters(path: str = INDEX_FILTERS_FILE) -> Dict[str, Dict[str, List[str]]]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FileFilter:
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = (), gitattributes: str = "",
+                 skip_generated: bool = INDEX_SKIP_GENERATED, max_json_bytes: int = INDEX_MAX_JSON_BYTES):
+        self.include = [p for p in include if p]
+        self.exclude = [p for p in exclude if p]
+        self.attr_rules = parse_gitattributes(gitattributes) if gitattributes else []
+        self.skip_generated = skip_generated
+        self.max_json_bytes = max_json_bytes
+
+    @classmethod
+    def for_repo(cls, repo: str, gitattributes: str = "") -> "FileFilter":
+        """Global INDEX_INCLUDE/INDEX_EXCLUDE plus the repo's entry (or "*") in INDEX_FILTERS_FILE."""
+        per_repo = _load_repo_filters()
+        conf = per_repo.get(repo) or per_repo.get("*") or {}
+        return cls(include=list(INDEX_INCLUDE) + conf.get("include", []),
+                   exclude=list(INDEX_EXCLUDE) + conf.get("exclude", []),
+                   gitattributes=gitattributes)
+
+    def fingerprint(self) -> str:
+        """Changes whenever the rules do, so a rule change can force a full rebuild."""
+        blob = json.dumps([self.include, self.exclude, self.attr_rules, self.skip_generated, self.max_json_bytes])
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+    def _linguist(self, path: str) -> Dict[str, bool]:
+        """Effective linguist-generated / linguist-vendored values for a path (absent: unset)."""
+        verdict: Dict[str, bool] = {}
+        for pattern, kind, value in self.attr_rules:
+            if _glob_match(pattern, path):
+                verdict[kind] = value
+        return verdict
+
+    def path_reason(self, path: str) -> Optional[str]:
+        """Why a path is skipped without fetching it, or None to keep it."""
+        if self.include and not any(_glob_match(p, path) for p in self.include):
+            return "not-included"
+        if any(_glob_match(p, path) for p in self.exclude):
+            return "excluded"
+        attrs = self._linguist(path)
+        for kind in ("generated", "vendored"):
+            if attrs.get(kind):
+                return f"gitattributes-{kind}"
+        parts = path.split("/")
+        name = parts[-1]
+        if os.path.splitext(name)[1].lower() in BINARY_EXTS:
+            return "binary"
+        if not self.skip_generated:
+            return None
+        # an explicit linguist-vendored=false / linguist-generated=false overrides the built-in lists
+        if attrs.get("vendored", True) and any(p in VENDOR_DIRS for p in parts[:-1]):
+            return "vendored"
+        if name in LOCKFILES:
+            return "lockfile"
+        if attrs.get("generated", True) and any(fnmatch.fnmatchcase(name, g) for g in GENERATED_GLOBS):
+            return "generated"
+        return None
+
+    def content_reason(self, path: str, text: str) -> Optional[str]:
+        """Why fetched content is skipped, or None to index it."""
+        if "\x00" in text[:8192]:
+            return "binary"
+        if not self.skip_generated or self._linguist(path).get("generated") is False:
+            return None
+        if path.lower().endswith(".json") and self.max_json_bytes and len(text) > self.max_json_bytes:
+            return "large-json"
+        head = "\n".join(text.splitlines()[:5])
+        if _GENERATED_MARKER.search(head):
+            return "generated"
+        if len(text) < CONTENT_CHECK_MIN_BYTES:
+            return None
+        lines = text.splitlines() or [text]
+        longest = max(len(line) for line in lines)
+        if (longest > MINIFIED_MAX_LINE and len(lines) < 50) or len(text) / len(lines) > MINIFIED_AVG_LINE:
+            return "minified"
+        sample = text[:65536]
+        # encoded payloads are dense: high symbol entropy and almost no spaces (prose and code have ~15%)
+        if sample.count(" ") < 0.03 * len(sample) and _entropy(sample) > HIGH_ENTROPY_BITS:
+            return "high-entropy"
+        return None
+
+    def select(self, files: List[Dict], report: SkipReport) -> List[Dict]:
+        keep = []
+        for f in files:
+            reason = self.path_reason(f["path"])
+            if reason:
+                report.add(f["path"], reason, int(f.get("size") or 0))
+            else:
+                keep.append(f)
+        return keep
+
+    def accept(self, path: str, text: str, report: SkipReport) -> bool:
+        reason = self.content_reason(path, text)
+        if reason:
+            report.add(path, reason, len(text.encode("utf-8", errors="ignore")))
+            return False
+        return True
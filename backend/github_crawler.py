@@ -1,7 +1,12 @@
 from typing import List, Dict, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 import os, json, time
 import requests
-from .config import GITHUB_TOKEN, DATA_DIR, HTTP_TIMEOUT
+from .config import GITHUB_TOKEN, DATA_DIR, HTTP_TIMEOUT, CRAWL_WORKERS
+from .utils import http_session, rate_budget
+from .file_filter import FileFilter, SkipReport
 
 API_HOST = "https://api.github.com"
 RAW_HOST = "https://raw.githubusercontent.com"
@@ -23,10 +28,41 @@ def _headers():
         h["Authorization"] = f"Bearer {GITHUB_TOKEN}"
     return h
 
-def _session():
-    s = requests.Session()
-    s.headers.update(_headers())
-    return s
+MAX_RATE_LIMIT_RETRIES = 3
+
+def _retry_at(r: requests.Response) -> Optional[float]:
+    """Epoch seconds to wait until if `r` is a rate-limit rejection, else None."""
+    if r.status_code not in (403, 429):
+        return None
+    retry_after = r.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return time.time() + float(retry_after)
+        except ValueError:
+            try:
+                return parsedate_to_datetime(retry_after).timestamp()
+            except (TypeError, ValueError):
+                pass
+    if r.headers.get("X-RateLimit-Remaining") == "0":
+        return float(r.headers.get("X-RateLimit-Reset", time.time() + 60))
+    return None  # a plain 403 (permissions), not a rate limit
+
+def _get(url: str, headers: Optional[Dict] = None) -> requests.Response:
+    """GET through the shared pooled session, paced by the per-host rate budget."""
+    host = urlsplit(url).netloc
+    budget = rate_budget()
+    h = _headers()
+    if headers:
+        h.update(headers)
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        budget.acquire(host)
+        r = http_session().get(url, headers=h, timeout=HTTP_TIMEOUT)
+        budget.update(host, r.headers)
+        until = _retry_at(r)
+        if until is None or attempt == MAX_RATE_LIMIT_RETRIES:
+            return r
+        budget.pause_until(host, until)
+    return r
 
 def _is_text(path: str) -> bool:
     p = path.lower()
@@ -36,16 +72,15 @@ def get_latest_commit(repo: str, default_branch_hint: str = "main") -> Tuple[str
     """
     Returns (branch, latest_sha). Tries 'main' then 'master'.
     """
-    s = _session()
     for branch in (default_branch_hint, "master"):
-        r = s.get(f"{API_HOST}/repos/{repo}/commits?sha={branch}&per_page=1", timeout=HTTP_TIMEOUT)
+        r = _get(f"{API_HOST}/repos/{repo}/commits?sha={branch}&per_page=1")
         if r.status_code == 200 and r.json():
             return branch, r.json()[0]["sha"]
     # fallback: repo main info
-    r = s.get(f"{API_HOST}/repos/{repo}", timeout=HTTP_TIMEOUT)
+    r = _get(f"{API_HOST}/repos/{repo}")
     r.raise_for_status()
     branch = r.json()["default_branch"]
-    r2 = s.get(f"{API_HOST}/repos/{repo}/commits?sha={branch}&per_page=1", timeout=HTTP_TIMEOUT)
+    r2 = _get(f"{API_HOST}/repos/{repo}/commits?sha={branch}&per_page=1")
     r2.raise_for_status()
     return branch, r2.json()[0]["sha"]
 
@@ -61,19 +96,17 @@ def save_state(repo: str, state: Dict):
         json.dump(state, f, ensure_ascii=False, indent=2)
 
 def list_tree(repo: str, branch: str) -> List[Dict]:
-    s = _session()
-    r = s.get(f"{API_HOST}/repos/{repo}/git/trees/{branch}?recursive=1", timeout=HTTP_TIMEOUT)
+    r = _get(f"{API_HOST}/repos/{repo}/git/trees/{branch}?recursive=1")
     if r.status_code != 200:
         # try other branch
         other = "master" if branch != "master" else "main"
-        r = s.get(f"{API_HOST}/repos/{repo}/git/trees/{other}?recursive=1", timeout=HTTP_TIMEOUT)
+        r = _get(f"{API_HOST}/repos/{repo}/git/trees/{other}?recursive=1")
     r.raise_for_status()
     return [t for t in r.json().get("tree", []) if t.get("type") == "blob" and _is_text(t["path"])]
 
 def compare_commits(repo: str, base: str, head: str) -> List[str]:
     """Return changed file paths between base...head."""
-    s = _session()
-    r = s.get(f"{API_HOST}/repos/{repo}/compare/{base}...{head}", timeout=HTTP_TIMEOUT)
+    r = _get(f"{API_HOST}/repos/{repo}/compare/{base}...{head}")
     if r.status_code == 404:
         # base is too old (gc), do full
         return []
@@ -84,16 +117,15 @@ def compare_commits(repo: str, base: str, head: str) -> List[str]:
 def fetch_raw(repo: str, path: str, branch: str, etag_cache: Dict) -> Tuple[str, Optional[str], Dict]:
     """
     Returns (path, text_or_none_if_not_modified, etag_cache_updated).
-    Uses ETag to avoid rate limit when unchanged (304).
+    Uses ETag to avoid rate limit when unchanged (304). Safe to call from several threads
+    sharing one etag_cache (each call only touches its own URL's entry).
     """
-    s = requests.Session()
-    s.headers.update(_headers())
     url = f"{RAW_HOST}/{repo}/{branch}/{path}"
     headers = {}
     if url in etag_cache:
         headers["If-None-Match"] = etag_cache[url]
 
-    r = s.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+    r = _get(url, headers=headers)
     if r.status_code == 304:
         return path, None, etag_cache
     if r.status_code != 200 or len(r.content) > MAX_FILE_BYTES:
@@ -103,35 +135,51 @@ def fetch_raw(repo: str, path: str, branch: str, etag_cache: Dict) -> Tuple[str,
     text = r.text
     return path, text, etag_cache
 
-def crawl_repo_incremental(repo: str) -> Tuple[List[Dict], str]:
+def fetch_gitattributes(repo: str, branch: str) -> str:
+    r = _get(f"{RAW_HOST}/{repo}/{branch}/.gitattributes")
+    return r.text if r.status_code == 200 else ""
+
+def crawl_repo_incremental(repo: str, report: Optional[SkipReport] = None) -> Tuple[List[Dict], str, Optional[set]]:
     """
-    Returns (changed_files_texts, new_head_sha).
+    Returns (changed_files_texts, new_head_sha, touched_paths).
     Each item: {"path": str, "text": str}
-    Uses commit diff + ETag to minimize work.
+    touched_paths is every changed or removed path whose chunks must be replaced, including
+    deleted, emptied and filtered-out files; None after a full listing (replace everything).
+    Uses commit diff + ETag to minimize work. Vendored/generated/minified files are
+    left out and counted in `report` when one is passed.
     """
     state = load_state(repo)
     branch, head_sha = get_latest_commit(repo)
     last_sha = state.get("last_sha")
     etags = state.get("etags", {})
 
-    changed_paths: List[str]
+    report = report if report is not None else SkipReport()
+    changed: List[Dict]
     if not last_sha:
         # First time: full listing
-        blobs = list_tree(repo, branch)
-        changed_paths = [b["path"] for b in blobs]
+        changed = list_tree(repo, branch)
     else:
-        changed_paths = compare_commits(repo, last_sha, head_sha)
-        if not changed_paths:
+        changed = [{"path": p} for p in compare_commits(repo, last_sha, head_sha)]
+        if not changed:
             # No change or compare unavailable -> maybe nothing to do
-            return [], head_sha
+            return [], head_sha, set()
+    ffilter = FileFilter.for_repo(repo, gitattributes=fetch_gitattributes(repo, branch))
+    changed_paths = [b["path"] for b in ffilter.select(changed, report)]
+
+    # Fetch in parallel over the shared session; results keep the listing order
+    with ThreadPoolExecutor(max_workers=max(1, CRAWL_WORKERS), thread_name_prefix="crawl") as pool:
+        results = list(pool.map(lambda p: fetch_raw(repo, p, branch, etags)[:2], changed_paths))
 
+    # files that are gone, empty or filtered out still lose their old chunks
+    touched = {b["path"] for b in changed} if last_sha else None
     out = []
-    for p in changed_paths:
-        path, text, etags = fetch_raw(repo, p, branch, etags)
+    for path, text in results:
         if text is None:
-            # not modified
+            # not modified: keep its chunks
+            if touched is not None:
+                touched.discard(path)
             continue
-        if text.strip() != "":
+        if text.strip() != "" and ffilter.accept(path, text, report):
             out.append({"path": path, "text": text})
 
     # persist new state
@@ -139,4 +187,4 @@ def crawl_repo_incremental(repo: str) -> Tuple[List[Dict], str]:
     state["etags"] = etags
     save_state(repo, state)
 
-    return out, head_sha
+    return out, head_sha, touched
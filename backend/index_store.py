@@ -1,5 +1,5 @@
 import os, json
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 import faiss
 from .config import DATA_DIR
@@ -35,7 +35,11 @@ def load_all(repo: str) -> Tuple[np.ndarray, List[Dict]]:
 def save_all(repo: str, V: np.ndarray, meta: List[Dict]) -> None:
     idx_path, meta_path, vec_path = _paths(repo)
     if V.size == 0:
-        # Nothing to save
+        # Every chunk is gone: drop the index so searches come back empty
+        for path in (idx_path, vec_path):
+            if os.path.exists(path):
+                os.remove(path)
+        open(meta_path, "w", encoding="utf-8").close()
         return
     Vn = _normalize(V.astype("float32"))
     dim = Vn.shape[1]
@@ -80,6 +84,34 @@ def upsert(repo: str, new_meta: List[Dict], new_vecs: np.ndarray) -> Tuple[int,
     save_all(repo, V, meta)
     return len(meta), updated
 
+def cached_vectors(repo: str, hashes: set) -> Dict[str, np.ndarray]:
+    """Stored vectors for chunks whose content hash is in `hashes`, so unchanged text is not re-embedded."""
+    V, meta = load_all(repo)
+    out = {}
+    for i, m in enumerate(meta):
+        h = m.get("hash")
+        if h in hashes and h not in out:
+            out[h] = V[i]
+    return out
+
+def replace_files(repo: str, paths: Optional[set], new_meta: List[Dict], new_vecs: np.ndarray) -> Tuple[int, int]:
+    """
+    Replace every chunk of `paths` (None: every path) with the new chunks, so deleted, emptied or
+    filtered-out files lose theirs; rebuild FAISS once, even when nothing is left.
+    Returns (total_chunks, removed_chunks)
+    """
+    V, meta = load_all(repo)
+    new_keys = {m["key"] for m in new_meta}
+    replaced = [paths is None or m["path"] in paths for m in meta]
+    keep = [i for i, r in enumerate(replaced) if not r]
+    removed = sum(1 for m, r in zip(meta, replaced) if r and m["key"] not in new_keys)
+    parts = [V[keep]] if keep else []
+    if len(new_meta):
+        parts.append(np.asarray(new_vecs, dtype="float32"))
+    merged = [meta[i] for i in keep] + list(new_meta)
+    save_all(repo, np.vstack(parts) if parts else np.empty((0, 0), dtype="float32"), merged)
+    return len(merged), removed
+
 def load_faiss(repo: str):
     idx_path, meta_path, vec_path = _paths(repo)
     if not (os.path.exists(idx_path) and os.path.exists(meta_path) and os.path.exists(vec_path)):
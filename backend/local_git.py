@@ -0,0 +1,90 @@
+from typing import List, Dict, Tuple, Optional
+import os, subprocess
+from .config import GIT_MIRROR_ROOT
+from .github_crawler import load_state, save_state, _is_text, MAX_FILE_BYTES
+from .file_filter import FileFilter, SkipReport
+
+def mirror_path(repo: str) -> str:
+    """`owner/name` -> `<root>/owner/name.git` (bare mirror) or `<root>/owner/name` (checkout)."""
+    for candidate in (os.path.join(GIT_MIRROR_ROOT, f"{repo}.git"), os.path.join(GIT_MIRROR_ROOT, repo)):
+        if os.path.isdir(candidate):
+            return candidate
+    raise FileNotFoundError(f"No local mirror for {repo} under {GIT_MIRROR_ROOT}")
+
+def _git(path: str, *args: str, input: Optional[bytes] = None) -> bytes:
+    return subprocess.run(["git", "-C", path, *args], input=input, capture_output=True, check=True).stdout
+
+def head_sha(path: str, branch_hint: str = "main") -> str:
+    for ref in (branch_hint, "master", "HEAD"):
+        try:
+            return _git(path, "rev-parse", "--verify", f"{ref}^{{commit}}").decode().strip()
+        except subprocess.CalledProcessError:
+            continue
+    raise ValueError(f"No commits in {path}")
+
+def list_blobs(path: str, sha: str) -> Dict[str, Tuple[str, int]]:
+    """path -> (blob sha, size) for every text blob in the commit's tree."""
+    out = {}
+    for line in _git(path, "ls-tree", "-r", "-l", "-z", sha).split(b"\0"):
+        if not line:
+            continue
+        meta, name = line.split(b"\t", 1)
+        _mode, kind, blob, size = meta.split()
+        p = name.decode("utf-8", errors="replace")
+        if kind == b"blob" and _is_text(p):
+            out[p] = (blob.decode(), int(size) if size != b"-" else 0)
+    return out
+
+def changed_paths(path: str, base: str, head: str) -> Optional[List[str]]:
+    """Paths touched between two commits (renames count as delete + add); None if base is unknown."""
+    try:
+        raw = _git(path, "diff", "--name-only", "--no-renames", "-z", base, head)
+    except subprocess.CalledProcessError:
+        return None
+    return [p for p in raw.decode("utf-8", errors="replace").split("\0") if p]
+
+def read_blobs(path: str, shas: List[str]) -> List[bytes]:
+    """Read many blobs through one `git cat-file --batch` process."""
+    if not shas:
+        return []
+    raw = _git(path, "cat-file", "--batch", input=("\n".join(shas) + "\n").encode())
+    out, pos = [], 0
+    for _ in shas:
+        nl = raw.index(b"\n", pos)
+        size = int(raw[pos:nl].split()[2])
+        out.append(raw[nl + 1:nl + 1 + size])
+        pos = nl + 1 + size + 1
+    return out
+
+def crawl_repo_local(repo: str, report: Optional[SkipReport] = None) -> Tuple[List[Dict], str, Optional[set]]:
+    """
+    Same contract as crawl_repo_incremental, but reads a local mirror:
+    changed files come from `git diff` against the last indexed SHA, contents from the object DB.
+    """
+    path = mirror_path(repo)
+    state = load_state(repo)
+    head = head_sha(path)
+    last_sha = state.get("last_sha")
+    if last_sha == head:
+        return [], head, set()
+
+    report = report if report is not None else SkipReport()
+    blobs = list_blobs(path, head)
+    try:
+        attrs = _git(path, "show", f"{head}:.gitattributes").decode("utf-8", errors="replace")
+    except subprocess.CalledProcessError:
+        attrs = ""
+    ffilter = FileFilter.for_repo(repo, gitattributes=attrs)
+    changed = changed_paths(path, last_sha, head) if last_sha else None
+    candidates = [{"path": p, "size": blobs[p][1]} for p in (changed if changed is not None else blobs) if p in blobs]
+    wanted = [f["path"] for f in ffilter.select(candidates, report) if f["size"] <= MAX_FILE_BYTES]
+    out = []
+    for p, data in zip(wanted, read_blobs(path, [blobs[p][0] for p in wanted])):
+        text = data.decode("utf-8", errors="replace")
+        if text.strip() and ffilter.accept(p, text, report):
+            out.append({"path": p, "text": text})
+
+    state["last_sha"] = head
+    save_state(repo, state)
+    # every diffed path, deleted and filtered ones included; None after a full listing
+    return out, head, set(changed) if changed is not None else None
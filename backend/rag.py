@@ -1,10 +1,14 @@
 from typing import List, Dict, Tuple
-import requests, textwrap, time, hashlib
-from .config import GEN_MODEL, TOP_K, GEMINI_API_KEY
+import textwrap, time, hashlib
+from .config import GEN_MODEL, TOP_K, GEMINI_API_KEY, GEN_CONNECT_TIMEOUT, GEN_READ_TIMEOUT, SOURCE_BACKEND
 from .github_crawler import crawl_repo_incremental
+from .local_git import crawl_repo_local
+from .file_filter import SkipReport
 from .chunker import chunk_docs
 from .embeddings import embed_texts, embed_query
-from .index_store import upsert, search
+from .index_store import cached_vectors, replace_files, search
+import numpy as np
+from .utils import http_session
 
 GEN_URL = "https://generativelanguage.googleapis.com/v1/models/{model}:generateContent?key={key}"
 
@@ -86,21 +90,32 @@ def index_repository(repo: str) -> Dict:
     """
     Incremental indexing:
     - Get changed files since last SHA (or full on first run)
-    - Chunk -> embed (batched) -> upsert into index
+    - Chunk -> embed only chunks whose text is new (batched) -> replace every touched file in the index
+      (deleted, emptied or filtered-out files just lose their chunks)
     """
-    changed_files, head_sha = crawl_repo_incremental(repo)
-    if not changed_files:
-        return {"repo": repo, "indexed": 0, "updated": 0, "head": head_sha, "note": "No changes"}
+    crawl = crawl_repo_local if SOURCE_BACKEND == "local" else crawl_repo_incremental
+    skipped = SkipReport()
+    changed_files, head_sha, touched = crawl(repo, report=skipped)
+    if not changed_files and touched is not None and not touched:
+        return {"repo": repo, "indexed": 0, "updated": 0, "head": head_sha, "note": "No changes",
+                "skipped": skipped.as_dict()}
 
     chunks = chunk_docs(changed_files)
-    texts = [c["text"] for c in chunks]
-    vecs  = embed_texts(texts)
+    # chunk keys are content hashes: only text not already in the index gets embedded
+    known = cached_vectors(repo, {c["hash"] for c in chunks})
+    todo = [c for c in chunks if c["hash"] not in known]
+    vecs = embed_texts([c["text"] for c in todo]) if todo else []
+    known.update(zip((c["hash"] for c in todo), np.asarray(vecs, dtype="float32")))
+    V = np.stack([known[c["hash"]] for c in chunks]) if chunks else np.empty((0, 0), dtype="float32")
 
     # minimal metadata
-    meta = [{"key": c["key"], "path": c["path"], "chunk_idx": c["idx"], "text": c["text"]} for c in chunks]
+    meta = [{"key": c["key"], "hash": c["hash"], "path": c["path"], "chunk_idx": c["idx"], "text": c["text"]} for c in chunks]
 
-    total, updated = upsert(repo, meta, vecs)
-    return {"repo": repo, "indexed": len(chunks), "updated": updated, "total": total, "head": head_sha}
+    # replace against every touched path, not just the fetched ones: deletions must drop their chunks
+    total, removed = replace_files(repo, touched, meta, V)
+    return {"repo": repo, "indexed": len(chunks), "updated": len(todo), "total": total, "head": head_sha,
+            "embedded": len(todo), "reused": len(chunks) - len(todo), "removed": removed,
+            "skipped": skipped.as_dict()}
 
 def _build_contents(question: str, contexts: List[Dict]) -> Dict:
     # Apply dedupe and per-path cap before packing
@@ -134,7 +149,7 @@ def answer_question(repo: str, question: str, top_k: int = TOP_K) -> Dict:
     last_err = None
     for attempt in range(3):
         try:
-            r = requests.post(url, json=payload, timeout=120)
+            r = http_session().post(url, json=payload, timeout=(GEN_CONNECT_TIMEOUT, GEN_READ_TIMEOUT))
             r.raise_for_status()
             data = r.json()
             # Safely extract text
@@ -153,7 +168,8 @@ def answer_question(repo: str, question: str, top_k: int = TOP_K) -> Dict:
             return {"answer": text, "citations": citations}
         except Exception as e:  # pragma: no cover
             last_err = e
-            time.sleep(1.2 * (attempt + 1))
+            if attempt < 2:
+                time.sleep(min(8.0, 0.5 * 2 ** attempt))
 
     # Fallback if all retries failed
     msg = f"Generation failed after retries: {last_err}"
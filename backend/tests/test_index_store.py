@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from backend import index_store
+
+
+def _chunk(path, i):
+    return {"key": f"{path}:{i}", "hash": f"{path}:{i}", "path": path, "chunk_idx": i, "text": f"{path} {i}"}
+
+
+class ReplaceFilesTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(index_store, "DATA_DIR", tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        meta = [_chunk("a.py", 0), _chunk("a.py", 1), _chunk("b.py", 0)]
+        index_store.save_all("acme/app", np.eye(3, 4, dtype="float32"), meta)
+
+    def test_paths_without_new_chunks_are_dropped(self):
+        # b.py was deleted: nothing new for it, but its chunk must go
+        total, removed = index_store.replace_files("acme/app", {"b.py"}, [], np.empty((0, 4), dtype="float32"))
+        self.assertEqual((total, removed), (2, 1))
+        _, meta = index_store.load_all("acme/app")
+        self.assertEqual({m["path"] for m in meta}, {"a.py"})
+        hits = index_store.search("acme/app", np.eye(1, 4, 2, dtype="float32")[0], 3)
+        self.assertNotIn("b.py", {h["path"] for h in hits})
+
+    def test_removing_every_chunk_still_saves(self):
+        total, removed = index_store.replace_files("acme/app", {"a.py", "b.py"}, [], np.empty((0, 4), dtype="float32"))
+        self.assertEqual((total, removed), (0, 3))
+        V, meta = index_store.load_all("acme/app")
+        self.assertEqual((V.size, meta), (0, []))
+        self.assertEqual(index_store.search("acme/app", np.ones(4, dtype="float32"), 3), [])
+
+    def test_deletion_only_change_is_indexed(self):
+        from backend import rag  # needs the full backend requirements (tiktoken)
+
+        crawl = mock.Mock(return_value=([], "c0ffee", {"b.py"}))
+        with mock.patch.object(rag, "crawl_repo_incremental", crawl), mock.patch.object(rag, "SOURCE_BACKEND", "github"):
+            res = rag.index_repository("acme/app")
+        self.assertNotIn("note", res)
+        self.assertEqual((res["removed"], res["total"]), (1, 2))
+        _, meta = index_store.load_all("acme/app")
+        self.assertEqual({m["path"] for m in meta}, {"a.py"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,95 @@
 import hashlib
+import threading
+import time
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from .config import HTTP_POOL_SIZE, RATE_LIMIT_RESERVE, RATE_LIMIT_LOW_WATER
+
+_session = None
+_session_lock = threading.Lock()
 
 def sha1_text(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8", errors="ignore")).hexdigest()
+
+def http_session() -> requests.Session:
+    """Process-wide keep-alive session; requests.Session is safe to share for plain GET/POST."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+class RateBudget:
+    """
+    Client-side pacing from X-RateLimit-Remaining / X-RateLimit-Reset response headers, per host.
+    Requests go out freely while the budget is healthy, are spread evenly over the time left
+    once it drops below `low_water`, and wait for the reset when only `reserve` is left.
+    Hosts that send no such headers (e.g. raw.githubusercontent.com) are never paced.
+    """
+    def __init__(self, reserve: int = RATE_LIMIT_RESERVE, low_water: int = RATE_LIMIT_LOW_WATER):
+        self.reserve = reserve
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._remaining: Dict[str, int] = {}
+        self._reset: Dict[str, float] = {}
+        self._next_at: Dict[str, float] = {}
+
+    def update(self, host: str, headers) -> None:
+        remaining, reset = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            self._remaining[host] = int(remaining)
+            self._reset[host] = float(reset)
+
+    def pause_until(self, host: str, when: float) -> None:
+        """Block every caller for `host` until `when` (epoch seconds), e.g. after a 403/429."""
+        with self._lock:
+            self._remaining[host] = 0
+            self._reset[host] = max(when, self._reset.get(host, 0.0))
+
+    def _delay(self, host: str, now: float) -> float:
+        remaining = self._remaining.get(host)
+        if remaining is None:
+            return 0.0
+        reset = self._reset.get(host, now)
+        available = remaining - self.reserve
+        if available <= 0:
+            if reset <= now:
+                # window rolled over; the next response will tell us the new budget
+                self._remaining.pop(host, None)
+                return 0.0
+            return reset - now + 1.0
+        self._remaining[host] = remaining - 1  # count our own request until headers confirm
+        if remaining >= self.low_water:
+            return 0.0
+        slot = max(self._next_at.get(host, now), now)
+        self._next_at[host] = slot + max(0.0, reset - now) / available
+        return slot - now
+
+    def acquire(self, host: str) -> None:
+        while True:
+            with self._lock:
+                delay = self._delay(host, time.time())
+            if delay <= 0:
+                return
+            time.sleep(min(delay, 60.0))
+            if delay <= 60.0:
+                return
+
+
+_budget: Optional[RateBudget] = None
+
+def rate_budget() -> RateBudget:
+    global _budget
+    if _budget is None:
+        with _session_lock:
+            if _budget is None:
+                _budget = RateBudget()
+    return _budget
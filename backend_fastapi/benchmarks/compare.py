@@ -0,0 +1,55 @@
+"""Diff two benchmark reports: python -m benchmarks.compare old.json new.json"""
+import json
+import sys
+from typing import Dict, Iterator, Tuple
+
+# (section, field) pairs worth tracking; lower is better for all of them
+TRACKED = [
+    ("chunking", "seconds"),
+    ("embedding", "seconds"),
+    ("indexing", "seconds"),
+    ("index_load", "seconds"),
+    ("search", "p50_ms"),
+    ("search", "p99_ms"),
+    ("ask", "p50_ms"),
+    ("ask", "p99_ms"),
+    ("index_e2e", "seconds"),
+]
+
+
+def _rows(old: Dict, new: Dict) -> Iterator[Tuple[int, str, float, float]]:
+    before = {r["target_chunks"]: r for r in old.get("results", [])}
+    for res in new.get("results", []):
+        base = before.get(res["target_chunks"])
+        if base is None:
+            continue
+        for section, field in TRACKED:
+            a = base.get(section, {}).get(field)
+            b = res.get(section, {}).get(field)
+            if a is not None and b is not None:
+                yield res["target_chunks"], f"{section}.{field}", a, b
+
+
+def compare(old: Dict, new: Dict) -> str:
+    lines = [f"{'chunks':>9}  {'metric':<20} {'old':>12} {'new':>12} {'change':>9}"]
+    for n, metric, a, b in _rows(old, new):
+        change = (b - a) / a * 100.0 if a else 0.0
+        lines.append(f"{n:>9}  {metric:<20} {a:>12.3f} {b:>12.3f} {change:>+8.1f}%")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(__doc__)
+        return 2
+    with open(argv[0], encoding="utf-8") as f:
+        old = json.load(f)
+    with open(argv[1], encoding="utf-8") as f:
+        new = json.load(f)
+    print(compare(old, new))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Deterministic offline stand-ins for Gemini and GitHub, used by benchmarks and load tests.
+
+Both expose the same async methods as GeminiService / GitHubService, so they can be
+dropped into RAGService (``rag.gemini = FakeGemini()``) without touching the network.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_]+")
+
+
+class FakeGemini:
+    """Feature-hashing embedder and hash-based generator with optional injected latency.
+
+    Texts sharing tokens get similar vectors, so retrieval over fake embeddings still
+    behaves like retrieval (unlike random vectors) while costing no network round trip.
+    """
+
+    def __init__(self, dim: int = 256, embed_latency: float = 0.0, gen_latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.dim = dim
+        self.embed_latency = embed_latency
+        self.gen_latency = gen_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._buckets: Dict[str, tuple] = {}
+        self.calls = {"embed": 0, "generate": 0}
+
+    async def _delay(self, base: float):
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise RuntimeError("injected upstream failure")
+        d = base + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if d > 0:
+            await asyncio.sleep(d)
+
+    def _bucket(self, tok: str):
+        b = self._buckets.get(tok)
+        if b is None:
+            h = zlib.crc32(tok.encode("utf-8"))
+            b = self._buckets[tok] = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+        return b
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed synchronously into an (n, dim) float32 array of unit vectors."""
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        for r, text in enumerate(texts):
+            for tok in _TOKEN.findall(text.lower()):
+                c, s = self._bucket(tok)
+                rows.append(r)
+                cols.append(c)
+                vals.append(s)
+        V = np.zeros((len(texts), self.dim), dtype="float32")
+        if rows:
+            np.add.at(V, (np.asarray(rows), np.asarray(cols)), np.asarray(vals, dtype="float32"))
+        V /= np.linalg.norm(V, axis=1, keepdims=True) + 1e-12
+        return V
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        self.calls["embed"] += 1
+        await self._delay(self.embed_latency)
+        return self.embed_array(texts).tolist() if texts else []
+
+    async def embed_query(self, text: str) -> List[float]:
+        arr = await self.embed_texts([text])
+        return arr[0] if arr else []
+
+    async def generate(self, question: str, context: str) -> str:
+        self.calls["generate"] += 1
+        await self._delay(self.gen_latency)
+        digest = hashlib.sha1(f"{question}\n{context}".encode("utf-8")).hexdigest()[:12]
+        return f"[fake answer {digest}] {len(context)} chars of context for: {question}"
+
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "pe", "sa", "do", "fu", "gi", "ho", "ju", "be"]
+_CODE_WORDS = ["def", "class", "return", "import", "async", "await", "self", "config", "index", "repo",
+               "token", "cache", "request", "handler", "vector", "chunk", "search", "client", "error", "path"]
+
+
+class SyntheticRepo:
+    """Generated repository with roughly ``n_chunks`` chunks worth of markdown and Python files.
+
+    Markdown files hold ``sections`` headed sections (one chunk each with the default
+    chunker settings); Python files are small single-chunk modules.
+    """
+
+    def __init__(self, n_chunks: int, seed: int = 0, sections: int = 20, words: int = 40,
+                 latency: float = 0.0):
+        self.seed = seed
+        self.latency = latency
+        rng = random.Random(seed)
+        self.vocab = ["".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(2000)]
+        self.vocab += _CODE_WORDS
+        self.files: Dict[str, str] = {}
+        made = 0
+        i = 0
+        while made < n_chunks:
+            if i % 5 == 4:
+                self.files[f"src/pkg{i % 97}/module_{i}.py"] = self._python(rng, words)
+                made += 1
+            else:
+                n = min(sections, n_chunks - made)
+                self.files[f"docs/area{i % 89}/page_{i}.md"] = self._markdown(rng, n, words)
+                made += n
+            i += 1
+        self.head = hashlib.sha1(f"synthetic:{seed}:{n_chunks}".encode()).hexdigest()
+
+    def _sentence(self, rng: random.Random, words: int) -> str:
+        return " ".join(rng.choice(self.vocab) for _ in range(words))
+
+    def _markdown(self, rng: random.Random, sections: int, words: int) -> str:
+        parts = [f"## {self._sentence(rng, 3).title()}\n{self._sentence(rng, words)}.\n" for _ in range(sections)]
+        return "\n".join(parts)
+
+    def _python(self, rng: random.Random, words: int) -> str:
+        name = rng.choice(self.vocab)
+        body = "\n".join(f"    {rng.choice(self.vocab)} = {rng.choice(self.vocab)}({rng.choice(self.vocab)})"
+                         for _ in range(max(1, words // 4)))
+        return f"def {name}(self):\n    \"\"\"{self._sentence(rng, 8)}\"\"\"\n{body}\n    return {name}\n"
+
+    def questions(self, n: int, seed: Optional[int] = None) -> List[str]:
+        rng = random.Random(self.seed + 1 if seed is None else seed)
+        return [f"How does {rng.choice(self.vocab)} use {rng.choice(self.vocab)}?" for _ in range(n)]
+
+    async def _delay(self):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    # GitHubService-compatible surface
+    async def get_latest_commit(self, repo: str, branch_hint: str = "main") -> Optional[str]:
+        await self._delay()
+        return self.head
+
+    async def list_files(self, repo: str, branch: str) -> List[Dict]:
+        await self._delay()
+        return [
+            {"path": p, "type": "blob", "sha": hashlib.sha1(t.encode("utf-8")).hexdigest(), "size": len(t)}
+            for p, t in self.files.items()
+        ]
+
+    async def fetch_file(self, repo: str, path: str, branch: str) -> Optional[str]:
+        await self._delay()
+        return self.files.get(path)
@@ -0,0 +1,235 @@
+"""Concurrent load test for /ask and /index with per-endpoint latency percentiles.
+
+By default the app runs with the offline fakes from ``benchmarks.fakes`` (latency
+injectable via flags), either in-process over ASGI or behind a real uvicorn socket
+on localhost. ``--url`` targets an already running server instead. From ``backend_fastapi/``:
+
+    python -m benchmarks.loadtest --concurrency 1,8,32,128 --duration 20 --mix ask=0.95,index=0.05
+    python -m benchmarks.loadtest --mode localhost --gen-latency 0.8 --embed-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.fakes import FakeGemini, SyntheticRepo
+from benchmarks.run import percentiles
+from main import app
+from routers import ask as ask_router, index as index_router
+from services.faiss_service import FaissService
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    out = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        out.append((name.strip(), float(weight or 1)))
+    return out
+
+
+class _RepoRouter:
+    """GitHubService stand-in that dispatches to one SyntheticRepo per repo name."""
+
+    def __init__(self, repos: Dict[str, SyntheticRepo]):
+        self.repos = repos
+
+    async def get_latest_commit(self, repo: str, branch_hint: str = "main"):
+        r = self.repos.get(repo)
+        return await r.get_latest_commit(repo, branch_hint) if r else None
+
+    async def list_files(self, repo: str, branch: str):
+        return await self.repos[repo].list_files(repo, branch)
+
+    async def fetch_file(self, repo: str, path: str, branch: str):
+        return await self.repos[repo].fetch_file(repo, path, branch)
+
+
+def install_fakes(args, work_dir: str) -> Dict[str, SyntheticRepo]:
+    """Point both routers' RAGService at the fakes and a scratch vector dir."""
+    repos = {f"load/repo-{i}": SyntheticRepo(args.repo_chunks, seed=i, latency=args.github_latency)
+             for i in range(args.repos)}
+    gemini = FakeGemini(dim=args.dim, embed_latency=args.embed_latency, gen_latency=args.gen_latency,
+                        jitter=args.jitter, error_rate=args.error_rate)
+    github = _RepoRouter(repos)
+    for rag in (ask_router.rag, index_router.rag):
+        rag.gemini, rag.github, rag.faiss = gemini, github, FaissService(base_dir=work_dir)
+    return repos
+
+
+async def _loop_lag(stop: asyncio.Event, samples: List[float], interval: float = 0.01):
+    """How late the event loop wakes a sleeping task: a direct measure of blocking work on the loop."""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - t0 - interval))
+
+
+async def run_step(client: httpx.AsyncClient, concurrency: int, args, repos: List[str],
+                   questions: List[str], measure_lag: bool) -> Dict:
+    mix = parse_mix(args.mix)
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    lat: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    deadline = time.perf_counter() + args.duration
+    rng = random.Random(args.seed + concurrency)
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(names, weights)[0]
+            repo = rng.choice(repos)
+            if endpoint == "index":
+                path, body = "/index/", {"repo": repo}
+            else:
+                path, body = "/ask/", {"repo": repo, "question": rng.choice(questions)}
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(path, json=body, timeout=args.timeout)
+                ok = r.status_code < 400
+            except Exception:
+                ok = False
+            dt = time.perf_counter() - t0
+            lat[endpoint].append(dt)
+            if not ok:
+                errors[endpoint] += 1
+
+    lag: List[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.ensure_future(_loop_lag(stop, lag)) if measure_lag else None
+    t_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t_start
+    stop.set()
+    if lag_task:
+        await lag_task
+
+    step = {"concurrency": concurrency, "seconds": round(elapsed, 3), "endpoints": {}}
+    total = 0
+    for name in names:
+        n = len(lat[name])
+        total += n
+        step["endpoints"][name] = {
+            "requests": n,
+            "errors": errors[name],
+            "error_rate": round(errors[name] / n, 4) if n else 0.0,
+            "rps": round(n / elapsed, 2) if elapsed else 0.0,
+            **percentiles(lat[name]),
+        }
+    step["total_rps"] = round(total / elapsed, 2) if elapsed else 0.0
+    if measure_lag:
+        step["event_loop_lag"] = percentiles(lag)
+    return step
+
+
+def _read_questions(path: str) -> List[str]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_uvicorn(port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="loadtest-uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run_load(args, work_dir: str) -> Dict:
+    steps = [int(c) for c in str(args.concurrency).split(",") if c.strip()]
+    server = thread = None
+    if args.url:
+        base_url, transport = args.url, None
+        repos = [r.strip() for r in args.repo_names.split(",") if r.strip()]
+        questions = _read_questions(args.questions_file) or ["What does this repo do?"]
+    else:
+        synthetic = install_fakes(args, work_dir)
+        repos = list(synthetic)
+        questions = [q for r in synthetic.values() for q in r.questions(args.questions)]
+        for name in repos:  # pre-index so /ask hits real indexes
+            await ask_router.rag.index_repo(name)
+        if args.mode == "localhost":
+            port = _free_port()
+            server, thread = _start_uvicorn(port)
+            base_url, transport = f"http://127.0.0.1:{port}", None
+        else:
+            base_url, transport = "http://loadtest", httpx.ASGITransport(app=app)
+
+    limits = httpx.Limits(max_connections=max(steps), max_keepalive_connections=max(steps))
+    report = {"config": vars(args), "steps": []}
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits) as client:
+            for c in steps:
+                step = await run_step(client, c, args, repos, questions, measure_lag=transport is not None)
+                report["steps"].append(step)
+                if not args.quiet:
+                    print(json.dumps(step))
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+    return report
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--mode", choices=["inprocess", "localhost"], default="inprocess")
+    ap.add_argument("--url", default="", help="target an external server instead of the in-process app")
+    ap.add_argument("--repo-names", default="", help="comma-separated repos to query with --url")
+    ap.add_argument("--questions-file", default="", help="one question per line (with --url)")
+    ap.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency steps")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    ap.add_argument("--mix", default="ask=0.95,index=0.05", help="endpoint weights")
+    ap.add_argument("--repos", type=int, default=3, help="synthetic repos to spread requests over")
+    ap.add_argument("--repo-chunks", type=int, default=2000, help="chunks per synthetic repo")
+    ap.add_argument("--questions", type=int, default=50, help="question pool size per repo")
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--embed-latency", type=float, default=0.05, help="injected Gemini embed latency (s)")
+    ap.add_argument("--gen-latency", type=float, default=0.5, help="injected Gemini generate latency (s)")
+    ap.add_argument("--github-latency", type=float, default=0.0, help="injected GitHub latency per call (s)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency (s)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of injected upstream failures")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="loadtest_report.json")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args(argv)
+    if args.url and not any(r.strip() for r in args.repo_names.split(",")):
+        ap.error("--url requires --repo-names")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix="rag-load-")
+    try:
+        report = asyncio.run(run_load(args, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
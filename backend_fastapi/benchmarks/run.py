@@ -0,0 +1,215 @@
+"""Offline benchmark suite: chunking, indexing, index load, search and end-to-end /ask.
+
+Gemini and GitHub are replaced by the deterministic fakes in ``benchmarks.fakes``,
+so results depend only on this code and the machine. Run from ``backend_fastapi/``:
+
+    python -m benchmarks.run --sizes 10000,100000,1000000 --out bench_report.json
+    python -m benchmarks.compare old_report.json bench_report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from benchmarks.fakes import FakeGemini, SyntheticRepo
+from main import app
+from routers import ask as ask_router
+from services.chunking_service import chunk_docs
+from services.faiss_service import FaissService
+from services.rag_service import RAGService
+
+DEFAULT_SIZES = "10000,100000,1000000"
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"n": 0}
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "n": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _git_sha() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _meta(args) -> Dict:
+    try:
+        import faiss  # type: ignore
+        faiss_version = getattr(faiss, "__version__", "")
+    except Exception:
+        faiss_version = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_sha": _git_sha(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": faiss_version,
+        "dim": args.dim,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "seed": args.seed,
+    }
+
+
+async def bench_size(n_chunks: int, args, work_dir: str) -> Dict:
+    repo_name = f"bench/synthetic-{n_chunks}"
+    out: Dict = {"target_chunks": n_chunks}
+
+    repo = SyntheticRepo(n_chunks, seed=args.seed)
+    docs = [{"path": p, "text": t} for p, t in repo.files.items()]
+    total_bytes = sum(len(d["text"].encode("utf-8")) for d in docs)
+
+    t0 = time.perf_counter()
+    chunks = chunk_docs(docs)
+    dt = time.perf_counter() - t0
+    out["files"] = len(docs)
+    out["chunks"] = len(chunks)
+    out["corpus_mb"] = round(total_bytes / 1e6, 3)
+    out["chunking"] = {
+        "seconds": round(dt, 4),
+        "chunks_per_s": round(len(chunks) / dt, 1) if dt else None,
+        "mb_per_s": round(total_bytes / 1e6 / dt, 3) if dt else None,
+    }
+
+    gemini = FakeGemini(dim=args.dim, seed=args.seed)
+    t0 = time.perf_counter()
+    V = gemini.embed_array([c["text"] for c in chunks])
+    dt = time.perf_counter() - t0
+    out["embedding"] = {"seconds": round(dt, 4), "chunks_per_s": round(len(chunks) / dt, 1) if dt else None}
+
+    writer = FaissService(base_dir=work_dir)
+    t0 = time.perf_counter()
+    await writer.upsert(repo_name, V, chunks)
+    dt = time.perf_counter() - t0
+    del V
+    on_disk = sum(os.path.getsize(p) for p in writer._paths(repo_name) if os.path.exists(p))
+    out["indexing"] = {
+        "seconds": round(dt, 4),
+        "vectors_per_s": round(len(chunks) / dt, 1) if dt else None,
+        "bytes_on_disk": on_disk,
+    }
+
+    # Cold load into a fresh service (empty in-memory cache)
+    reader = FaissService(base_dir=work_dir)
+    t0 = time.perf_counter()
+    loaded = reader._load(repo_name)
+    dt = time.perf_counter() - t0
+    out["index_load"] = {"seconds": round(dt, 4), "loaded": loaded is not None}
+
+    questions = repo.questions(args.queries)
+    qvecs = gemini.embed_array(questions)
+    lat = []
+    for qv in qvecs:
+        t0 = time.perf_counter()
+        await reader.search(repo_name, qv, args.top_k)
+        lat.append(time.perf_counter() - t0)
+    out["search"] = percentiles(lat)
+
+    # Same queries scoped to one package directory (IDSelector inside FAISS)
+    scope = {"path_prefix": ["src/pkg1/"]}
+    reader.facets(repo_name)  # built once per loaded index, like the first filtered query would
+    lat = []
+    for qv in qvecs:
+        t0 = time.perf_counter()
+        await reader.search(repo_name, qv, args.top_k, filters=scope)
+        lat.append(time.perf_counter() - t0)
+    out["search_filtered"] = percentiles(lat)
+
+    # End-to-end through the ASGI app, with the routers' RAGService wired to the fakes
+    saved = (ask_router.rag.gemini, ask_router.rag.faiss, ask_router.rag.github)
+    ask_router.rag.gemini, ask_router.rag.faiss, ask_router.rag.github = gemini, reader, repo
+    try:
+        lat = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for q in questions:
+                t0 = time.perf_counter()
+                r = await client.post("/ask/", json={"repo": repo_name, "question": q})
+                lat.append(time.perf_counter() - t0)
+                r.raise_for_status()
+        out["ask"] = percentiles(lat)
+    finally:
+        ask_router.rag.gemini, ask_router.rag.faiss, ask_router.rag.github = saved
+
+    # Full RAGService.index_repo path (crawl -> chunk -> embed -> upsert) on the smallest corpus only
+    if n_chunks <= args.index_e2e_max:
+        rag = RAGService()
+        rag.github, rag.gemini, rag.faiss = repo, gemini, FaissService(base_dir=work_dir)
+        t0 = time.perf_counter()
+        res = await rag.index_repo(repo_name + "-e2e")
+        dt = time.perf_counter() - t0
+        out["index_e2e"] = {"seconds": round(dt, 4), "chunks_per_s": round(res["indexed"] / dt, 1) if dt else None}
+
+    for name in (repo_name, repo_name + "-e2e"):
+        for p in reader._paths(name):
+            if os.path.exists(p):
+                os.remove(p)
+    return out
+
+
+async def run_suite(sizes: List[int], args, work_dir: str) -> Dict:
+    report = {"meta": _meta(args), "results": []}
+    for n in sizes:
+        res = await bench_size(n, args, work_dir)
+        report["results"].append(res)
+        if not args.quiet:
+            print(json.dumps(res))
+    return report
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated corpus sizes in chunks")
+    ap.add_argument("--dim", type=int, default=256, help="embedding dim (768 matches text-embedding-004)")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--index-e2e-max", type=int, default=10000,
+                    help="also time RAGService.index_repo for sizes up to this many chunks")
+    ap.add_argument("--work-dir", default="", help="scratch dir for indexes (default: temp dir)")
+    ap.add_argument("--out", default="bench_report.json")
+    ap.add_argument("--quiet", action="store_true")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        report = asyncio.run(run_suite(sizes, args, work_dir))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
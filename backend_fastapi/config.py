@@ -7,17 +7,105 @@ load_dotenv()
 # GitHub
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
 
+# Source backend: "github" (REST API) or "local" (git mirrors under GIT_MIRROR_ROOT/<owner>/<name>[.git])
+SOURCE_BACKEND = os.getenv("SOURCE_BACKEND", "github")
+GIT_MIRROR_ROOT = os.getenv("GIT_MIRROR_ROOT", "/srv/git-mirrors")
+MIRROR_WATCH_INTERVAL = float(os.getenv("MIRROR_WATCH_INTERVAL", "0"))  # seconds; 0 disables the watcher
+MIRROR_WATCH_REPOS = [r for r in os.getenv("MIRROR_WATCH_REPOS", "").split(",") if r]  # empty: all mirrors
+MIRROR_WATCH_FETCH = os.getenv("MIRROR_WATCH_FETCH", "1") == "1"  # git fetch before comparing heads
+
+# GitHub push webhooks (POST /webhooks/github); disabled when GITHUB_WEBHOOK_SECRET is empty.
+# A repo is reindexed once pushes stop for WEBHOOK_DEBOUNCE seconds, at most WEBHOOK_MAX_DELAY after the first
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+WEBHOOK_DEBOUNCE = float(os.getenv("WEBHOOK_DEBOUNCE", "10"))
+WEBHOOK_MAX_DELAY = float(os.getenv("WEBHOOK_MAX_DELAY", "120"))
+
 # Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_EMBED_MODEL = os.getenv("GEMINI_EMBED_MODEL", "models/text-embedding-004")
 GEMINI_GEN_MODEL = os.getenv("GEMINI_GEN_MODEL", "models/gemini-1.5-flash")
 
+# Embeddings: "gemini" (remote) or "local" (CPU hashed n-gram TF-IDF, works offline)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+LOCAL_EMBED_DIM = int(os.getenv("LOCAL_EMBED_DIM", "384"))
+
 # Chunking
 CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "800"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
 
+# File filtering before chunking: vendored/generated/lockfiles/minified content is skipped.
+# INDEX_INCLUDE / INDEX_EXCLUDE are comma-separated globs for every repo; INDEX_FILTERS_FILE is a
+# JSON file {"owner/name": {"include": [...], "exclude": [...]}, "*": {...}} for per-repo rules.
+INDEX_SKIP_GENERATED = os.getenv("INDEX_SKIP_GENERATED", "1") == "1"
+INDEX_INCLUDE = [g for g in os.getenv("INDEX_INCLUDE", "").split(",") if g.strip()]
+INDEX_EXCLUDE = [g for g in os.getenv("INDEX_EXCLUDE", "").split(",") if g.strip()]
+INDEX_FILTERS_FILE = os.getenv("INDEX_FILTERS_FILE", "")
+INDEX_MAX_JSON_BYTES = int(os.getenv("INDEX_MAX_JSON_BYTES", "65536"))  # larger .json files are treated as fixtures
+# Near-duplicate chunks (estimated Jaccard of 5-word shingles >= threshold) share one embedded copy; 0 disables
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+
 # Vector DB
 VECTOR_DIR = os.getenv("VECTOR_DIR", str(Path(__file__).parent / "vectorstore"))
+INDEX_CACHE_SIZE = int(os.getenv("INDEX_CACHE_SIZE", "8"))  # loaded indexes kept in memory
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"  # map index and vectors files instead of reading them
+# Portable index bundles: *.ragbundle files in BUNDLE_DIR are imported at startup when newer than the local index
+BUNDLE_DIR = os.getenv("BUNDLE_DIR", "")
+# Sharded index layout (off by default): above INDEX_SHARD_SIZE vectors the index is written as shard files
+# in INDEX_BUILD_PROCS processes and searched shard by shard ("serve"), or merged back into one index ("merge").
+# Shards are flat indexes, so this is a layout option, not a build speedup: one IndexFlatIP.add is faster.
+INDEX_SHARD_SIZE = int(os.getenv("INDEX_SHARD_SIZE", "0"))  # vectors per shard; 0 disables
+INDEX_BUILD_PROCS = int(os.getenv("INDEX_BUILD_PROCS", str(min(4, os.cpu_count() or 1))))
+INDEX_SHARD_MODE = os.getenv("INDEX_SHARD_MODE", "serve")
+
+# Blocking FAISS / NumPy / index file work runs on a bounded thread pool, never on the event loop.
+# Queries scale across CPU_WORKERS threads, so each FAISS call gets few OpenMP threads by default.
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, os.cpu_count() or 1))))
+FAISS_OMP_THREADS = int(os.getenv("FAISS_OMP_THREADS", "1"))  # 0: leave the OpenMP default (all cores)
 
 # Other
 HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+# Gemini HTTP client (pooled, keep-alive, optional HTTP/2)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1")
+GEMINI_HTTP2 = os.getenv("GEMINI_HTTP2", "1") == "1"
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE = int(os.getenv("GEMINI_MAX_KEEPALIVE", "10"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "30"))
+EMBED_CONNECT_TIMEOUT = float(os.getenv("EMBED_CONNECT_TIMEOUT", "3"))
+EMBED_READ_TIMEOUT = float(os.getenv("EMBED_READ_TIMEOUT", "15"))
+GEN_CONNECT_TIMEOUT = float(os.getenv("GEN_CONNECT_TIMEOUT", "5"))
+GEN_READ_TIMEOUT = float(os.getenv("GEN_READ_TIMEOUT", "60"))
+
+# Hedged query embedding: duplicate the request once it exceeds the observed p95
+GEMINI_HEDGE_QUERY = os.getenv("GEMINI_HEDGE_QUERY", "0") == "1"
+GEMINI_HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "0.5"))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+
+# /ask admission control: identical in-flight questions share one computation, and
+# generation calls are capped at GEN_CONCURRENCY with a queue; waiting longer than
+# GEN_QUEUE_TIMEOUT (or behind GEN_QUEUE_MAX others) is answered with 503 + Retry-After
+ASK_COALESCE = os.getenv("ASK_COALESCE", "1") == "1"
+GEN_CONCURRENCY = int(os.getenv("GEN_CONCURRENCY", "8"))  # 0: unlimited
+GEN_QUEUE_TIMEOUT = float(os.getenv("GEN_QUEUE_TIMEOUT", "5"))  # seconds; 0: wait indefinitely
+GEN_QUEUE_MAX = int(os.getenv("GEN_QUEUE_MAX", "64"))  # 0: unbounded
+
+# Query-focused context compression before generation: "off", "lexical" or "embedding" (scores line
+# groups with the query embedding; one extra embedding call per question with a remote provider)
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "off")
+COMPRESS_MAX_SOURCES = int(os.getenv("COMPRESS_MAX_SOURCES", "10"))  # chunks retrieved and compressed per question
+COMPRESS_CHUNK_TOKENS = int(os.getenv("COMPRESS_CHUNK_TOKENS", "250"))  # kept per chunk
+COMPRESS_BUDGET_TOKENS = int(os.getenv("COMPRESS_BUDGET_TOKENS", "2000"))  # prompt context budget when compressing
+
+# /ask retrieval depth: "fixed" passes top_k chunks on; "adaptive" retrieves ADAPTIVE_CANDIDATES once and keeps
+# chunks until the score drops by ADAPTIVE_SCORE_GAP (relative to the best hit), falls under ADAPTIVE_MIN_SCORE
+# or the context budget is full, keeping between ADAPTIVE_MIN_K and ADAPTIVE_MAX_K. AskRequest.strategy overrides
+RETRIEVAL_STRATEGY = os.getenv("RETRIEVAL_STRATEGY", "fixed")
+ADAPTIVE_CANDIDATES = int(os.getenv("ADAPTIVE_CANDIDATES", "30"))
+ADAPTIVE_MIN_K = int(os.getenv("ADAPTIVE_MIN_K", "1"))
+ADAPTIVE_MAX_K = int(os.getenv("ADAPTIVE_MAX_K", "10"))
+ADAPTIVE_SCORE_GAP = float(os.getenv("ADAPTIVE_SCORE_GAP", "0.15"))
+ADAPTIVE_MIN_SCORE = float(os.getenv("ADAPTIVE_MIN_SCORE", "0"))  # scale depends on the embedder; 0 disables
+
+# Admin endpoints (profiling); disabled when ADMIN_TOKEN is empty
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
@@ -1,12 +1,42 @@
+from contextlib import asynccontextmanager
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import ask, index, repos, health
+from routers import admin, ask, index, repos, health, metrics, webhooks
+from services.gemini_service import close_shared_client
+from services.mirror_watcher import MirrorWatcher
+from services.bundle_service import import_dir
+from utils.executor import get_executor, run_blocking, shutdown_executor
 from utils.logging import setup_logging
+from utils.timing import ServerTimingMiddleware
 import config
 
 setup_logging()
 
-app = FastAPI(title="SupermanPython RAG Backend", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	# Start the CPU pool for FAISS/NumPy work and pin FAISS OpenMP threads per call
+	get_executor()
+	if config.BUNDLE_DIR:
+		# Warm start: install published index bundles newer than the local indexes
+		imported = await run_blocking(import_dir, index.rag.faiss, config.BUNDLE_DIR)
+		logging.getLogger("startup").info("Index bundles: %s", imported or "none")
+	watcher = None
+	if config.SOURCE_BACKEND == "local" and config.MIRROR_WATCH_INTERVAL > 0:
+		# Poll local git mirrors and reindex changed repos in the background
+		watcher = MirrorWatcher(index.rag)
+		watcher.start()
+	yield
+	if watcher is not None:
+		await watcher.stop()
+	# Drop debounced push batches that have not started indexing
+	await webhooks.reindexer.stop()
+	# Release pooled keep-alive connections to Gemini
+	await close_shared_client()
+	# Let in-flight index/search work finish before the process exits
+	shutdown_executor()
+
+app = FastAPI(title="SupermanPython RAG Backend", version="0.1.0", lifespan=lifespan)
 
 # CORS for frontend (adjust origins in production)
 app.add_middleware(
@@ -15,9 +45,14 @@ app.add_middleware(
 	allow_credentials=True,
 	allow_methods=["*"],
 	allow_headers=["*"],
+	expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
 
 app.include_router(ask.router)
 app.include_router(index.router)
 app.include_router(repos.router)
 app.include_router(health.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+app.include_router(webhooks.router)
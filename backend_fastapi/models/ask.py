@@ -1,15 +1,37 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, field_validator
+from typing import Any, Dict, List, Literal, Optional
+
+class AskFilters(BaseModel):
+    """Scope retrieval; values within a field are OR-ed, fields are AND-ed."""
+    path_prefix: List[str] = []  # e.g. "docs/" or "services/billing/"
+    path_glob: List[str] = []    # gitignore-style, e.g. "*.md" or "src/**/api/*.py"
+    extension: List[str] = []    # ".py" or "py"
+    language: List[str] = []     # e.g. "python", "typescript", "markdown"
+
+    @field_validator("path_prefix", "path_glob", "extension", "language", mode="before")
+    @classmethod
+    def _listify(cls, v):
+        return [v] if isinstance(v, str) else v
 
 class AskRequest(BaseModel):
     repo: str
     question: str
+    debug: bool = False
+    filters: Optional[AskFilters] = None
+    ref: Optional[str] = None  # branch or "pull/<n>" indexed through /index; default branch when unset
+    strategy: Optional[Literal["fixed", "adaptive"]] = None  # retrieval depth; RETRIEVAL_STRATEGY when unset
 
 class Citation(BaseModel):
     path: str
     rank: int
     score: float
+    line_start: Optional[int] = None
+    line_end: Optional[int] = None
+    spans: List[List[int]] = []  # [first, last] file lines of each span sent to the model (compressed context)
+    duplicates: List[str] = []  # other paths whose near-identical chunk was folded into this one
 
 class AskResponse(BaseModel):
     answer: str
     citations: List[Citation]
+    retrieval: Optional[Dict[str, Any]] = None  # strategy, candidates, chunks kept and why retrieval stopped there
+    debug: Optional[Dict[str, Any]] = None
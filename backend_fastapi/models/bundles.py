@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+
+class BundleInfo(BaseModel):
+    repo: str
+    head: str
+    chunks: int
+    files: int = 0
+    dim: int = 0
+    index_type: str = ""
+    embedder: str = ""
+    model: str = ""      # embedding model the vectors came from; must match the importing node
+    created_at: str = ""
+
+    @classmethod
+    def from_header(cls, header: dict) -> "BundleInfo":
+        return cls(
+            repo=header["repo"],
+            head=header.get("state", {}).get("head", ""),
+            chunks=header.get("chunks", 0),
+            files=header.get("files", 0),
+            dim=header.get("dim", 0),
+            index_type=header.get("index_type", ""),
+            embedder=header.get("embedder", ""),
+            model=header.get("model", ""),
+            created_at=header.get("created_at", ""),
+        )
@@ -1,7 +1,9 @@
 from pydantic import BaseModel
+from typing import Any, Dict, Optional
 
 class IndexRequest(BaseModel):
     repo: str
+    ref: Optional[str] = None  # branch, tag, commit or "pull/<n>"; indexed as an overlay on the default branch
 
 class IndexResponse(BaseModel):
     repo: str
@@ -9,3 +11,9 @@ class IndexResponse(BaseModel):
     updated: int
     head: str
     note: str = ""
+    embedded: int = 0  # chunks sent to the embedder
+    reused: int = 0    # chunks whose text was unchanged, vector kept
+    removed: int = 0   # chunks dropped because their text no longer exists
+    skipped: Optional[Dict[str, Any]] = None  # files filtered out (vendored, generated, ...): counts, bytes, reasons
+    near_duplicates: Optional[Dict[str, Any]] = None  # chunks folded into a representative: clusters, tokens/bytes saved
+    ref: Optional[str] = None  # set for overlay indexes; "removed" then counts base chunks the ref hides
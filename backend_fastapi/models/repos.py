@@ -3,9 +3,14 @@ from typing import List
 
 class RepoStatus(BaseModel):
     repo: str
-    last_indexed: str
-    head: str
+    ref: str = ""      # set for branch/PR overlays on the repo's default-branch index
+    last_indexed: str  # UTC timestamp of the last index write
+    head: str          # commit SHA the index was built from
     chunks: int
+    files: int = 0
+    index_type: str = ""
+    dim: int = 0
+    bytes: int = 0     # on-disk size of index, metadata and vectors
 
 class RepoListResponse(BaseModel):
     repos: List[RepoStatus]
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class WebhookResponse(BaseModel):
+    event: str
+    repo: Optional[str] = None
+    queued: bool = False
+    paths: Optional[int] = None  # changed paths in the pending batch; None when the batch falls back to a diff
+    pushes: int = 0              # pushes merged into the pending batch
+    note: str = ""
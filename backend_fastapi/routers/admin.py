@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from typing import Optional
+import hmac
+import os
+import tempfile
+import config
+from models.bundles import BundleInfo
+from services.bundle_service import BUNDLE_EXT, BundleError, bundle_name, export_bundle, import_bundle
+from services.faiss_service import FaissService
+from utils.executor import run_blocking
+from utils.profiling import ProfilerBusy, profile_cprofile, profile_stacks
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+store = FaissService()
+
+def _check_token(token: Optional[str]):
+    # Disabled unless ADMIN_TOKEN is configured
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_endpoint(
+    seconds: float = Query(5.0, gt=0),
+    mode: str = Query("cprofile", pattern="^(cprofile|stack)$"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    _check_token(x_admin_token)
+    seconds = min(seconds, config.PROFILE_MAX_SECONDS)
+    try:
+        if mode == "stack":
+            return await profile_stacks(seconds)
+        return await profile_cprofile(seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/bundles/{repo:path}", response_class=FileResponse)
+async def export_bundle_endpoint(repo: str, x_admin_token: Optional[str] = Header(None)):
+    _check_token(x_admin_token)
+    fd, path = tempfile.mkstemp(suffix=BUNDLE_EXT)
+    os.close(fd)
+    try:
+        await run_blocking(export_bundle, store, repo, path)
+    except BundleError as e:
+        os.remove(path)
+        raise HTTPException(status_code=404, detail=str(e))
+    return FileResponse(path, media_type="application/octet-stream", filename=bundle_name(repo),
+                        background=BackgroundTask(os.remove, path))
+
+@router.post("/bundles", response_model=BundleInfo)
+async def import_bundle_endpoint(request: Request, verify: bool = Query(True),
+                                 x_admin_token: Optional[str] = Header(None)):
+    _check_token(x_admin_token)
+    # spool next to the indexes so sections can be copied within one filesystem
+    fd, path = tempfile.mkstemp(suffix=BUNDLE_EXT, dir=store.base_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                await run_blocking(f.write, chunk)
+        header = await run_blocking(import_bundle, store, path, verify)
+    except BundleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(path)
+    return BundleInfo.from_header(header)
@@ -1,11 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from models.ask import AskRequest, AskResponse
 from services.rag_service import RAGService
+from utils.concurrency import Overloaded
 
 router = APIRouter(prefix="/ask", tags=["ask"])
 rag = RAGService()
 
 @router.post("/", response_model=AskResponse)
 async def ask_endpoint(req: AskRequest):
-    result = await rag.answer_question(req.repo, req.question)
+    try:
+        filters = req.filters.model_dump() if req.filters else None
+        result = await rag.answer_question(req.repo, req.question, debug=req.debug, filters=filters, ref=req.ref,
+                                           strategy=req.strategy)
+    except Overloaded as e:
+        # shed fast instead of queueing: clients back off and tail latency stays bounded
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     return AskResponse(**result)
@@ -7,5 +7,5 @@ rag = RAGService()
 
 @router.post("/", response_model=IndexResponse)
 async def index_endpoint(req: IndexRequest):
-    result = await rag.index_repo(req.repo)
+    result = await rag.index_repo(req.repo, ref=req.ref)
     return IndexResponse(**result)
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from utils.metrics import REGISTRY
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Prometheus text exposition format 0.0.4
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
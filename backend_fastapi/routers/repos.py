@@ -1,24 +1,25 @@
 from fastapi import APIRouter
 from models.repos import RepoListResponse, RepoStatus
-from config import VECTOR_DIR
-import os, json
+from services.catalog_service import RepoCatalog
 
 router = APIRouter(prefix="/repos", tags=["repos"])
+catalog = RepoCatalog()
 
 @router.get("/", response_model=RepoListResponse)
 async def list_repos():
-    repos = []
-    for fname in os.listdir(VECTOR_DIR):
-        if fname.endswith('.meta.jsonl'):
-            repo = fname.replace('.meta.jsonl', '').replace('__', '/')
-            meta_path = os.path.join(VECTOR_DIR, fname)
-            try:
-                with open(meta_path, 'r', encoding='utf-8') as f:
-                    lines = [json.loads(line) for line in f if line.strip()]
-                chunks = len(lines)
-                last_indexed = lines[0]["key"] if lines else ""
-                head = lines[0]["path"] if lines else ""
-                repos.append(RepoStatus(repo=repo, last_indexed=last_indexed, head=head, chunks=chunks))
-            except Exception:
-                continue
+    # Served from the catalog maintained on every index write; no metadata files are read
+    repos = [
+        RepoStatus(
+            repo=e.get("base", repo),
+            ref=e.get("ref", ""),
+            last_indexed=e.get("updated_at", ""),
+            head=e.get("head", ""),
+            chunks=e.get("chunks", 0),
+            files=e.get("files", 0),
+            index_type=e.get("index_type", ""),
+            dim=e.get("dim", 0),
+            bytes=e.get("bytes", 0),
+        )
+        for repo, e in sorted(catalog.all().items())
+    ]
     return RepoListResponse(repos=repos)
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Header, HTTPException, Request
+from typing import Optional
+import json
+import config
+from models.webhooks import WebhookResponse
+from routers.index import rag
+from services.webhook_service import PushReindexer, parse_push, verify_signature
+from utils.metrics import WEBHOOK_EVENTS
+
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+reindexer = PushReindexer(rag)
+
+@router.post("/github", response_model=WebhookResponse, status_code=202)
+async def github_webhook(
+    request: Request,
+    x_github_event: Optional[str] = Header(None),
+    x_hub_signature_256: Optional[str] = Header(None),
+):
+    # Disabled unless GITHUB_WEBHOOK_SECRET is configured
+    if not config.GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=404, detail="Not Found")
+    body = await request.body()
+    if not verify_signature(config.GITHUB_WEBHOOK_SECRET, body, x_hub_signature_256):
+        WEBHOOK_EVENTS.inc(event=x_github_event or "", outcome="rejected")
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    event = x_github_event or ""
+    if event == "ping":
+        return WebhookResponse(event=event, note="pong")
+    if event != "push":
+        WEBHOOK_EVENTS.inc(event=event, outcome="ignored")
+        return WebhookResponse(event=event, note="Event ignored")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Payload must be JSON (content type application/json)")
+    push = parse_push(payload)
+    if push is None:
+        WEBHOOK_EVENTS.inc(event=event, outcome="ignored")
+        return WebhookResponse(event=event, note="Not a push to the default branch")
+    if rag.faiss.catalog.get(push["repo"]) is None:
+        # pushes only keep existing indexes fresh; the first build goes through /index
+        WEBHOOK_EVENTS.inc(event=event, outcome="ignored")
+        return WebhookResponse(event=event, repo=push["repo"], note="Repo not indexed")
+    batch = reindexer.submit(push)
+    WEBHOOK_EVENTS.inc(event=event, outcome="queued")
+    return WebhookResponse(
+        event=event,
+        repo=push["repo"],
+        queued=True,
+        paths=len(batch["paths"]) if batch["exact"] else None,
+        pushes=batch["pushes"],
+        note="Reindex queued" if batch["exact"] else "Reindex queued; changes will be diffed against the indexed head",
+    )
@@ -0,0 +1,352 @@
+"""Portable index bundles: one checksummed, versioned file per repo.
+
+A bundle carries everything a node needs to serve a repo without crawling or
+embedding: the FAISS index, vectors, chunk metadata, indexing state (head SHA,
+blob SHAs, filter fingerprint) and, for the local embedder, its IDF weights.
+
+Layout (little-endian)::
+
+    magic "RAGBNDL1" | u32 format version | u32 reserved | u64 header length | sha256(header)
+    header: JSON {repo, created_at, embedder, model, dim, index_type, chunks, files, state,
+                  sections: {name: {offset, length, sha256}}}
+    sections, each starting on a page boundary
+
+Import maps the bundle, checks every checksum and copies the sections into the
+vector store with ``copy_file_range`` where available (no user-space buffers).
+With ``INDEX_MMAP`` the imported index and vectors are then mapped rather than
+read, so a new replica serves a bundled repo seconds after startup.
+
+CLI::
+
+    python -m services.bundle_service export acme/api --out acme__api.ragbundle
+    python -m services.bundle_service import acme__api.ragbundle
+    python -m services.bundle_service inspect acme__api.ragbundle
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+from config import BUNDLE_DIR, EMBEDDING_PROVIDER, GEMINI_EMBED_MODEL, LOCAL_EMBED_DIM
+from services.embedding_service import LocalEmbedder
+from services.faiss_service import FaissService
+from services.index_shards import read_manifest, shard_files
+
+logger = logging.getLogger("BundleService")
+
+MAGIC = b"RAGBNDL1"
+FORMAT_VERSION = 1
+BUNDLE_EXT = ".ragbundle"
+_PREFIX = struct.Struct("<8sII Q 32s")
+_ALIGN = mmap.PAGESIZE
+_HASH_BLOCK = 8 << 20
+
+
+class BundleError(Exception):
+    """Unreadable, corrupt or incompatible bundle."""
+
+
+def embedding_model(embedder: str) -> str:
+    """What produced the vectors: bundles only load where queries embed the same way."""
+    if embedder == "gemini":
+        return GEMINI_EMBED_MODEL
+    if embedder == "local":
+        return f"local-hashed-ngram-{LOCAL_EMBED_DIM}"
+    return embedder
+
+
+def _repo_files(fs: FaissService, repo: str) -> Dict[str, str]:
+    idx_path, meta_path, vec_path = fs._paths(repo)
+    return {
+        "index": idx_path,
+        "meta": meta_path,
+        "vectors": vec_path,
+        "idf": LocalEmbedder(state_dir=fs.base_dir)._idf_path(repo),
+    }
+
+
+def _sha256(buf) -> str:
+    h = hashlib.sha256()
+    for i in range(0, len(buf), _HASH_BLOCK):
+        h.update(buf[i:i + _HASH_BLOCK])
+    return h.hexdigest()
+
+
+def _align(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def _copy_range(src_fd: int, src_map, dst, offset: int, length: int):
+    """Copy ``length`` bytes at ``offset`` of the source into dst, in the kernel when possible."""
+    if hasattr(os, "copy_file_range"):
+        done = 0
+        try:
+            while done < length:
+                n = os.copy_file_range(src_fd, dst.fileno(), length - done, offset + done)
+                if n == 0:
+                    break
+                done += n
+            if done == length:
+                return
+        except OSError:
+            pass  # e.g. across filesystems on older kernels
+        dst.seek(0)
+        dst.truncate()
+    if offset + length > len(src_map):
+        raise BundleError("bundle is truncated")
+    view = memoryview(src_map)
+    try:
+        for pos in range(offset, offset + length, _HASH_BLOCK):
+            dst.write(view[pos:min(pos + _HASH_BLOCK, offset + length)])
+    finally:
+        view.release()
+
+
+def export_bundle(fs: FaissService, repo: str, out_path: str) -> Dict:
+    """Write the repo's index as a bundle at ``out_path``; returns the bundle header."""
+    if not fs.has_index(repo):
+        raise BundleError(f"{repo} is not indexed")
+    if read_manifest(fs._paths(repo)[0]) is not None:
+        raise BundleError(f"{repo} is served as shards; rebuild it with INDEX_SHARD_MODE=merge to export it")
+    state = fs.load_state(repo)
+    entry = fs.catalog.get(repo) or {}
+    embedder = state.get("embedder", "")
+    # index writers replace files rather than rewrite them, so open handles are stable snapshots
+    with ExitStack() as stack:
+        sources = {name: stack.enter_context(open(p, "rb"))
+                   for name, p in _repo_files(fs, repo).items() if os.path.exists(p)}
+        sections = {name: {"offset": 0, "length": os.fstat(f.fileno()).st_size, "sha256": "0" * 64}
+                    for name, f in sources.items()}
+        header = {
+            "repo": repo,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "embedder": embedder,
+            "model": embedding_model(embedder),
+            "dim": entry.get("dim", 0),
+            "index_type": entry.get("index_type", ""),
+            "chunks": entry.get("chunks", state.get("chunks", 0)),
+            "files": entry.get("files", 0),
+            "state": state,
+            "sections": sections,
+        }
+        # digests are fixed-width, so the header length only depends on the offsets
+        base = _align(_PREFIX.size + len(json.dumps(header)))
+        while True:
+            offset = base
+            for sec in sections.values():
+                sec["offset"] = offset
+                offset = _align(offset + sec["length"])
+            if _PREFIX.size + len(json.dumps(header).encode("utf-8")) <= base:
+                break
+            base += _ALIGN
+
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as out:
+            for name, src in sources.items():
+                out.seek(sections[name]["offset"])
+                h = hashlib.sha256()
+                for block in iter(lambda src=src: src.read(_HASH_BLOCK), b""):
+                    h.update(block)
+                    out.write(block)
+                sections[name]["sha256"] = h.hexdigest()
+            out.truncate(max((sec["offset"] + sec["length"] for sec in sections.values()), default=base))
+            blob = json.dumps(header).encode("utf-8")
+            out.seek(0)
+            out.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, 0, len(blob), hashlib.sha256(blob).digest()))
+            out.write(blob)
+        os.replace(tmp, out_path)
+    return header
+
+
+class Bundle:
+    """A bundle file opened read-only through mmap; sections are zero-copy memoryviews."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # a raw descriptor, kept open for copy_file_range; the mapping holds its own reference
+        self._fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size < _PREFIX.size:
+                raise BundleError(f"{path}: not a bundle")
+            self._map = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        except Exception:
+            os.close(self._fd)
+            raise
+        magic, version, _, hlen, hsum = _PREFIX.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise BundleError(f"{path}: not a bundle")
+        if version > FORMAT_VERSION:
+            self.close()
+            raise BundleError(f"{path}: format version {version} is newer than supported ({FORMAT_VERSION})")
+        blob = self._map[_PREFIX.size:_PREFIX.size + hlen]
+        if hashlib.sha256(blob).digest() != hsum:
+            self.close()
+            raise BundleError(f"{path}: header checksum mismatch")
+        self.header: Dict = json.loads(blob)
+        for name, sec in self.header["sections"].items():
+            if sec["offset"] + sec["length"] > size:
+                self.close()
+                raise BundleError(f"{path}: section {name} is truncated")
+
+    def section(self, name: str) -> memoryview:
+        sec = self.header["sections"][name]
+        return memoryview(self._map)[sec["offset"]:sec["offset"] + sec["length"]]
+
+    def verify(self):
+        for name, sec in self.header["sections"].items():
+            view = self.section(name)
+            try:
+                if _sha256(view) != sec["sha256"]:
+                    raise BundleError(f"{self.path}: section {name} checksum mismatch")
+            finally:
+                view.release()
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_compatible(header: Dict, provider: str = EMBEDDING_PROVIDER):
+    """Vectors are only comparable with query embeddings from the same provider and model."""
+    embedder = header.get("embedder", "")
+    if embedder != provider:
+        raise BundleError(f"bundle was embedded with {embedder!r}, this node uses {provider!r}")
+    if header.get("model") != embedding_model(embedder):
+        raise BundleError(f"bundle model {header.get('model')!r} != {embedding_model(embedder)!r}")
+
+
+def import_bundle(fs: FaissService, path: str, verify: bool = True, provider: str = EMBEDDING_PROVIDER) -> Dict:
+    """Install a bundle into ``fs``'s vector store, replacing the repo's current index."""
+    with Bundle(path) as bundle:
+        header = bundle.header
+        check_compatible(header, provider)
+        if verify:
+            bundle.verify()
+        repo = header["repo"]
+        targets = _repo_files(fs, repo)
+        sections = header["sections"]
+        missing = {"index", "meta", "vectors"} - set(sections)
+        if missing:
+            raise BundleError(f"{path}: missing sections {sorted(missing)}")
+        # stage everything first so a failed copy leaves the current index untouched
+        staged: List[str] = []
+        try:
+            for name in ("meta", "vectors", "idf", "index"):
+                if name not in sections:
+                    continue
+                tmp = f"{targets[name]}.{os.getpid()}.import"
+                with open(tmp, "wb") as dst:
+                    _copy_range(bundle._fd, bundle._map, dst, sections[name]["offset"], sections[name]["length"])
+                staged.append(name)
+        except Exception:
+            for name in ("meta", "vectors", "idf", "index"):
+                tmp = f"{targets[name]}.{os.getpid()}.import"
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+    if "idf" not in staged and os.path.exists(targets["idf"]):
+        os.remove(targets["idf"])  # weights from a previous local build would skew queries
+    for name in staged:
+        os.replace(f"{targets[name]}.{os.getpid()}.import", targets[name])
+    # the imported index is flat: shards of a previous sharded build are stale now
+    for p in shard_files(fs.base_dir, repo.replace("/", "__")):
+        os.remove(p)
+    fs._evict(repo)
+    fs.save_state(repo, header.get("state", {}))
+    fs.catalog.update(
+        repo,
+        chunks=header.get("chunks", 0),
+        files=header.get("files", 0),
+        index_type=header.get("index_type", ""),
+        dim=header.get("dim", 0),
+        shards=0,
+        bytes=sum(os.path.getsize(targets[n]) for n in ("index", "meta", "vectors")),
+    )
+    logger.info("Imported %s at %s from %s", repo, header.get("state", {}).get("head", "")[:12], path)
+    return header
+
+
+def bundle_name(repo: str) -> str:
+    return repo.replace("/", "__") + BUNDLE_EXT
+
+
+def import_dir(fs: FaissService, bundle_dir: str = BUNDLE_DIR) -> Dict[str, str]:
+    """Import every bundle in ``bundle_dir`` whose head differs from the local index.
+
+    Returns {bundle file: outcome}; a bad bundle is logged and skipped, not fatal.
+    """
+    outcomes: Dict[str, str] = {}
+    if not bundle_dir or not os.path.isdir(bundle_dir):
+        return outcomes
+    for fname in sorted(os.listdir(bundle_dir)):
+        if not fname.endswith(BUNDLE_EXT):
+            continue
+        path = os.path.join(bundle_dir, fname)
+        try:
+            with Bundle(path) as bundle:
+                repo = bundle.header["repo"]
+                head = bundle.header.get("state", {}).get("head", "")
+            local = fs.catalog.get(repo) or {}
+            if head and local.get("head") == head and fs.has_index(repo):
+                outcomes[fname] = "current"
+                continue
+            import_bundle(fs, path)
+            outcomes[fname] = "imported"
+        except (BundleError, OSError, ValueError, KeyError) as e:
+            logger.warning("Skipping bundle %s: %s", path, e)
+            outcomes[fname] = f"skipped: {e}"
+    return outcomes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export, import or inspect portable index bundles.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export", help="write a repo's index as a bundle")
+    p.add_argument("repo")
+    p.add_argument("--out", help=f"bundle path (default: <BUNDLE_DIR or .>/<owner>__<name>{BUNDLE_EXT})")
+    p = sub.add_parser("import", help="install bundles into VECTOR_DIR")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--no-verify", action="store_true", help="skip section checksums")
+    p = sub.add_parser("inspect", help="print a bundle header and verify checksums")
+    p.add_argument("path")
+    args = parser.parse_args(argv)
+
+    fs = FaissService()
+    try:
+        if args.cmd == "export":
+            out = args.out or os.path.join(BUNDLE_DIR or ".", bundle_name(args.repo))
+            header = export_bundle(fs, args.repo, out)
+            print(f"{out}: {header['chunks']} chunks, head {header['state'].get('head', '')[:12]}")
+        elif args.cmd == "import":
+            for path in args.paths:
+                header = import_bundle(fs, path, verify=not args.no_verify)
+                print(f"{header['repo']}: {header['chunks']} chunks, head {header['state'].get('head', '')[:12]}")
+        else:
+            with Bundle(args.path) as bundle:
+                bundle.verify()
+                header = dict(bundle.header)
+            header["state"] = {k: v for k, v in header["state"].items() if k != "blobs"}
+            print(json.dumps(header, indent=1))
+    except BundleError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
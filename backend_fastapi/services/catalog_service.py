@@ -0,0 +1,147 @@
+"""Per-directory manifest of indexed repos (``catalog.json`` next to the indexes).
+
+FaissService updates an entry on every index write, so listing repos or checking
+what is indexed costs one small JSON read instead of scanning every metadata file.
+Updates are read-modify-write: a thread lock covers one process and, where ``fcntl``
+exists, an exclusive ``flock`` on ``catalog.json.lock`` covers workers sharing the
+directory. Without ``fcntl`` run a single worker per ``VECTOR_DIR``.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from config import VECTOR_DIR
+
+CATALOG_FILE = "catalog.json"
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+class RepoCatalog:
+    def __init__(self, base_dir: str = VECTOR_DIR):
+        self.base_dir = base_dir
+        self.path = os.path.join(base_dir, CATALOG_FILE)
+        self._lock = _lock_for(os.path.abspath(self.path))
+        self._stamp = None
+        self._entries: Dict[str, Dict] = {}
+        self._flocked = False
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._stamp, self._entries = None, self.rebuild()
+            return self._entries
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get("repos", {})
+            self._stamp = stamp
+        return self._entries
+
+    def _write(self, entries: Dict[str, Dict]):
+        os.makedirs(self.base_dir, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "repos": entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the catalog across processes; callers already hold ``self._lock``."""
+        if fcntl is None or self._flocked:
+            yield
+            return
+        os.makedirs(self.base_dir, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            self._flocked = True
+            try:
+                yield
+            finally:
+                self._flocked = False
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def all(self) -> Dict[str, Dict]:
+        with self._lock:
+            return dict(self._read())
+
+    def get(self, repo: str) -> Optional[Dict]:
+        with self._lock:
+            return self._read().get(repo)
+
+    def update(self, repo: str, **fields):
+        """Merge ``fields`` into the repo's entry and stamp ``updated_at``."""
+        with self._lock, self._exclusive():
+            entries = dict(self._read())
+            entry = dict(entries.get(repo, {"repo": repo}))
+            entry.update(fields)
+            entry["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            entries[repo] = entry
+            self._write(entries)
+
+    def remove(self, repo: str):
+        with self._lock, self._exclusive():
+            entries = dict(self._read())
+            if entries.pop(repo, None) is not None:
+                self._write(entries)
+
+    def rebuild(self) -> Dict[str, Dict]:
+        """Derive entries from the index files on disk (first run on an existing VECTOR_DIR)."""
+        entries: Dict[str, Dict] = {}
+        if not os.path.isdir(self.base_dir):
+            return entries
+        for fname in sorted(os.listdir(self.base_dir)):
+            if not fname.endswith('.meta.jsonl'):
+                continue
+            safe = fname[:-len('.meta.jsonl')]
+            repo = safe.replace('__', '/')
+            paths = set()
+            chunks = 0
+            with open(os.path.join(self.base_dir, fname), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        chunks += 1
+                        paths.add(json.loads(line).get("path", ""))
+            state = {}
+            state_path = os.path.join(self.base_dir, f"{safe}.state.json")
+            if os.path.exists(state_path):
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            files = [os.path.join(self.base_dir, safe + ext) for ext in ('.faiss', '.meta.jsonl', '.vecs.npy')]
+            size = sum(os.path.getsize(p) for p in files if os.path.exists(p))
+            dim = 0
+            if os.path.exists(files[2]):
+                shape = np.load(files[2], mmap_mode='r').shape  # header only
+                dim = shape[1] if len(shape) == 2 else 0
+            mtime = os.path.getmtime(os.path.join(self.base_dir, fname))
+            entries[repo] = {
+                "repo": repo,
+                "chunks": chunks,
+                "files": len(paths),
+                "head": state.get("head", ""),
+                "embedder": state.get("embedder", ""),
+                "index_type": "IndexFlatIP",  # the only type written before the catalog existed
+                "dim": int(dim),
+                "bytes": size,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime)),
+                **{k: state[k] for k in ("base", "ref") if k in state},  # branch/PR overlay
+            }
+        if entries:
+            with self._exclusive():
+                if not os.path.exists(self.path):  # another worker may have written it meanwhile
+                    self._write(entries)
+        return entries
@@ -1,4 +1,6 @@
+import hashlib
 import re
+import zlib
 from typing import List, Dict, Tuple
 from config import CHUNK_TOKENS, CHUNK_OVERLAP
 
@@ -10,27 +12,96 @@ except ImportError:
 
 MD_SPLIT = re.compile(r"(^|\n)#{1,6}\s|```", re.MULTILINE)
 
+# Content-defined cut points: a line ends a chunk when the hash of it and the two lines
+# before it falls below a threshold proportional to the line's tokens, so boundaries
+# move with the text instead of token offsets.
+_CDC_SCALE = 1 << 32
+
 def _tok_count(text: str) -> int:
     if _enc:
         return len(_enc.encode(text))
     return len(text.split())
 
-def _window(text: str, max_tokens: int, overlap: int) -> List[str]:
+def _window(text: str, max_tokens: int, overlap: int) -> List[Tuple[str, int]]:
+    """Sliding token windows as (text, token_count) pairs."""
     if not _enc:
         # fallback: naive split
         words = text.split()
         out = []
         step = max(1, max_tokens - overlap)
         for start in range(0, len(words), step):
-            out.append(' '.join(words[start:start+max_tokens]))
+            piece = words[start:start+max_tokens]
+            out.append((' '.join(piece), len(piece)))
         return out
     ids = _enc.encode(text)
     out = []
     step = max(1, max_tokens - overlap)
     for start in range(0, len(ids), step):
-        out.append(_enc.decode(ids[start:start+max_tokens]))
+        piece = ids[start:start+max_tokens]
+        out.append((_enc.decode(piece), len(piece)))
+    return out
+
+def _content_split(text: str, max_tokens: int, overlap: int) -> List[Tuple[str, int]]:
+    """Split an oversized segment at content-defined line boundaries.
+
+    A chunk is closed at a cut point once it holds a few lines' worth of tokens, or
+    when the next line would overflow its budget (max_tokens minus the overlap).
+    Cut points depend only on nearby lines, so an edit reshapes the chunk it lands
+    in (and usually its neighbour); chunks after the next shared cut point keep
+    their exact text. Each chunk after the first is prefixed with the trailing
+    lines of its predecessor, up to ``overlap`` tokens.
+    """
+    lines = text.splitlines(keepends=True)
+    counts = [_tok_count(line) for line in lines]
+    limit = max(1, max_tokens - overlap)
+    min_tokens = max(1, limit // 8)
+    target = max(1, limit // 3)
+    pieces: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, n in enumerate(counts):
+        if n > limit:
+            # a single huge line (minified code): flush and window it on its own
+            if cur:
+                pieces.append(cur)
+            pieces.append([i])
+            cur, cur_tokens = [], 0
+            continue
+        if cur and cur_tokens + n > limit:
+            pieces.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+        window = "".join(lines[max(0, i - 2):i + 1])
+        if cur_tokens >= min_tokens and zlib.crc32(window.encode("utf-8")) * target < n * _CDC_SCALE:
+            pieces.append(cur)
+            cur, cur_tokens = [], 0
+    if cur:
+        pieces.append(cur)
+
+    out: List[Tuple[str, int]] = []
+    prev: List[int] = []
+    for piece in pieces:
+        if len(piece) == 1 and counts[piece[0]] > limit:
+            out.extend(_window(lines[piece[0]], max_tokens, overlap))
+            prev = []
+            continue
+        lead: List[int] = []
+        budget = overlap
+        for j in reversed(prev):
+            if counts[j] > budget:
+                break
+            lead.insert(0, j)
+            budget -= counts[j]
+        idxs = lead + piece
+        out.append(("".join(lines[j] for j in idxs), sum(counts[j] for j in idxs)))
+        prev = piece
     return out
 
+def chunk_hash(text: str) -> str:
+    """Content hash identifying a chunk's text (and so its embedding) independent of position."""
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
 def _line_span(doc_text: str, chunk_text: str, start_search: int) -> Tuple[int, int, int]:
     """Return (line_start, line_end, new_search_pos). If not found, guesses using counts."""
     pos = doc_text.find(chunk_text, start_search)
@@ -48,19 +119,24 @@ def smart_chunk(doc: Dict) -> List[Dict]:
     segments = [s for s in MD_SPLIT.split(text) if s and not s.isspace()]
     if not segments:
         segments = [text]
-    chunks = []
-    idx = 0
-    search_pos = 0
+    pieces: List[Tuple[str, int]] = []
     for seg in segments:
-        if _tok_count(seg) <= CHUNK_TOKENS:
-            ls, le, search_pos = _line_span(text, seg, search_pos)
-            chunks.append({"key": f"{path}:{idx}", "path": path, "idx": idx, "text": seg, "line_start": ls, "line_end": le})
-            idx += 1
+        ntok = _tok_count(seg)
+        if ntok <= CHUNK_TOKENS:
+            pieces.append((seg, ntok))
         else:
-            for w in _window(seg, CHUNK_TOKENS, CHUNK_OVERLAP):
-                ls, le, search_pos = _line_span(text, w, search_pos)
-                chunks.append({"key": f"{path}:{idx}", "path": path, "idx": idx, "text": w, "line_start": ls, "line_end": le})
-                idx += 1
+            pieces.extend(_content_split(seg, CHUNK_TOKENS, CHUNK_OVERLAP))
+    chunks = []
+    search_pos = 0
+    seen: Dict[str, int] = {}
+    for idx, (piece, ntok) in enumerate(pieces):
+        ls, le, search_pos = _line_span(text, piece, search_pos)
+        h = chunk_hash(piece)
+        # Key by content, not position: inserting text above a chunk leaves its key unchanged.
+        # Repeats of the same text within a file get an occurrence suffix.
+        n = seen[h] = seen.get(h, 0) + 1
+        key = f"{path}:{h[:16]}" if n == 1 else f"{path}:{h[:16]}#{n}"
+        chunks.append({"key": key, "hash": h, "path": path, "idx": idx, "text": piece, "line_start": ls, "line_end": le, "tokens": ntok})
     return chunks
 
 def chunk_docs(docs: List[Dict]) -> List[Dict]:
@@ -0,0 +1,147 @@
+"""Query-focused compression of retrieved chunks before generation.
+
+Each selected chunk is split into groups of a few lines. Groups are scored
+against the question, lexically or by embedding similarity. The best groups,
+plus a line of context either side, are kept until the per-chunk token cap is
+reached. Kept lines retain their file line numbers, so citations and the prompt
+point at the exact spans. Freed budget goes to more distinct sources.
+"""
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+GROUP_LINES = 4
+CONTEXT_LINES = 1
+GAP_MARKER = "..."
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]*|[0-9]+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "what", "when", "where", "which", "who",
+    "why", "with", "we", "you", "used", "use",
+}
+
+
+def _terms(text: str) -> List[str]:
+    """Lowercased words plus their camelCase/snake_case parts, without stopwords."""
+    out: List[str] = []
+    for w in _WORD.findall(text):
+        parts = [w] + (_CAMEL.findall(w) if not w.islower() else [])
+        for p in parts:
+            p = p.lower()
+            if len(p) > 1 and p not in _STOPWORDS:
+                out.append(p)
+    return out
+
+
+def line_groups(text: str, size: int = GROUP_LINES) -> List[Tuple[int, int]]:
+    """[start, end) line offsets within ``text``: ``size`` lines each, breaking early at blank lines."""
+    lines = text.split("\n")
+    groups: List[Tuple[int, int]] = []
+    start = 0
+    for i, line in enumerate(lines):
+        if (not line.strip() and i > start) or i - start >= size:
+            groups.append((start, i))
+            start = i
+    groups.append((start, len(lines)))
+    return [(s, e) for s, e in groups if any(line.strip() for line in lines[s:e])]
+
+
+def lexical_scores(question: str, texts: Sequence[str]) -> np.ndarray:
+    """Query-term overlap per text: IDF over the candidate texts, sublinear TF, mild length damping."""
+    q = set(_terms(question))
+    scores = np.zeros(len(texts), dtype="float32")
+    if not q or not texts:
+        return scores
+    bags = [Counter(_terms(t)) for t in texts]
+    df = Counter(term for bag in bags for term in q & bag.keys())
+    n = len(texts)
+    for i, bag in enumerate(bags):
+        s = sum(math.log(1.0 + n / df[t]) * (1.0 + math.log(bag[t])) for t in q & bag.keys())
+        scores[i] = s / (1.0 + math.log(1.0 + sum(bag.values())))
+    return scores
+
+
+def embedding_scores(qvec: np.ndarray, vecs: np.ndarray) -> np.ndarray:
+    q = qvec / (np.linalg.norm(qvec) + 1e-12)
+    V = vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
+    return np.maximum(V @ q, 0.0).astype("float32")
+
+
+def compress_hit(hit: Dict, groups: List[Tuple[int, int]], scores: np.ndarray, max_tokens: int,
+                 count_tokens: Callable[[str], int]) -> Dict:
+    """Copy of ``hit`` whose text keeps only its best-scoring line groups (in file order).
+
+    Adds ``spans`` ([first, last] file lines per kept run), ``tokens_before`` and
+    ``tokens_after``; ``line_start``/``line_end`` become the outermost kept lines.
+    """
+    lines = hit.get("text", "").split("\n")
+    first = hit.get("line_start") or 1
+    before = count_tokens(hit.get("text", ""))
+    if not groups or before <= max_tokens:
+        out = dict(hit)
+        out["spans"] = [[first, hit.get("line_end") or first + len(lines) - 1]]
+        out["tokens_before"] = out["tokens_after"] = before
+        return out
+    line_tokens = [count_tokens(line) + 1 if line else 1 for line in lines]
+    keep = np.zeros(len(lines), dtype=bool)
+    used = 0
+    # no query overlap at all: fall back to the head of the chunk
+    order = np.argsort(-scores, kind="stable") if scores.max() > 0 else range(len(groups))
+    for g in order:
+        if keep.any() and scores[g] <= 0 and scores.max() > 0:
+            break
+        s, e = groups[g]
+        s, e = max(0, s - CONTEXT_LINES), min(len(lines), e + CONTEXT_LINES)
+        cost = sum(line_tokens[i] for i in range(s, e) if not keep[i])
+        if keep.any() and used + cost > max_tokens:
+            continue
+        keep[s:e] = True
+        used += cost
+    spans: List[List[int]] = []
+    parts: List[str] = []
+    i = 0
+    while i < len(lines):
+        if not keep[i]:
+            i += 1
+            continue
+        j = i
+        while j + 1 < len(lines) and keep[j + 1]:
+            j += 1
+        if parts:
+            parts.append(GAP_MARKER)
+        parts.append("\n".join(lines[i:j + 1]))
+        spans.append([first + i, first + j])
+        i = j + 1
+    out = dict(hit)
+    out["text"] = "\n".join(parts)
+    out["spans"] = spans
+    out["line_start"], out["line_end"] = spans[0][0], spans[-1][1]
+    out["tokens_before"] = before
+    out["tokens_after"] = count_tokens(out["text"])
+    return out
+
+
+def split_hits(hits: List[Dict]) -> Tuple[List[List[Tuple[int, int]]], List[str]]:
+    """Line groups per hit and the flat list of group texts (for batch scoring)."""
+    per_hit, texts = [], []
+    for h in hits:
+        lines = h.get("text", "").split("\n")
+        groups = line_groups(h.get("text", ""))
+        per_hit.append(groups)
+        texts.extend("\n".join(lines[s:e]) for s, e in groups)
+    return per_hit, texts
+
+
+def compress_hits(hits: List[Dict], per_hit: List[List[Tuple[int, int]]], scores: np.ndarray, max_tokens: int,
+                  count_tokens: Callable[[str], int]) -> List[Dict]:
+    out, k = [], 0
+    for h, groups in zip(hits, per_hit):
+        out.append(compress_hit(h, groups, scores[k:k + len(groups)], max_tokens, count_tokens))
+        k += len(groups)
+    return out
+
@@ -0,0 +1,190 @@
+"""Embedding providers selected by EMBEDDING_PROVIDER.
+
+- ``gemini``: remote Gemini embeddings (GeminiService).
+- ``local``: CPU-only hashed n-gram TF-IDF embedder; no network, microseconds per query.
+
+Providers share one async surface: ``embed_texts(texts, repo=None, fit=False)``
+returning an (n, dim) array-like and ``embed_query(text, repo=None)`` returning one
+vector. ``repo`` lets stateful providers (the local IDF weights) keep per-repo state;
+``fit=True`` (full rebuilds only) refits that state into a staged copy, which ``publish``
+makes live once the rebuilt index is written and ``discard`` drops. Stateless providers
+ignore all of it.
+"""
+import math
+import os
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_PROVIDER, LOCAL_EMBED_DIM, VECTOR_DIR
+from utils.executor import run_blocking
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]*|[0-9]+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+class EmbeddingProvider:
+    name = ""
+    dim = 0
+
+    async def embed_texts(self, texts: List[str], repo: Optional[str] = None,
+                          fit: bool = False) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def embed_query(self, text: str, repo: Optional[str] = None) -> List[float]:
+        arr = await self.embed_texts([text], repo=repo)
+        return arr[0] if len(arr) else []
+
+    def publish(self, repo: str):
+        """Make state fitted by a full rebuild live; no-op for stateless providers."""
+
+    def discard(self, repo: str):
+        """Drop fitted state that was not published; no-op for stateless providers."""
+
+
+class GeminiEmbedder(EmbeddingProvider):
+    """Adapter over GeminiService (which already speaks embed_texts/embed_query)."""
+    name = "gemini"
+
+    def __init__(self, service):
+        self.service = service
+
+    async def embed_texts(self, texts: List[str], repo: Optional[str] = None,
+                          fit: bool = False) -> List[List[float]]:
+        return await self.service.embed_texts(texts)
+
+    async def embed_query(self, text: str, repo: Optional[str] = None) -> List[float]:
+        return await self.service.embed_query(text)
+
+
+def _features(text: str) -> List[str]:
+    """Lowercased words, camelCase/snake_case sub-words and word bigrams."""
+    feats: List[str] = []
+    prev = None
+    for w in _WORD.findall(text):
+        lw = w.lower()
+        feats.append(lw)
+        parts = _CAMEL.findall(w)
+        if len(parts) > 1:
+            feats.extend(p.lower() for p in parts)
+        if prev is not None:
+            feats.append(f"{prev} {lw}")
+        prev = lw
+    return feats
+
+
+class LocalEmbedder(EmbeddingProvider):
+    """Hashed n-gram features with sublinear TF and per-repo IDF, projected into ``dim`` signed buckets.
+
+    IDF weights are fitted on a full rebuild of a repo (``embed_texts(..., fit=True)``) into
+    ``<repo>.idf.next.npy`` and renamed over ``<repo>.idf.npy`` by ``publish`` after the new
+    index is in place, so queries never mix old vectors with new weights. Later batches
+    and queries reuse the live weights so vectors stay comparable across incremental updates.
+    """
+    name = "local"
+
+    def __init__(self, dim: int = LOCAL_EMBED_DIM, state_dir: str = VECTOR_DIR):
+        self.dim = dim
+        self.state_dir = state_dir
+        self._idf: Dict[str, tuple] = {}  # repo -> (file stamp, weights); a replaced file is re-read
+        self._buckets: Dict[str, tuple] = {}
+
+    def _bucket(self, feat: str):
+        b = self._buckets.get(feat)
+        if b is None:
+            h = zlib.crc32(feat.encode("utf-8"))
+            b = (h % self.dim, 1.0 if (h >> 31) & 1 else -1.0)
+            if len(self._buckets) < 1_000_000:
+                self._buckets[feat] = b
+        return b
+
+    def _tf(self, texts: List[str]) -> np.ndarray:
+        M = np.zeros((len(texts), self.dim), dtype="float32")
+        for r, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            for f in _features(text):
+                counts[f] = counts.get(f, 0) + 1
+            row = M[r]
+            for f, c in counts.items():
+                col, sign = self._bucket(f)
+                row[col] += sign * (1.0 + math.log(c))
+        return M
+
+    def _idf_path(self, repo: str) -> str:
+        return os.path.join(self.state_dir, f"{repo.replace('/', '__')}.idf.npy")
+
+    def _load_idf(self, repo: Optional[str]) -> Optional[np.ndarray]:
+        if not repo:
+            return None
+        path = self._idf_path(repo)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_ino)  # publish renames a new file in
+        cached = self._idf.get(repo)
+        if cached is None or cached[0] != stamp:
+            cached = self._idf[repo] = (stamp, np.load(path))
+        return cached[1]
+
+    def _staged_path(self, repo: str) -> str:
+        return os.path.join(self.state_dir, f"{repo.replace('/', '__')}.idf.next.npy")
+
+    def _fit_idf(self, repo: str, M: np.ndarray) -> np.ndarray:
+        """Fit IDF weights on a full rebuild's chunks and stage them; the live weights stay in use."""
+        n = M.shape[0]
+        df = np.count_nonzero(M, axis=0)
+        idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype("float32")
+        os.makedirs(self.state_dir, exist_ok=True)
+        staged = self._staged_path(repo)
+        with open(staged + ".tmp", "wb") as f:
+            np.save(f, idf)
+        os.replace(staged + ".tmp", staged)
+        return idf
+
+    def publish(self, repo: str):
+        """Rename staged weights over the live ones, once the index they were fitted for is written."""
+        staged = self._staged_path(repo)
+        if os.path.exists(staged):
+            os.replace(staged, self._idf_path(repo))
+            self._idf.pop(repo, None)
+
+    def discard(self, repo: str):
+        staged = self._staged_path(repo)
+        if os.path.exists(staged):
+            os.remove(staged)
+
+    def embed_array(self, texts: List[str], repo: Optional[str] = None, fit: bool = False) -> np.ndarray:
+        """Embed ``texts`` with the repo's live IDF; ``fit`` (full rebuilds only) fits and stages new weights first.
+
+        Incremental batches and query-time calls never write IDF state: weights fitted on
+        a partial batch would no longer match the vectors already in the index.
+        """
+        M = self._tf(texts)
+        idf = self._fit_idf(repo, M) if fit and repo else self._load_idf(repo)
+        if idf is not None:
+            M *= idf
+        M /= np.linalg.norm(M, axis=1, keepdims=True) + 1e-12
+        return M
+
+    async def embed_texts(self, texts: List[str], repo: Optional[str] = None, fit: bool = False) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dim), dtype="float32")
+        # whole-repo batches take seconds of CPU: keep them off the event loop
+        return await run_blocking(self.embed_array, texts, repo, fit)
+
+    async def embed_query(self, text: str, repo: Optional[str] = None) -> np.ndarray:
+        return self.embed_array([text], repo)[0]
+
+
+def get_embedder(name: str = EMBEDDING_PROVIDER, gemini=None) -> EmbeddingProvider:
+    if name == "local":
+        return LocalEmbedder()
+    if name == "gemini":
+        if gemini is None:
+            from services.gemini_service import GeminiService
+            gemini = GeminiService()
+        return GeminiEmbedder(gemini)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {name!r} (expected 'gemini' or 'local')")
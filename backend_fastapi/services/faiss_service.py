@@ -1,55 +1,466 @@
 import os
+from collections import OrderedDict
 import numpy as np
 try:
     import faiss  # type: ignore
 except Exception:
     faiss = None  # graceful degradation if FAISS is not installed
+import bisect
 import json
-from config import VECTOR_DIR
-from typing import List, Dict
+import logging
+import threading
+from config import VECTOR_DIR, INDEX_BUILD_PROCS, INDEX_CACHE_SIZE, INDEX_MMAP, INDEX_SHARD_MODE, INDEX_SHARD_SIZE
+from typing import List, Dict, Optional, Set, Tuple
+from services.catalog_service import RepoCatalog
+from services.chunking_service import chunk_hash
+from services.file_filter import glob_match
+from services.index_shards import ShardedIndex, build_shards, merge_shards, read_manifest, shard_files
+from utils.executor import run_blocking
+from utils.metrics import CACHE_HITS, INDEX_MEMORY_BYTES
+from utils.timing import stage
+
+logger = logging.getLogger("FaissService")
+
+LANGUAGE_BY_EXT = {
+    ".py": "python", ".pyi": "python", ".ipynb": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".java": "java", ".kt": "kotlin", ".kts": "kotlin",
+    ".scala": "scala", ".go": "go", ".rs": "rust", ".rb": "ruby", ".php": "php", ".cs": "csharp",
+    ".c": "c", ".h": "c", ".cc": "cpp", ".cpp": "cpp", ".cxx": "cpp", ".hpp": "cpp", ".hh": "cpp",
+    ".m": "objective-c", ".mm": "objective-c", ".swift": "swift", ".sql": "sql",
+    ".sh": "shell", ".bash": "shell", ".zsh": "shell", ".md": "markdown", ".mdx": "markdown", ".rst": "rst",
+    ".txt": "text", ".yml": "yaml", ".yaml": "yaml", ".toml": "toml", ".ini": "ini", ".json": "json",
+    ".html": "html", ".css": "css", ".scss": "css", ".vue": "vue", ".svelte": "svelte",
+}
+
+
+class PathFacets:
+    """Per-repo id sets for query-time filters, built once per loaded index.
+
+    Extension and language sets are packed bitmaps (1 bit per vector) precomputed
+    at load; path prefixes/globs resolve over the distinct paths (a bisect for
+    prefixes), not over every chunk. ``select`` returns a packed bitmap usable
+    directly as a FAISS IDSelectorBitmap.
+    """
+
+    def __init__(self, meta: List[Dict]):
+        self.n = len(meta)
+        by_path: Dict[str, List[int]] = {}
+        for i, m in enumerate(meta):
+            by_path.setdefault(m.get('path', ''), []).append(i)
+            # a near-duplicate representative also stands for its members' paths
+            for d in m.get('duplicates', ()):
+                if d['path'] != m.get('path'):
+                    by_path.setdefault(d['path'], []).append(i)
+        self.paths = sorted(by_path)
+        self.path_ids = {p: np.asarray(ids, dtype='int64') for p, ids in by_path.items()}
+        ext_masks: Dict[str, np.ndarray] = {}
+        lang_masks: Dict[str, np.ndarray] = {}
+        for p, ids in self.path_ids.items():
+            ext = os.path.splitext(p)[1].lower()
+            for key, masks in ((ext, ext_masks), (LANGUAGE_BY_EXT.get(ext, ""), lang_masks)):
+                if key:
+                    mask = masks.get(key)
+                    if mask is None:
+                        mask = masks[key] = np.zeros(self.n, dtype=bool)
+                    mask[ids] = True
+        self.ext_bits = {k: np.packbits(v, bitorder='little') for k, v in ext_masks.items()}
+        self.lang_bits = {k: np.packbits(v, bitorder='little') for k, v in lang_masks.items()}
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros((self.n + 7) // 8, dtype=np.uint8)
+
+    def _paths_bits(self, paths: List[str]) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool)
+        for p in paths:
+            mask[self.path_ids[p]] = True
+        return np.packbits(mask, bitorder='little')
+
+    def without(self, paths: List[str]) -> Optional[np.ndarray]:
+        """Packed bitmap of every id not stored under ``paths``; None when none of them is indexed."""
+        paths = [p for p in paths if p in self.path_ids]
+        return np.bitwise_not(self._paths_bits(paths)) if paths else None
+
+    def _prefix_paths(self, prefix: str) -> List[str]:
+        prefix = prefix.lstrip('/')
+        lo = bisect.bisect_left(self.paths, prefix)
+        hi = bisect.bisect_left(self.paths, prefix + '\U0010ffff')
+        return self.paths[lo:hi]
+
+    def select(self, filters: Dict[str, List[str]]) -> Tuple[Optional[np.ndarray], int]:
+        """(packed bitmap, matching vector count); bitmap is None when no filter is set.
+
+        Values within one filter are OR-ed, different filters are AND-ed.
+        """
+        filters = {k: [v] if isinstance(v, str) else (v or []) for k, v in filters.items()}
+        parts = []
+        prefixes, globs = filters.get('path_prefix', []), filters.get('path_glob', [])
+        if prefixes or globs:
+            paths = {p for pre in prefixes for p in self._prefix_paths(pre)}
+            paths.update(p for p in self.paths for g in globs if glob_match(g, p))
+            parts.append(self._paths_bits(sorted(paths)))
+        exts = filters.get('extension', [])
+        if exts:
+            wanted = {e.lower() if e.startswith('.') else f".{e.lower()}" for e in exts}
+            parts.append(np.bitwise_or.reduce([self.ext_bits.get(e, self._empty()) for e in wanted]))
+        langs = filters.get('language', [])
+        if langs:
+            parts.append(np.bitwise_or.reduce([self.lang_bits.get(lang.lower(), self._empty()) for lang in langs]))
+        if not parts:
+            return None, self.n
+        bits = np.bitwise_and.reduce(parts) if len(parts) > 1 else parts[0]
+        return bits, int(np.unpackbits(bits, bitorder='little', count=self.n).sum())
+
+def overlay_key(repo: str, ref: str) -> str:
+    """Storage key of a branch/PR overlay on the repo's default-branch index."""
+    return f"{repo}@{ref}"
+
 
 class FaissService:
-    def __init__(self):
-        os.makedirs(VECTOR_DIR, exist_ok=True)
+    """Per-repo FAISS indexes on disk with an LRU of loaded copies.
+
+    A branch or PR is stored as an overlay under ``overlay_key(repo, ref)``: an
+    index of the chunks of paths that differ from the default branch, plus the list
+    of those paths (``masked`` in its state). Searching the ref searches the base
+    index with the masked paths excluded and the overlay, and merges both by score.
+
+    The sync methods block on files and FAISS/NumPy work and may run on any thread;
+    the async ones (``upsert``, ``replace_paths``, ``search``) hand that work to the
+    CPU pool so the event loop never waits on it.
+    """
+
+    def __init__(self, base_dir: str = VECTOR_DIR):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        # repo -> (file stamp, (index, meta, vectors)); LRU-bounded
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # repo -> (meta list it was built from, PathFacets); dropped with the cache entry
+        self._facets: Dict[str, tuple] = {}
+        self._lock = threading.RLock()  # guards _cache/_facets across pool threads
+        self._loading: Dict[str, threading.Lock] = {}  # one reader per repo; others wait for its result
+        # overlay key -> (state file stamp, base meta it was built for, packed bitmap of visible base ids)
+        self._masks: Dict[str, tuple] = {}
+        self.catalog = RepoCatalog(base_dir)
 
     def _paths(self, repo: str):
         safe = repo.replace('/', '__')
         return (
-            os.path.join(VECTOR_DIR, f"{safe}.faiss"),
-            os.path.join(VECTOR_DIR, f"{safe}.meta.jsonl"),
-            os.path.join(VECTOR_DIR, f"{safe}.vecs.npy"),
+            os.path.join(self.base_dir, f"{safe}.faiss"),
+            os.path.join(self.base_dir, f"{safe}.meta.jsonl"),
+            os.path.join(self.base_dir, f"{safe}.vecs.npy"),
         )
 
+    def _state_path(self, repo: str) -> str:
+        return os.path.join(self.base_dir, f"{repo.replace('/', '__')}.state.json")
+
+    def load_state(self, repo: str) -> Dict:
+        """Indexing state: last indexed head SHA, blob SHA per path, embedder name."""
+        path = self._state_path(repo)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_state(self, repo: str, state: Dict):
+        path = self._state_path(repo)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+        overlay = {k: state[k] for k in ("base", "ref") if k in state}
+        self.catalog.update(repo, head=state.get("head", ""), embedder=state.get("embedder", ""), **overlay)
+
+    def has_index(self, repo: str) -> bool:
+        return all(os.path.exists(p) for p in self._paths(repo))
+
+    def has_ref(self, repo: str, ref: str) -> bool:
+        return os.path.exists(self._state_path(overlay_key(repo, ref)))
+
+    def refs(self, repo: str) -> List[str]:
+        """Refs indexed as overlays on ``repo``."""
+        return sorted(e["ref"] for e in self.catalog.all().values() if e.get("base") == repo and e.get("ref"))
+
+    def delete(self, repo: str):
+        """Drop a repo's index (and its overlays) or a single overlay."""
+        for ref in self.refs(repo):
+            self.delete(overlay_key(repo, ref))
+        for p in (*self._paths(repo), self._state_path(repo), *shard_files(self.base_dir, repo.replace('/', '__'))):
+            if os.path.exists(p):
+                os.remove(p)
+        self._evict(repo)
+        self.catalog.remove(repo)
+
+    def _evict(self, repo: str):
+        with self._lock:
+            self._facets.pop(repo, None)
+            for key in [k for k in self._masks if k == repo or k.startswith(repo + "@")]:
+                del self._masks[key]
+            if self._cache.pop(repo, None) is not None:
+                INDEX_MEMORY_BYTES.remove(repo=repo)
+
+    def _cached(self, repo: str, stamp: tuple):
+        with self._lock:
+            cached = self._cache.get(repo)
+            if cached is not None and cached[0] == stamp:
+                self._cache.move_to_end(repo)
+                CACHE_HITS.inc(cache="index")
+                return cached[1]
+        return None
+
+    def _load(self, repo: str):
+        """Return (index, meta, vectors) for a repo, reusing the cached copy while files are unchanged."""
+        paths = self._paths(repo)
+        if faiss is None or not all(os.path.exists(p) for p in paths):
+            return None
+        stamp = tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+        loaded = self._cached(repo, stamp)
+        if loaded is not None:
+            return loaded
+        with self._lock:
+            load_lock = self._loading.setdefault(repo, threading.Lock())
+        with load_lock:
+            # another thread may have loaded this version while we waited
+            loaded = self._cached(repo, stamp)
+            if loaded is not None:
+                return loaded
+            idx_path, meta_path, vec_path = paths
+            with stage("index_load"):
+                # mapped files are paged in on demand and shared between workers; writers
+                # replace files instead of rewriting them, so a live mapping stays valid
+                mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) if INDEX_MMAP else 0
+                manifest = read_manifest(idx_path)
+                if manifest is not None:
+                    index = ShardedIndex.load(manifest, self.base_dir, mmap_flag)
+                else:
+                    index = faiss.read_index(idx_path, mmap_flag) if mmap_flag else faiss.read_index(idx_path)
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = [json.loads(line) for line in f if line.strip()]
+                vecs = np.load(vec_path, mmap_mode='r' if INDEX_MMAP else None)
+                if vecs.dtype != np.float32:
+                    vecs = vecs.astype('float32')
+            loaded = (index, meta, vecs)
+            with self._lock:
+                self._cache[repo] = (stamp, loaded)
+                self._cache.move_to_end(repo)
+                INDEX_MEMORY_BYTES.set(
+                    index.ntotal * index.d * 4 + vecs.nbytes + sum(len(m.get('text', '')) for m in meta),
+                    repo=repo,
+                )
+                while len(self._cache) > max(1, INDEX_CACHE_SIZE):
+                    self._evict(next(iter(self._cache)))
+        return loaded
+
     async def upsert(self, repo: str, vectors: np.ndarray, meta: List[Dict]):
+        return await run_blocking(self._write, repo, vectors, meta)
+
+    def _write(self, repo: str, vectors: np.ndarray, meta: List[Dict]):
+        """Rebuild the repo's index from scratch and persist index, meta and vectors.
+
+        Above INDEX_SHARD_SIZE vectors (when set) the index is laid out as shard
+        files (see ``services.index_shards``), kept as shards or merged back.
+        """
         idx_path, meta_path, vec_path = self._paths(repo)
+        safe = repo.replace('/', '__')
         if vectors.size == 0:
             return 0, 0
         if faiss is None:
             # Cannot persist vectors without FAISS installed
             return 0, 0
-        Vn = vectors.astype('float32')
+        Vn = np.asarray(vectors, dtype='float32')
         dim = Vn.shape[1]
-        index = faiss.IndexFlatIP(dim)
-        index.add(Vn)
-        faiss.write_index(index, idx_path)
-        with open(meta_path, 'w', encoding='utf-8') as f:
+        # write aside and rename: loaded copies may still map the old files
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
             for m in meta:
                 f.write(json.dumps(m, ensure_ascii=False) + '\n')
-        np.save(vec_path, vectors)
+        with open(vec_path + ".tmp", 'wb') as f:
+            np.save(f, Vn)
+        manifest = None
+        if 0 < INDEX_SHARD_SIZE < len(Vn):
+            with stage("shard_build"):
+                # workers map the vectors file written above instead of receiving copies
+                manifest = build_shards(vec_path + ".tmp", len(Vn), INDEX_SHARD_SIZE, self.base_dir, safe,
+                                        INDEX_BUILD_PROCS)
+            if INDEX_SHARD_MODE == "serve":
+                with open(idx_path + ".tmp", 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f)
+                index_type = ShardedIndex.__name__
+            else:
+                with stage("shard_merge"):
+                    index = merge_shards(manifest, self.base_dir)
+                    faiss.write_index(index, idx_path + ".tmp")
+                index_type = type(index).__name__
+                del index
+                manifest = None
+        else:
+            index = faiss.IndexFlatIP(dim)
+            index.add(Vn)
+            faiss.write_index(index, idx_path + ".tmp")
+            index_type = type(index).__name__
+        for p in (meta_path, vec_path, idx_path):
+            os.replace(p + ".tmp", p)
+        # shards of earlier builds (or merged ones): loaded copies keep their mappings after unlink
+        live = {os.path.join(self.base_dir, s["file"]) for s in manifest["shards"]} if manifest else set()
+        for p in shard_files(self.base_dir, safe):
+            if p not in live:
+                os.remove(p)
+        self._evict(repo)
+        self.catalog.update(
+            repo,
+            chunks=len(meta),
+            files=len({m.get('path', '') for m in meta}),
+            index_type=index_type,
+            shards=len(manifest["shards"]) if manifest else 0,
+            dim=int(dim),
+            bytes=sum(os.path.getsize(p) for p in (idx_path, meta_path, vec_path, *live)),
+        )
         return len(meta), len(meta)
 
-    async def search(self, repo: str, query_vec: np.ndarray, top_k: int):
-        idx_path, meta_path, vec_path = self._paths(repo)
-        if faiss is None:
+    def vectors_by_hash(self, repo: str, hashes: Set[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors for chunks whose content hash is in ``hashes`` (any path)."""
+        loaded = self._load(repo)
+        if loaded is None or not hashes:
+            return {}
+        _, meta, vecs = loaded
+        out: Dict[str, np.ndarray] = {}
+        for i, m in enumerate(meta):
+            # indexes written before content keys existed carry no hash: derive it
+            h = m.get('hash') or chunk_hash(m.get('text', ''))
+            if h in hashes and h not in out:
+                out[h] = vecs[i]
+        return out
+
+    async def replace_paths(self, repo: str, remove_paths: Set[str], vectors: Optional[np.ndarray], meta: List[Dict]) -> Tuple[int, int, int]:
+        """Drop every chunk whose path is in remove_paths, append the new chunks, rebuild once.
+
+        Returns (total_chunks, added_chunks, removed_chunks), where removed counts
+        dropped chunks whose key does not come back with the new ones.
+        """
+        return await run_blocking(self._replace_paths, repo, remove_paths, vectors, meta)
+
+    def _replace_paths(self, repo: str, remove_paths: Set[str], vectors: Optional[np.ndarray], meta: List[Dict]):
+        loaded = self._load(repo)
+        old_meta, old_V = (loaded[1], loaded[2]) if loaded is not None else ([], None)
+        keep = [i for i, m in enumerate(old_meta) if m.get('path') not in remove_paths]
+        new_keys = {m.get('key') for m in meta}
+        removed = sum(1 for m in old_meta if m.get('path') in remove_paths and m.get('key') not in new_keys)
+        parts = []
+        if keep and old_V is not None:
+            parts.append(old_V[keep])
+        if vectors is not None and len(meta):
+            parts.append(np.asarray(vectors, dtype='float32'))
+        if not parts:
+            self.delete(repo)
+            return 0, 0, removed
+        merged = [old_meta[i] for i in keep] + list(meta)
+        self._write(repo, np.vstack(parts), merged)
+        return len(merged), len(meta), removed
+
+    def linked_paths(self, repo: str, paths: Set[str]) -> Set[str]:
+        """Paths sharing a near-duplicate cluster with ``paths``, transitively.
+
+        Replacing a path drops the representatives stored under it, so every path
+        whose chunks they stand for has to be re-chunked in the same run.
+        """
+        loaded = self._load(repo)
+        if loaded is None:
+            return set()
+        groups = [{m.get('path', '')} | {d['path'] for d in m['duplicates']} for m in loaded[1] if m.get('duplicates')]
+        linked = set(paths)
+        grew = True
+        while grew:
+            grew = False
+            for g in groups:
+                if not g <= linked and g & linked:
+                    linked |= g
+                    grew = True
+        return linked - set(paths)
+
+    def facets(self, repo: str) -> Optional[PathFacets]:
+        loaded = self._load(repo)
+        if loaded is None:
+            return None
+        meta = loaded[1]
+        with self._lock:
+            cached = self._facets.get(repo)
+        if cached is None or cached[0] is not meta:
+            cached = (meta, PathFacets(meta))
+            with self._lock:
+                self._facets[repo] = cached
+        return cached[1]
+
+    async def search(self, repo: str, query_vec: np.ndarray, top_k: int, filters: Optional[Dict] = None,
+                     ref: Optional[str] = None):
+        """Top-k by inner product; ``filters`` (path_prefix, path_glob, extension, language)
+        restrict the candidates inside FAISS through an IDSelector, not by post-filtering.
+        With ``ref``, searches that branch/PR: the base minus its masked paths plus its overlay."""
+        return await run_blocking(self._search, repo, query_vec, top_k, filters, ref)
+
+    def _search(self, repo: str, query_vec: np.ndarray, top_k: int, filters: Optional[Dict] = None,
+                ref: Optional[str] = None):
+        if not ref:
+            return self._search_index(repo, query_vec, top_k, filters)
+        if not self.has_ref(repo, ref) or self.facets(repo) is None:
             return []
-        if not (os.path.exists(idx_path) and os.path.exists(meta_path) and os.path.exists(vec_path)):
+        hits = self._search_index(repo, query_vec, top_k, filters, self._overlay_mask(repo, ref))
+        for h in self._search_index(overlay_key(repo, ref), query_vec, top_k, filters):
+            h['_overlay'] = True
+            hits.append(h)
+        hits.sort(key=lambda h: -h['score'])
+        hits = hits[:top_k]
+        for rank, h in enumerate(hits):
+            h['rank'] = rank
+        return hits
+
+    def _overlay_mask(self, repo: str, ref: str) -> Optional[np.ndarray]:
+        """Packed bitmap of the base ids a ref still sees (its masked paths cleared); None when it sees all.
+
+        Cached per overlay until its state file or the loaded base index changes.
+        """
+        key = overlay_key(repo, ref)
+        st = os.stat(self._state_path(key))
+        stamp = (st.st_mtime_ns, st.st_size)
+        facets = self.facets(repo)
+        meta = self._load(repo)[1]
+        with self._lock:
+            cached = self._masks.get(key)
+        if cached is not None and cached[0] == stamp and cached[1] is meta:
+            return cached[2]
+        visible = facets.without(self.load_state(key).get('masked', []))
+        with self._lock:
+            self._masks[key] = (stamp, meta, visible)
+        return visible
+
+    def _search_index(self, repo: str, query_vec: np.ndarray, top_k: int, filters: Optional[Dict] = None,
+                      visible: Optional[np.ndarray] = None):
+        loaded = self._load(repo)
+        if loaded is None:
+            return []
+        index, meta, _ = loaded
+        bits = None
+        if filters:
+            with stage("faiss_filter"):
+                bits, count = self.facets(repo).select(filters)
+            if count == 0:
+                return []
+            if count == len(meta):
+                bits = None
+        if visible is not None:
+            bits = visible if bits is None else np.bitwise_and(bits, visible)
+        if query_vec.shape[-1] != index.d:
+            # Index was built by a different embedding provider/model; it must be rebuilt
+            logger.warning("Query dim %d != index dim %d for %s; re-index the repo", query_vec.shape[-1], index.d, repo)
             return []
-        index = faiss.read_index(idx_path)
-        meta = [json.loads(line) for line in open(meta_path, 'r', encoding='utf-8') if line.strip()]
         q = query_vec.astype('float32')[None, :]
-        D, I = index.search(q, top_k)
+        with stage("faiss_search"):
+            if isinstance(index, ShardedIndex):
+                D, labels = index.search(q, top_k, bits)
+            elif bits is not None:
+                sel = faiss.IDSelectorBitmap(bits)  # references `bits`; both stay alive through the search
+                D, labels = index.search(q, top_k, params=faiss.SearchParameters(sel=sel))
+            else:
+                D, labels = index.search(q, top_k)
         hits = []
-        for rank, i in enumerate(I[0].tolist()):
+        for rank, i in enumerate(labels[0].tolist()):
             if 0 <= i < len(meta):
                 m = dict(meta[i])
                 m['rank'] = rank
@@ -58,8 +469,23 @@ class FaissService:
                 hits.append(m)
         return hits
 
+    def hit_vectors(self, repo: str, hits: List[Dict], ref: Optional[str] = None) -> np.ndarray:
+        """Stored vectors of search hits, in hit order (overlay hits come from the ref's overlay)."""
+        base = self._load(repo)
+        overlay = self._load(overlay_key(repo, ref)) if ref else None
+        rows = []
+        for h in hits:
+            src = overlay if h.get('_overlay') else base
+            if src is None or h.get('_vec_index') is None:
+                return np.empty((0, 0), dtype='float32')
+            rows.append(src[2][h['_vec_index']])
+        return np.stack(rows).astype('float32') if rows else np.empty((0, 0), dtype='float32')
+
     def vectors_for_repo(self, repo: str) -> np.ndarray:
         """Load vectors array for a repo (float32)."""
+        loaded = self._load(repo)
+        if loaded is not None:
+            return loaded[2]
         _, _, vec_path = self._paths(repo)
         if not os.path.exists(vec_path):
             return np.empty((0, 0), dtype='float32')
@@ -1,56 +1,223 @@
-# Placeholder for Gemini LLM API integration
-# Use httpx for async HTTP calls
+# Gemini LLM API integration over a long-lived pooled httpx client.
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import httpx
+
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_BASE_URL,
+    GEMINI_EMBED_MODEL,
+    GEMINI_GEN_MODEL,
+    GEMINI_HTTP2,
+    GEMINI_MAX_CONNECTIONS,
+    GEMINI_MAX_KEEPALIVE,
+    GEMINI_KEEPALIVE_EXPIRY,
+    EMBED_CONNECT_TIMEOUT,
+    EMBED_READ_TIMEOUT,
+    GEN_CONNECT_TIMEOUT,
+    GEN_READ_TIMEOUT,
+    GEMINI_HEDGE_QUERY,
+    GEMINI_HEDGE_DELAY,
+    GEMINI_HEDGE_MIN_SAMPLES,
+    HTTP_TIMEOUT,
+)
+from utils.metrics import EMBEDDING_CALLS, UPSTREAM_ERRORS
+
+try:
+    import h2  # noqa: F401  (HTTP/2 support for httpx)
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+EMBED_TIMEOUT = httpx.Timeout(HTTP_TIMEOUT, connect=EMBED_CONNECT_TIMEOUT, read=EMBED_READ_TIMEOUT)
+GEN_TIMEOUT = httpx.Timeout(HTTP_TIMEOUT, connect=GEN_CONNECT_TIMEOUT, read=GEN_READ_TIMEOUT)
+
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _embed_url() -> str:
+    return f"{GEMINI_BASE_URL}/{GEMINI_EMBED_MODEL}:batchEmbedContents"
+
+
+def _gen_url() -> str:
+    return f"{GEMINI_BASE_URL}/{GEMINI_GEN_MODEL}:generateContent"
+
+
+def _new_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=GEMINI_MAX_KEEPALIVE,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        http2=GEMINI_HTTP2 and _H2_AVAILABLE,
+        limits=limits,
+        timeout=httpx.Timeout(HTTP_TIMEOUT),
+        headers={"x-goog-api-key": GEMINI_API_KEY} if GEMINI_API_KEY else None,
+    )
+
+
+def shared_client() -> httpx.AsyncClient:
+    """Process-wide pooled client, created lazily on first use in the running loop."""
+    global _shared_client, _shared_loop
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_client.is_closed or _shared_loop is not loop:
+        # Pooled connections are bound to the loop that opened them
+        _shared_client = _new_client()
+        _shared_loop = loop
+    return _shared_client
+
+
+async def close_shared_client():
+    global _shared_client, _shared_loop
+    if _shared_client is not None and not _shared_client.is_closed and _shared_loop is asyncio.get_running_loop():
+        await _shared_client.aclose()
+    _shared_client = None
+    _shared_loop = None
+
+
+class LatencyStats:
+    """Rolling window of call latencies (seconds) for one call kind."""
+
+    def __init__(self, window: int = 512):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        data = sorted(self.samples)
+        i = min(len(data) - 1, int(round(q * (len(data) - 1))))
+        return data[i]
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
 
 class GeminiService:
-    def __init__(self):
-        import httpx
-        from config import GEMINI_API_KEY, GEMINI_EMBED_MODEL, GEMINI_GEN_MODEL, HTTP_TIMEOUT
-        from typing import List
-
-        def _embed_url() -> str:
-            return f"https://generativelanguage.googleapis.com/v1/{GEMINI_EMBED_MODEL}:batchEmbedContents?key={GEMINI_API_KEY}"
-
-        def _gen_url() -> str:
-            return f"https://generativelanguage.googleapis.com/v1/models/{GEMINI_GEN_MODEL}:generateContent?key={GEMINI_API_KEY}"
-
-        class GeminiService:
-            def __init__(self):
-                pass
-
-            async def embed_texts(self, texts: List[str]) -> List[List[float]]:
-                if not texts:
-                    return []
-                payload = {
-                    "requests": [
-                        {"model": GEMINI_EMBED_MODEL, "content": {"parts":[{"text": t}]}}
-                        for t in texts
-                    ]
-                }
-                async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                    r = await client.post(_embed_url(), json=payload)
-                    r.raise_for_status()
-                    data = r.json()
-                    return [resp.get("embedding", {}).get("values", []) for resp in data.get("responses", [])]
-
-            async def embed_query(self, text: str) -> List[float]:
-                arr = await self.embed_texts([text])
-                return arr[0] if arr else []
-
-            async def generate(self, question: str, context: str) -> str:
-                prompt = (
-                    "You are an expert open-source developer.\n"
-                    f"Context:\n{context}\n\n"
-                    f"Question: {question}\n"
-                    "Provide a clear, concise answer with citations (file paths)."
-                )
-                payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
-                async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                    r = await client.post(_gen_url(), json=payload)
-                    r.raise_for_status()
-                    data = r.json()
-                    return (
-                        data.get("candidates", [{}])[0]
-                        .get("content", {})
-                        .get("parts", [{}])[0]
-                        .get("text", "")
-                    )
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, hedge_query: bool = GEMINI_HEDGE_QUERY):
+        self._client = client
+        self.hedge_query = hedge_query
+        self.latency = {"embed": LatencyStats(), "embed_query": LatencyStats(), "generate": LatencyStats()}
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client if self._client is not None else shared_client()
+
+    def stats(self) -> Dict:
+        out = {kind: s.snapshot() for kind, s in self.latency.items()}
+        out["hedges"] = {"fired": self.hedges_fired, "won": self.hedges_won}
+        return out
+
+    async def _post(self, kind: str, url: str, payload: Dict, timeout: httpx.Timeout) -> Dict:
+        t0 = time.perf_counter()
+        if kind != "generate":
+            EMBEDDING_CALLS.inc(kind=kind)
+        try:
+            r = await self.client.post(url, json=payload, timeout=timeout)
+            r.raise_for_status()
+            data = r.json()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.latency[kind].errors += 1
+            UPSTREAM_ERRORS.inc(service="gemini", call=kind)
+            raise
+        self.latency[kind].observe(time.perf_counter() - t0)
+        return data
+
+    @staticmethod
+    def _embed_payload(texts: List[str]) -> Dict:
+        return {
+            "requests": [
+                {"model": GEMINI_EMBED_MODEL, "content": {"parts": [{"text": t}]}}
+                for t in texts
+            ]
+        }
+
+    @staticmethod
+    def _embed_values(data: Dict) -> List[List[float]]:
+        return [resp.get("embedding", {}).get("values", []) for resp in data.get("responses", [])]
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        data = await self._post("embed", _embed_url(), self._embed_payload(texts), EMBED_TIMEOUT)
+        return self._embed_values(data)
+
+    def _hedge_delay(self) -> float:
+        stats = self.latency["embed_query"]
+        if len(stats.samples) < GEMINI_HEDGE_MIN_SAMPLES:
+            return GEMINI_HEDGE_DELAY
+        return stats.percentile(0.95)
+
+    async def _hedged(self, payload: Dict) -> Dict:
+        """Send the request; if it outlives the p95 budget, race a duplicate and keep the first reply."""
+        def call():
+            return self._post("embed_query", _embed_url(), payload, EMBED_TIMEOUT)
+
+        primary = asyncio.ensure_future(call())
+        pending = {primary}
+        try:
+            # cancelling the caller at any await below also cancels every request still in flight
+            done, _ = await asyncio.wait(pending, timeout=self._hedge_delay())
+            if done:
+                return primary.result()
+            self.hedges_fired += 1
+            hedge = asyncio.ensure_future(call())
+            pending.add(hedge)
+            last_exc: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_exc = task.exception()
+            raise last_exc
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def embed_query(self, text: str) -> List[float]:
+        payload = self._embed_payload([text])
+        if self.hedge_query:
+            data = await self._hedged(payload)
+        else:
+            data = await self._post("embed_query", _embed_url(), payload, EMBED_TIMEOUT)
+        arr = self._embed_values(data)
+        return arr[0] if arr else []
+
+    async def generate(self, question: str, context: str) -> str:
+        prompt = (
+            "You are an expert open-source developer.\n"
+            f"Context:\n{context}\n\n"
+            f"Question: {question}\n"
+            "Provide a clear, concise answer with citations (file paths)."
+        )
+        payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        data = await self._post("generate", _gen_url(), payload, GEN_TIMEOUT)
+        return (
+            data.get("candidates", [{}])[0]
+            .get("content", {})
+            .get("parts", [{}])[0]
+            .get("text", "")
+        )
@@ -1,9 +1,20 @@
 import httpx
 import logging
+import re
+from urllib.parse import quote
 from config import GITHUB_TOKEN, HTTP_TIMEOUT
 from typing import List, Dict, Optional
+from utils.metrics import UPSTREAM_ERRORS
 
 GITHUB_API = "https://api.github.com"
+# "pull/123", "pull/123/head" or "refs/pull/123/head": the head commit of a pull request
+PULL_REF = re.compile(r"(?:refs/)?pull/(\d+)(?:/head)?")
+
+def _track(r: httpx.Response) -> httpx.Response:
+    # 404 is an expected answer (missing branch/file); anything else non-2xx is an upstream failure
+    if r.status_code >= 400 and r.status_code != 404:
+        UPSTREAM_ERRORS.inc(service="github", status=str(r.status_code))
+    return r
 
 class GitHubService:
     def __init__(self):
@@ -16,24 +27,41 @@ class GitHubService:
         async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
             for branch in (branch_hint, "master"):
                 url = f"{GITHUB_API}/repos/{repo}/commits?sha={branch}&per_page=1"
-                r = await client.get(url, headers=self.headers)
+                r = _track(await client.get(url, headers=self.headers))
                 if r.status_code == 200 and r.json():
                     return r.json()[0]["sha"]
             # fallback: get default branch
             url = f"{GITHUB_API}/repos/{repo}"
-            r = await client.get(url, headers=self.headers)
+            r = _track(await client.get(url, headers=self.headers))
             if r.status_code == 200:
                 branch = r.json().get("default_branch", "main")
                 url = f"{GITHUB_API}/repos/{repo}/commits?sha={branch}&per_page=1"
-                r2 = await client.get(url, headers=self.headers)
+                r2 = _track(await client.get(url, headers=self.headers))
                 if r2.status_code == 200 and r2.json():
                     return r2.json()[0]["sha"]
         return None
 
+    async def resolve_ref(self, repo: str, ref: str) -> Optional[str]:
+        """Commit SHA of a branch, tag, commit or pull request; None when it does not exist.
+
+        Unlike ``get_latest_commit`` there is no fallback to another branch.
+        """
+        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
+            pull = PULL_REF.fullmatch(ref)
+            if pull:
+                r = _track(await client.get(f"{GITHUB_API}/repos/{repo}/pulls/{pull.group(1)}", headers=self.headers))
+                return r.json()["head"]["sha"] if r.status_code == 200 else None
+            name = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+            url = f"{GITHUB_API}/repos/{repo}/commits/{quote(name, safe='/')}"
+            r = _track(await client.get(url, headers=self.headers))
+            if r.status_code == 200:
+                return r.json().get("sha")
+        return None
+
     async def list_files(self, repo: str, branch: str) -> List[Dict]:
         async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
             url = f"{GITHUB_API}/repos/{repo}/git/trees/{branch}?recursive=1"
-            r = await client.get(url, headers=self.headers)
+            r = _track(await client.get(url, headers=self.headers))
             if r.status_code == 200:
                 return [t for t in r.json().get("tree", []) if t.get("type") == "blob"]
         return []
@@ -41,7 +69,7 @@ class GitHubService:
     async def fetch_file(self, repo: str, path: str, branch: str) -> Optional[str]:
         async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
             url = f"https://raw.githubusercontent.com/{repo}/{branch}/{path}"
-            r = await client.get(url, headers=self.headers)
+            r = _track(await client.get(url, headers=self.headers))
             if r.status_code == 200:
                 return r.text
         return None
@@ -0,0 +1,147 @@
+"""Sharded index layout for very large repos (off unless ``INDEX_SHARD_SIZE`` is set).
+
+Above ``INDEX_SHARD_SIZE`` vectors, ``FaissService`` writes the vectors file first
+and writes consecutive id ranges of it as separate shard indexes from a process
+pool; each worker maps the file and only pages in its own slice.
+
+Shards are flat inner-product indexes: there is nothing to train, and adding to
+one is a copy, so sharding does not make a build faster than a single
+``IndexFlatIP.add`` (process spawn, shard writes and re-reads cost more), and the
+parent still holds the full vectors array. Its use is the ``serve`` layout
+(``INDEX_SHARD_MODE=serve``): shards stay on disk as separate files searched by a
+``ShardedIndex``, and the repo's ``.faiss`` file holds a JSON manifest naming
+them. ``merge`` folds them back into one index in memory and exists mainly to
+test that both layouts agree. Shard files carry a generation in their name, so
+a rebuild never rewrites a file that a loaded index may still map.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+try:
+    import faiss  # type: ignore
+except Exception:
+    faiss = None
+
+MANIFEST_FORMAT = "rag-shards-1"
+ALIGN = 8  # shard starts are byte offsets into a packed id bitmap
+
+
+def shard_ranges(n: int, shard_size: int) -> List[Tuple[int, int]]:
+    """[start, end) id ranges of about ``shard_size`` vectors, each starting on a multiple of 8."""
+    size = max(ALIGN, -(-shard_size // ALIGN) * ALIGN)
+    return [(lo, min(n, lo + size)) for lo in range(0, n, size)]
+
+
+def shard_files(base_dir: str, safe: str) -> List[str]:
+    """Every shard file of a repo on disk, any generation."""
+    prefix = f"{safe}.shard-"
+    if not os.path.isdir(base_dir):
+        return []
+    return [os.path.join(base_dir, f) for f in os.listdir(base_dir) if f.startswith(prefix) and f.endswith(".faiss")]
+
+
+def _init_worker():
+    # one OpenMP thread per process: the pool already uses the cores
+    if faiss is not None:
+        faiss.omp_set_num_threads(1)
+
+
+def _build_shard(vec_path: str, lo: int, hi: int, out_path: str) -> int:
+    """Index rows [lo, hi) of the vectors file into ``out_path``; runs in a worker process."""
+    V = np.load(vec_path, mmap_mode="r")
+    index = faiss.IndexFlatIP(V.shape[1])
+    index.add(np.ascontiguousarray(V[lo:hi], dtype="float32"))
+    faiss.write_index(index, out_path + ".tmp")
+    os.replace(out_path + ".tmp", out_path)
+    return hi - lo
+
+
+def build_shards(vec_path: str, n: int, shard_size: int, base_dir: str, safe: str, procs: int) -> Dict:
+    """Build the shards of an ``n``-row vectors file in ``procs`` processes; returns the manifest."""
+    generation = f"{time.time_ns():x}"
+    ranges = shard_ranges(n, shard_size)
+    names = [f"{safe}.shard-{generation}-{i:04d}.faiss" for i in range(len(ranges))]
+    # spawn, not fork: the parent runs FAISS/OpenMP and pool threads, which do not survive a fork
+    with ProcessPoolExecutor(max_workers=max(1, min(procs, len(ranges))), mp_context=get_context("spawn"),
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(_build_shard, vec_path, lo, hi, os.path.join(base_dir, name))
+                   for (lo, hi), name in zip(ranges, names)]
+        for f in futures:
+            f.result()
+    dim = int(np.load(vec_path, mmap_mode="r").shape[1])
+    return {
+        "format": MANIFEST_FORMAT,
+        "generation": generation,
+        "dim": dim,
+        "ntotal": n,
+        "shards": [{"file": name, "start": lo, "count": hi - lo} for (lo, hi), name in zip(ranges, names)],
+    }
+
+
+def merge_shards(manifest: Dict, base_dir: str):
+    """One flat index holding every shard's vectors, in id order."""
+    merged = faiss.IndexFlatIP(manifest["dim"])
+    for s in manifest["shards"]:
+        merged.merge_from(faiss.read_index(os.path.join(base_dir, s["file"])))
+    return merged
+
+
+def read_manifest(path: str) -> Optional[Dict]:
+    """The shard manifest stored at an index path, or None for a regular FAISS index file."""
+    with open(path, "rb") as f:
+        if f.read(1) != b"{":
+            return None
+        f.seek(0)
+        manifest = json.load(f)
+    return manifest if manifest.get("format") == MANIFEST_FORMAT else None
+
+
+class ShardedIndex:
+    """Shard indexes over consecutive id ranges, searched in turn and merged by score.
+
+    Exposes ``d`` and ``ntotal`` like a FAISS index. ``search`` takes the packed
+    id bitmap of a filter instead of SearchParameters: shard starts are multiples
+    of 8, so each shard's selector is a byte slice of the global bitmap.
+    """
+
+    def __init__(self, shards: List, starts: List[int]):
+        self.shards = shards
+        self.starts = starts
+        self.d = shards[0].d if shards else 0
+        self.ntotal = sum(s.ntotal for s in shards)
+
+    @classmethod
+    def load(cls, manifest: Dict, base_dir: str, io_flags: int = 0) -> "ShardedIndex":
+        shards = []
+        for s in manifest["shards"]:
+            path = os.path.join(base_dir, s["file"])
+            shards.append(faiss.read_index(path, io_flags) if io_flags else faiss.read_index(path))
+        return cls(shards, [s["start"] for s in manifest["shards"]])
+
+    def search(self, q: np.ndarray, k: int, bits: Optional[np.ndarray] = None):
+        scores, ids = [], []
+        for shard, lo in zip(self.shards, self.starts):
+            kk = min(k, shard.ntotal)
+            if kk == 0:
+                continue
+            if bits is None:
+                D, labels = shard.search(q, kk)
+            else:
+                sub = bits[lo // 8:(lo + shard.ntotal + 7) // 8]
+                if not sub.any():
+                    continue
+                sel = faiss.IDSelectorBitmap(sub)
+                D, labels = shard.search(q, kk, params=faiss.SearchParameters(sel=sel))
+            found = labels[0] >= 0
+            scores.append(D[0][found])
+            ids.append(labels[0][found] + lo)
+        if not scores:
+            return np.empty((1, 0), dtype="float32"), np.empty((1, 0), dtype="int64")
+        D, labels = np.concatenate(scores), np.concatenate(ids)
+        order = np.argsort(-D, kind="stable")[:k]
+        return D[order][None, :], labels[order][None, :]
@@ -0,0 +1,162 @@
+"""Source backend that reads repositories from local git mirrors instead of the GitHub API.
+
+Same surface as GitHubService (get_latest_commit / resolve_ref / list_files / fetch_file), plus
+``changed_paths`` which diffs two commits straight from the object database.
+GitPython calls are blocking and a ``git.Repo`` (with the ``git cat-file`` processes behind
+it) is not safe to share between threads, so every read runs on the service's one git
+thread, which keeps at most ``MAX_OPEN_REPOS`` repos open and closes the least recently used.
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Set
+
+import git  # GitPython
+
+from config import GIT_MIRROR_ROOT
+from services.github_service import PULL_REF
+
+MAX_FILE_BYTES = 300_000
+MAX_OPEN_REPOS = 8  # each open Repo keeps two `git cat-file` processes alive
+
+class LocalGitService:
+    def __init__(self, root: str = GIT_MIRROR_ROOT):
+        self.root = root
+        self.logger = logging.getLogger("LocalGitService")
+        self._git = ThreadPoolExecutor(max_workers=1, thread_name_prefix="git")
+        self._repos: "OrderedDict[str, git.Repo]" = OrderedDict()  # only touched on the git thread
+
+    def mirror_path(self, repo: str) -> Optional[str]:
+        """`owner/name` -> `<root>/owner/name.git` (bare mirror) or `<root>/owner/name` (checkout)."""
+        for candidate in (os.path.join(self.root, f"{repo}.git"), os.path.join(self.root, repo)):
+            if os.path.isdir(candidate):
+                return candidate
+        return None
+
+    def list_mirrors(self) -> List[str]:
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for owner in sorted(os.listdir(self.root)):
+            odir = os.path.join(self.root, owner)
+            if not os.path.isdir(odir):
+                continue
+            for name in sorted(os.listdir(odir)):
+                if os.path.isdir(os.path.join(odir, name)):
+                    out.append(f"{owner}/{name[:-4] if name.endswith('.git') else name}")
+        return out
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._git, partial(fn, *args))
+
+    def _repo(self, repo: str) -> Optional[git.Repo]:
+        r = self._repos.get(repo)
+        if r is not None:
+            self._repos.move_to_end(repo)
+            return r
+        path = self.mirror_path(repo)
+        if path is None:
+            return None
+        r = self._repos[repo] = git.Repo(path)
+        while len(self._repos) > MAX_OPEN_REPOS:
+            self._repos.popitem(last=False)[1].close()
+        return r
+
+    def _resolve(self, repo: str, branch_hint: str) -> Optional[str]:
+        r = self._repo(repo)
+        if r is None:
+            return None
+        for ref in (branch_hint, "master", "HEAD"):
+            try:
+                return r.commit(ref).hexsha
+            except (git.BadName, ValueError):
+                continue
+        return None
+
+    async def get_latest_commit(self, repo: str, branch_hint: str = "main") -> Optional[str]:
+        return await self._call(self._resolve, repo, branch_hint)
+
+    def _resolve_ref(self, repo: str, ref: str) -> Optional[str]:
+        r = self._repo(repo)
+        if r is None:
+            return None
+        pull = PULL_REF.fullmatch(ref)
+        # mirrors of GitHub repos carry refs/pull/<n>/head; plain clones only have remote branches
+        names = [f"refs/pull/{pull.group(1)}/head"] if pull else [ref, f"origin/{ref}"]
+        for name in names:
+            try:
+                return r.commit(name).hexsha
+            except (git.BadName, ValueError):
+                continue
+        return None
+
+    async def resolve_ref(self, repo: str, ref: str) -> Optional[str]:
+        """Commit SHA of a branch, tag, commit or pull request; None when it does not exist."""
+        return await self._call(self._resolve_ref, repo, ref)
+
+    def _list(self, repo: str, ref: str) -> List[Dict]:
+        r = self._repo(repo)
+        if r is None:
+            return []
+        return [
+            {"path": b.path, "type": "blob", "sha": b.hexsha, "size": b.size}
+            for b in r.commit(ref).tree.traverse()
+            if b.type == "blob"
+        ]
+
+    async def list_files(self, repo: str, branch: str) -> List[Dict]:
+        return await self._call(self._list, repo, branch)
+
+    def _read(self, repo: str, path: str, ref: str) -> Optional[str]:
+        r = self._repo(repo)
+        if r is None:
+            return None
+        try:
+            blob = r.commit(ref).tree / path
+        except KeyError:
+            return None
+        if blob.size > MAX_FILE_BYTES:
+            return None
+        data = blob.data_stream.read()
+        if b"\0" in data[:8192]:
+            return None  # binary
+        return data.decode("utf-8", errors="replace")
+
+    async def fetch_file(self, repo: str, path: str, branch: str) -> Optional[str]:
+        return await self._call(self._read, repo, path, branch)
+
+    def _diff(self, repo: str, base: str, head: str) -> Optional[Set[str]]:
+        r = self._repo(repo)
+        if r is None:
+            return None
+        try:
+            diffs = r.commit(base).diff(r.commit(head))
+        except (git.BadName, ValueError):
+            return None  # base no longer reachable (force-push/gc): caller falls back to full listing
+        out: Set[str] = set()
+        for d in diffs:
+            if d.a_path:
+                out.add(d.a_path)
+            if d.b_path:
+                out.add(d.b_path)
+        return out
+
+    async def changed_paths(self, repo: str, base: str, head: str) -> Optional[Set[str]]:
+        """Paths added, modified, deleted or renamed (both sides) between two commits."""
+        return await self._call(self._diff, repo, base, head)
+
+    def _fetch(self, repo: str):
+        # network-bound: runs off the git thread on its own short-lived Repo, so reads are not held up
+        path = self.mirror_path(repo)
+        if path is None:
+            return
+        with git.Repo(path) as r:
+            if r.remotes:
+                r.remotes[0].fetch(prune=True)
+
+    async def fetch(self, repo: str):
+        """Update the mirror from its remote (`git fetch --prune`)."""
+        await asyncio.to_thread(self._fetch, repo)
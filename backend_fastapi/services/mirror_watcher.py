@@ -0,0 +1,56 @@
+"""Polls local git mirrors and triggers incremental re-indexing when a mirror's head moves."""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from config import MIRROR_WATCH_FETCH, MIRROR_WATCH_INTERVAL, MIRROR_WATCH_REPOS
+
+class MirrorWatcher:
+    def __init__(self, rag, repos: Optional[List[str]] = None, interval: float = MIRROR_WATCH_INTERVAL,
+                 fetch: bool = MIRROR_WATCH_FETCH):
+        self.rag = rag
+        self.repos = repos if repos is not None else list(MIRROR_WATCH_REPOS)
+        self.interval = interval
+        self.fetch = fetch
+        self.logger = logging.getLogger("MirrorWatcher")
+        self.last_results: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _targets(self) -> List[str]:
+        return self.repos or self.rag.github.list_mirrors()
+
+    async def poll_once(self) -> Dict[str, Dict]:
+        """One pass over all mirrors; re-indexes those whose head differs from the indexed head."""
+        results = {}
+        for repo in self._targets():
+            try:
+                if self.fetch:
+                    await self.rag.github.fetch(repo)
+                head = await self.rag.github.get_latest_commit(repo)
+                entry = self.rag.faiss.catalog.get(repo) or {}
+                if not head or entry.get("head") == head:
+                    continue
+                results[repo] = await self.rag.index_repo(repo)
+                self.logger.info("Reindexed %s at %s: %s", repo, head[:12], results[repo].get("note"))
+            except Exception:
+                self.logger.exception("Mirror poll failed for %s", repo)
+        self.last_results.update(results)
+        return results
+
+    async def _run(self):
+        while True:
+            await self.poll_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
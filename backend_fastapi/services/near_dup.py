@@ -0,0 +1,110 @@
+"""Near-duplicate chunk clustering for the chunking stage (MinHash + LSH banding).
+
+Copied config files, vendored copies of a module and near-identical generated
+files produce chunks that differ in a few tokens. Each chunk gets a MinHash
+signature over 5-word shingles; LSH bands propose candidates, and a chunk
+joins the first representative whose estimated Jaccard similarity reaches the
+threshold. Only representatives are embedded and stored; each one lists its
+members' paths and line spans under ``duplicates`` so citations still point at
+every copy.
+
+Signatures use Python's per-process ``hash`` and are never persisted: clusters
+are only formed among the chunks of one indexing run.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+NUM_PERM = 64                   # signature slots (one-permutation hashing: 64 bins of one hash)
+BANDS = 16                      # 16 bands x 4 rows: pairs at Jaccard 0.9 collide with p > 0.999
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+_BIN_SHIFT = np.uint64(58)      # top 6 bits pick the bin, the low 58 bits are the value
+_VALUE_MASK = np.uint64((1 << 58) - 1)
+_EMPTY = np.iinfo(np.uint64).max
+# odd multipliers that mix the SHINGLE token hashes of a window into one
+_MIX = (np.random.default_rng(0x5EED).integers(1, 2**63, size=SHINGLE, dtype=np.uint64) | np.uint64(1))
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM-slot MinHash over the text's word shingles; None for text without tokens.
+
+    One-permutation hashing: each shingle is hashed once and binned by its top bits,
+    keeping the minimum per bin; empty bins borrow the next filled bin's value
+    (rotation densification) so sparse texts still compare slot by slot.
+    """
+    tokens = text.split()  # whitespace words: an order of magnitude cheaper than a regex tokenizer
+    if not tokens:
+        return None
+    t = np.fromiter(map(hash, tokens), dtype=np.int64, count=len(tokens)).view(np.uint64)
+    if len(t) < SHINGLE:
+        t = np.concatenate([t, np.zeros(SHINGLE - len(t), dtype=np.uint64)])
+    n = len(t) - SHINGLE + 1
+    with np.errstate(over="ignore"):
+        h = t[:n] * _MIX[0]
+        for j in range(1, SHINGLE):
+            h += t[j:j + n] * _MIX[j]
+        # splitmix64 finalizer: spread the window sum over all 64 bits
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+    sig = np.full(NUM_PERM, _EMPTY, dtype=np.uint64)
+    np.minimum.at(sig, (h >> _BIN_SHIFT).astype(np.intp), h & _VALUE_MASK)
+    empty = sig == _EMPTY
+    if empty.any():
+        filled = np.flatnonzero(~empty)
+        pos = np.arange(NUM_PERM)
+        nxt = filled[np.searchsorted(filled, pos) % len(filled)]
+        dist = ((nxt - pos) % NUM_PERM).astype(np.uint64)
+        sig = np.where(empty, sig[nxt] + (dist << _BIN_SHIFT), sig)
+    return sig
+
+
+def cluster_near_duplicates(chunks: List[Dict], threshold: float) -> Tuple[List[Dict], Dict]:
+    """Keep one chunk per near-duplicate cluster; returns (representatives, savings report).
+
+    Chunks are visited in order, so the first copy (by path when chunks come sorted)
+    represents the cluster. ``threshold`` <= 0 disables clustering.
+    """
+    report = {"clusters": 0, "duplicates": 0, "tokens": 0, "bytes": 0}
+    if threshold <= 0 or len(chunks) < 2:
+        return chunks, report
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    sigs: Dict[int, np.ndarray] = {}
+    members: Dict[int, List[int]] = {}
+    reps: List[int] = []
+    for i, c in enumerate(chunks):
+        sig = minhash_signature(c.get("text", ""))
+        if sig is None:
+            reps.append(i)
+            continue
+        bands = [(b, sig[b * ROWS:(b + 1) * ROWS].tobytes()) for b in range(BANDS)]
+        best, best_sim = None, threshold
+        for j in sorted({j for key in bands for j in buckets.get(key, ())}):
+            sim = float(np.mean(sigs[j] == sig))
+            if sim >= best_sim:
+                best, best_sim = j, sim
+        if best is not None:
+            members.setdefault(best, []).append(i)
+            continue
+        reps.append(i)
+        sigs[i] = sig
+        for key in bands:
+            buckets.setdefault(key, []).append(i)
+
+    out = []
+    for i in reps:
+        c = chunks[i]
+        if i in members:
+            dups = [chunks[j] for j in members[i]]
+            c = dict(c)
+            c["duplicates"] = [{"path": d["path"], "line_start": d.get("line_start"), "line_end": d.get("line_end")}
+                               for d in dups]
+            report["clusters"] += 1
+            report["duplicates"] += len(dups)
+            report["tokens"] += sum(d.get("tokens", 0) for d in dups)
+            report["bytes"] += sum(len(d.get("text", "").encode("utf-8")) for d in dups)
+        out.append(c)
+    return out, report
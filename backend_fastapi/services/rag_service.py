@@ -1,9 +1,25 @@
 import numpy as np
 import hashlib
+import json
+from typing import Dict, Optional, Sequence, Set, Tuple
 from services.github_service import GitHubService
+from services.local_git_service import LocalGitService
 from services.chunking_service import chunk_docs
-from services.faiss_service import FaissService
+from services.file_filter import FileFilter, SkipReport
+from services.near_dup import cluster_near_duplicates
+from services.context_compression import compress_hits, embedding_scores, lexical_scores, split_hits
+from services.faiss_service import FaissService, overlay_key
 from services.gemini_service import GeminiService
+from services.embedding_service import GeminiEmbedder, get_embedder
+from config import (ADAPTIVE_CANDIDATES, ADAPTIVE_MAX_K, ADAPTIVE_MIN_K, ADAPTIVE_MIN_SCORE, ADAPTIVE_SCORE_GAP,
+                    ASK_COALESCE, COMPRESS_BUDGET_TOKENS, COMPRESS_CHUNK_TOKENS, COMPRESS_MAX_SOURCES,
+                    CONTEXT_COMPRESSION, EMBEDDING_PROVIDER, GEN_CONCURRENCY, GEN_QUEUE_MAX, GEN_QUEUE_TIMEOUT,
+                    NEAR_DUP_THRESHOLD, RETRIEVAL_STRATEGY, SOURCE_BACKEND)
+from utils.concurrency import ConcurrencyLimiter, KeyedLock, SingleFlight
+from utils.executor import run_blocking
+from utils.metrics import (CACHE_HITS, CHUNKS_PROCESSED, CONTEXT_TOKENS, CONTEXT_TOKENS_SAVED, FILES_PROCESSED,
+                           NEAR_DUP_CHUNKS, RETRIEVAL_DEPTH, TOKENS_PROCESSED)
+from utils.timing import collect, stage
 
 try:
     import tiktoken
@@ -13,6 +29,9 @@ except Exception:
 
 MAX_CONTEXT_TOKENS = 3500
 
+# Process-wide: every RAGService shares the cap on concurrent generation calls
+GENERATE_LIMITER = ConcurrencyLimiter("generate", GEN_CONCURRENCY, GEN_QUEUE_TIMEOUT, GEN_QUEUE_MAX)
+
 def _tok_count(text: str) -> int:
     if _enc is None:
         return max(1, len(text.split()))
@@ -42,10 +61,42 @@ def _limit_per_path(hits, per_path: int = 2):
             out.append(h); counts[p] = c + 1
     return out
 
-def _pack_context(hits, question: str):
+def _adaptive_depth(hits, min_k: int, max_k: int, gap: float, floor: float,
+                    budget: Optional[int] = None) -> Tuple[int, str]:
+    """How many of the score-ordered ``hits`` to keep, and why the cut falls there.
+
+    Stops before the first hit that scores more than ``gap`` (a fraction of the top
+    score) below the previous one, scores under ``floor`` or would push the chunks
+    past ``budget`` tokens; keeps at least ``min_k`` and at most ``max_k`` hits.
+    """
+    if not hits:
+        return 0, "empty"
+    top = max(hits[0].get('score', 0.0), 1e-6)
+    used = hits[0].get('tokens') or _tok_count(hits[0].get('text', ''))
+    for i in range(1, len(hits)):
+        if i >= max_k:
+            return i, "max_k"
+        score, prev = hits[i].get('score', 0.0), hits[i - 1].get('score', 0.0)
+        tokens = hits[i].get('tokens') or _tok_count(hits[i].get('text', ''))
+        if i >= min_k:
+            if score < floor:
+                return i, "floor"
+            if (prev - score) / top >= gap:
+                return i, "gap"
+            if budget and used + tokens > budget:
+                return i, "budget"
+        used += tokens
+    return len(hits), "candidates"
+
+def _duplicate_paths(hit) -> list:
+    """Other paths holding a near-duplicate of this chunk (folded into it at index time)."""
+    path = hit.get('path', '')
+    return list(dict.fromkeys(d['path'] for d in hit.get('duplicates', ()) if d['path'] != path))
+
+def _pack_context(hits, question: str, max_tokens: int = MAX_CONTEXT_TOKENS):
     header = "Context:\n"
     qpart = f"\n\nQuestion: {question}\nProvide a clear, concise answer with citations (file paths)."
-    budget = MAX_CONTEXT_TOKENS - (_tok_count(header) + _tok_count(qpart))
+    budget = max_tokens - (_tok_count(header) + _tok_count(qpart))
     if budget < 512:
         budget = 512
     out_text = []; used = []; used_tokens = 0
@@ -53,93 +104,380 @@ def _pack_context(hits, question: str):
         snippet = (h.get('text','') or '').strip()
         if not snippet:
             continue
-        block = f"\n---\n# {h.get('path','unknown')} (chunk {h.get('chunk_idx', h.get('idx','?'))})\n{snippet}\n"
+        also = _duplicate_paths(h)
+        if h.get('spans'):
+            # compressed: name the exact file lines kept so citations can point at them
+            where = f"{h.get('path','unknown')} (lines {', '.join(f'{a}-{b}' for a, b in h['spans'])})"
+        else:
+            where = f"{h.get('path','unknown')} (chunk {h.get('chunk_idx', h.get('idx','?'))})"
+        if also:
+            where += f"; same content in {', '.join(also[:5])}" + (f" and {len(also) - 5} more" if len(also) > 5 else "")
+        block = f"\n---\n# {where}\n{snippet}\n"
         need = _tok_count(block)
         if used_tokens + need > budget:
             break
         out_text.append(block); used.append(h); used_tokens += need
     return "".join(out_text), used
 
+def _mmr_select(hits, V, qvec, top_k: int, lambda_mul: float = 0.5):
+    """Maximal-marginal-relevance rerank of FAISS hits using their stored vectors V (one row per hit)."""
+    cand = hits if V.size != 0 and len(V) == len(hits) else []
+    selected = []
+    if cand:
+        q = qvec / (np.linalg.norm(qvec) + 1e-12)
+        cand_vecs = V
+        cand_vecs = cand_vecs / (np.linalg.norm(cand_vecs, axis=1, keepdims=True) + 1e-12)
+        chosen = []
+        remaining = list(range(len(cand)))
+        # pick the best by similarity first
+        sims = cand_vecs @ q
+        if len(remaining) > 0:
+            first = int(np.argmax(sims))
+            chosen.append(first)
+            remaining.remove(first)
+        while remaining and len(chosen) < min(len(cand), top_k):
+            best_i = None
+            best_score = -1e9
+            for ridx in remaining:
+                sim_q = float(sims[ridx])
+                sim_div = 0.0
+                for cidx in chosen:
+                    sim_div = max(sim_div, float(cand_vecs[ridx] @ cand_vecs[cidx]))
+                score = lambda_mul * sim_q - (1 - lambda_mul) * sim_div
+                if score > best_score:
+                    best_score = score
+                    best_i = ridx
+            chosen.append(best_i)
+            remaining.remove(best_i)
+        selected = [cand[i] for i in chosen]
+    return selected
+
+def _index_result(repo: str, head: str, note: str, indexed: int = 0, embedded: int = 0,
+                  reused: int = 0, removed: int = 0, skipped: Optional[Dict] = None,
+                  near_duplicates: Optional[Dict] = None, ref: Optional[str] = None) -> Dict:
+    # "updated" predates the embedded/reused split and keeps meaning "chunks (re)embedded"
+    return {"repo": repo, "indexed": indexed, "updated": embedded, "head": head, "note": note,
+            "embedded": embedded, "reused": reused, "removed": removed, "skipped": skipped,
+            "near_duplicates": near_duplicates, "ref": ref}
+
 class RAGService:
     def __init__(self):
-        self.github = GitHubService()
+        # Source of repo files: GitHub REST API or local git mirrors (same interface)
+        self.github = LocalGitService() if SOURCE_BACKEND == "local" else GitHubService()
         self.chunker = chunk_docs
         self.faiss = FaissService()
         self.gemini = GeminiService()
+        # None: embed with self.gemini (the default provider), so swapping self.gemini swaps both
+        self.embedder = None if EMBEDDING_PROVIDER == "gemini" else get_embedder(EMBEDDING_PROVIDER)
+        self.gen_limiter = GENERATE_LIMITER
+        self.inflight = SingleFlight("ask")
+        # webhooks, /index and the mirror watcher may index the same repo (or ref) at once
+        self.index_locks = KeyedLock()
+
+    def _embedding(self):
+        return self.embedder if self.embedder is not None else GeminiEmbedder(self.gemini)
+
+    async def _changed_paths(self, repo: str, state: Dict, head: str, current: Dict[str, Optional[str]]) -> Set[str]:
+        """Paths to re-index since state["head"]: git diff when the source supports it, else blob SHA comparison."""
+        if state.get("head") == head:
+            return set()
+        if hasattr(self.github, "changed_paths"):
+            changed = await self.github.changed_paths(repo, state["head"], head)
+            if changed is not None:
+                return changed
+        old = state.get("blobs", {})
+        changed = {p for p, sha in current.items() if sha is None or old.get(p) != sha}
+        return changed | (set(old) - set(current))
+
+    async def index_repo(self, repo: str, paths: Optional[Set[str]] = None, base: Optional[str] = None,
+                         tip: Optional[str] = None, ref: Optional[str] = None):
+        """Index a repo, incrementally when a compatible index exists.
+
+        ``paths`` are the files changed between commits ``base`` and ``tip``, as a push
+        webhook reports them; they replace the diff when ``base`` is the indexed head
+        and ``tip`` the current one, otherwise the usual diff decides what changed.
+        ``ref`` (a branch, tag, commit or ``pull/<n>``) indexes that ref as an overlay
+        on the default-branch index instead.
 
-    async def index_repo(self, repo: str):
-        branch = await self.github.get_latest_commit(repo)
-        if not branch:
-            return {"repo": repo, "indexed": 0, "updated": 0, "head": "", "note": "Repo not found"}
-        files = await self.github.list_files(repo, branch)
+        Runs for one repo (or one overlay) are serialized, so each sees the state the
+        previous one saved.
+        """
+        if ref:
+            # the overlay has its own key: _index_ref may index the base under the repo key
+            async with self.index_locks.hold(overlay_key(repo, ref)):
+                return await self._index_ref(repo, ref)
+        async with self.index_locks.hold(repo):
+            return await self._index_default(repo, paths, base, tip)
+
+    async def _index_default(self, repo: str, paths: Optional[Set[str]], base: Optional[str], tip: Optional[str]):
+        head = await self.github.get_latest_commit(repo)
+        if not head:
+            return _index_result(repo, "", "Repo not found")
+        embedder = self._embedding()
+        state = await run_blocking(self.faiss.load_state, repo)
+        report = SkipReport()
+        with stage("crawl"):
+            files = await self.github.list_files(repo, head)
+            current = {f["path"]: f.get("sha") for f in files}
+            attrs = await self.github.fetch_file(repo, ".gitattributes", head) if ".gitattributes" in current else ""
+            ffilter = FileFilter.for_repo(repo, gitattributes=attrs or "")
+            # a filter rule change can bring back or drop any path: rebuild instead of diffing.
+            # A head recorded with no chunks has no index files, and needs none to diff against.
+            full = (not state.get("head") or state.get("embedder") != embedder.name
+                    or state.get("filters") != ffilter.fingerprint()
+                    or (state.get("chunks") != 0 and not self.faiss.has_index(repo)))
+            if full:
+                changed = set(current)
+            elif paths is not None and state.get("head") == base and head == tip:
+                changed = set(paths)
+            else:
+                changed = await self._changed_paths(repo, state, head, current)
+            if not changed:
+                return _index_result(repo, head, "No changes", indexed=state.get("chunks", 0))
+            if not full:
+                # replacing a path drops the near-duplicate representatives stored under it
+                changed |= await run_blocking(self.faiss.linked_paths, repo, changed)
+            # chunks of filtered paths are still dropped, since every changed path is replaced below
+            wanted = ffilter.select([f for f in files if f["path"] in changed], report)
+            docs = await self._fetch_docs(repo, head, wanted, ffilter, report)
+        try:
+            # a full rebuild stages new embedding state (local IDF); it goes live only with the new index
+            built = await self._chunk_and_embed(repo, docs, embedder, reuse_from=() if full else (repo,), fit=full)
+            if built is None:
+                return _index_result(repo, head, "Embedding failed; index left unchanged",
+                                     indexed=state.get("chunks", 0), skipped=report.as_dict())
+            chunks, arr, dups, embedded = built
+            removed = 0
+            with stage("upsert"):
+                if full and arr is not None:
+                    total = (await self.faiss.upsert(repo, arr, chunks))[0]
+                elif full:
+                    # nothing indexable at this head: drop any old index, still record the head below
+                    await run_blocking(self.faiss.delete, repo)
+                    total = 0
+                else:
+                    total, _, removed = await self.faiss.replace_paths(repo, changed, arr, chunks)
+            if full:
+                await run_blocking(embedder.publish, repo)
+        finally:
+            await run_blocking(embedder.discard, repo)  # a failed rebuild keeps the live state
+        # recorded even with no chunks, so pollers comparing heads do not rebuild it again
+        await run_blocking(self.faiss.save_state, repo, {
+            "head": head, "blobs": current, "embedder": embedder.name, "chunks": total,
+            "filters": ffilter.fingerprint(), "skipped": report.as_dict(), "near_duplicates": dups})
+        note = "Indexed" if full else f"Incremental: {len(changed)} changed paths"
+        return _index_result(repo, head, note, indexed=total, embedded=embedded,
+                             reused=len(chunks) - embedded, removed=removed, skipped=report.as_dict(),
+                             near_duplicates=dups)
+
+    async def _index_ref(self, repo: str, ref: str):
+        """Index a branch/PR as an overlay: only paths that differ from the base are chunked.
+
+        The overlay is rebuilt from the base on every run, so it always describes the
+        ref against the current base head; its chunks reuse vectors from the base and
+        from the previous overlay wherever the text is unchanged.
+        """
+        head = await self.github.resolve_ref(repo, ref)
+        if not head:
+            return _index_result(repo, "", f"Ref {ref} not found", ref=ref)
+        embedder = self._embedding()
+        base_state = await run_blocking(self.faiss.load_state, repo)
+        if (not base_state.get("head") or base_state.get("embedder") != embedder.name
+                or not self.faiss.has_index(repo)):
+            await self.index_repo(repo)
+            base_state = await run_blocking(self.faiss.load_state, repo)
+            if not base_state.get("head") or not self.faiss.has_index(repo):
+                return _index_result(repo, head, "Default branch could not be indexed", ref=ref)
+        key = overlay_key(repo, ref)
+        state = await run_blocking(self.faiss.load_state, key)
+        report = SkipReport()
+        with stage("crawl"):
+            files = await self.github.list_files(repo, head)
+            current = {f["path"]: f.get("sha") for f in files}
+            attrs = await self.github.fetch_file(repo, ".gitattributes", head) if ".gitattributes" in current else ""
+            ffilter = FileFilter.for_repo(repo, gitattributes=attrs or "")
+            if (state.get("head") == head and state.get("base_head") == base_state["head"]
+                    and state.get("embedder") == embedder.name and state.get("filters") == ffilter.fingerprint()):
+                return _index_result(repo, head, "No changes", indexed=state.get("chunks", 0), ref=ref)
+            if ffilter.fingerprint() != base_state.get("filters"):
+                # the ref filters paths differently (e.g. its own .gitattributes): no base chunk can be trusted
+                changed = set(current) | set(base_state.get("blobs", {}))
+            else:
+                changed = await self._changed_paths(repo, base_state, head, current)
+            # masking a path hides the near-duplicate representatives stored under it
+            changed |= await run_blocking(self.faiss.linked_paths, repo, changed)
+            wanted = ffilter.select([f for f in files if f["path"] in changed], report)
+            docs = await self._fetch_docs(repo, head, wanted, ffilter, report)
+        built = await self._chunk_and_embed(repo, docs, embedder, reuse_from=(repo, key))
+        if built is None:
+            return _index_result(repo, head, "Embedding failed; index left unchanged", indexed=state.get("chunks", 0),
+                                 skipped=report.as_dict(), ref=ref)
+        chunks, arr, dups, embedded = built
+        facets = await run_blocking(self.faiss.facets, repo)
+        hidden = sum(len(facets.path_ids[p]) for p in changed if p in facets.path_ids)
+        with stage("upsert"):
+            if chunks:
+                total = (await self.faiss.upsert(key, arr, chunks))[0]
+            else:
+                # the ref only deletes files: nothing to search besides the masked base
+                await run_blocking(self.faiss.delete, key)
+                total = 0
+        await run_blocking(self.faiss.save_state, key, {
+            "head": head, "base": repo, "ref": ref, "base_head": base_state["head"], "embedder": embedder.name,
+            "chunks": total, "filters": ffilter.fingerprint(), "masked": sorted(changed),
+            "skipped": report.as_dict(), "near_duplicates": dups})
+        note = f"Overlay on {base_state['head'][:12]}: {len(changed)} changed paths"
+        return _index_result(repo, head, note, indexed=total, embedded=embedded, reused=len(chunks) - embedded,
+                             removed=hidden, skipped=report.as_dict(), near_duplicates=dups, ref=ref)
+
+    async def _fetch_docs(self, repo: str, head: str, wanted, ffilter: FileFilter, report: SkipReport):
         docs = []
-        for f in files:
-            path = f["path"]
-            text = await self.github.fetch_file(repo, path, branch)
-            if text:
+        for path in sorted(f["path"] for f in wanted):
+            text = await self.github.fetch_file(repo, path, head)
+            if text and ffilter.accept(path, text, report):
                 docs.append({"path": path, "text": text})
-        chunks = self.chunker(docs)
-        texts = [c["text"] for c in chunks]
-        vecs = await self.gemini.embed_texts(texts) if texts else []
-        if vecs:
-            arr = np.asarray(vecs, dtype="float32")
-            await self.faiss.upsert(repo, arr, chunks)
-        return {"repo": repo, "indexed": len(chunks), "updated": len(chunks), "head": branch, "note": "Indexed"}
-
-    async def answer_question(self, repo: str, question: str, top_k: int = 5):
-        qvec = await self.gemini.embed_query(question)
-        if not qvec:
+        return docs
+
+    async def _chunk_and_embed(self, repo: str, docs, embedder, reuse_from: Sequence[str] = (), fit: bool = False):
+        """Chunk ``docs``, fold near-duplicates and embed the chunks no index in ``reuse_from`` holds.
+
+        ``fit`` refits per-repo embedding state (local IDF) on this batch; only full rebuilds pass it.
+
+        Returns (chunks, vectors or None when there are no chunks, near-duplicate report,
+        chunks embedded), or None when embedding failed.
+        """
+        with stage("chunk"):
+            chunks = await run_blocking(self.chunker, docs)
+        FILES_PROCESSED.inc(len(docs))
+        CHUNKS_PROCESSED.inc(len(chunks))
+        TOKENS_PROCESSED.inc(sum(c.get("tokens", 0) for c in chunks))
+        with stage("dedup"):
+            chunks, dups = await run_blocking(cluster_near_duplicates, chunks, NEAR_DUP_THRESHOLD)
+        NEAR_DUP_CHUNKS.inc(dups["duplicates"])
+        # chunk keys are content hashes: chunks whose text is already indexed keep their vectors
+        known: Dict[str, np.ndarray] = {}
+        for key in reuse_from:
+            missing = {c["hash"] for c in chunks} - set(known)
+            if missing:
+                known.update(await run_blocking(self.faiss.vectors_by_hash, key, missing))
+        todo = [c for c in chunks if c["hash"] not in known]
+        with stage("embed"):
+            vecs = await embedder.embed_texts([c["text"] for c in todo], repo=repo, fit=fit) if todo else []
+        if len(vecs) != len(todo):
+            return None
+        known.update(zip((c["hash"] for c in todo), np.asarray(vecs, dtype="float32")))
+        arr = np.stack([known[c["hash"]] for c in chunks]) if chunks else None
+        CACHE_HITS.inc(len(chunks) - len(todo), cache="embedding")
+        # each folded duplicate saves one embedding plus its row in the flat index and in vecs.npy
+        dups["vector_bytes"] = dups["duplicates"] * (arr.shape[1] * 4 * 2 if arr is not None else 0)
+        return chunks, arr, dups, len(todo)
+
+    async def answer_question(self, repo: str, question: str, top_k: int = 5, debug: bool = False,
+                              filters: Optional[Dict] = None, ref: Optional[str] = None,
+                              strategy: Optional[str] = None):
+        shared = False
+        filters = {k: v for k, v in (filters or {}).items() if v} or None
+        strategy = strategy or RETRIEVAL_STRATEGY
+        with collect() as timings:
+            if ASK_COALESCE:
+                # identical questions asked while one is in flight share its answer
+                key = (repo, ref, strategy, " ".join(question.split()), top_k, json.dumps(filters, sort_keys=True))
+                result, shared = await self.inflight.do(
+                    key, lambda: self._answer(repo, question, top_k, filters, ref, strategy))
+                result = dict(result)
+            else:
+                result = await self._answer(repo, question, top_k, filters, ref, strategy)
+        context = result.pop("context", None)
+        if debug:
+            result["debug"] = {"timings_ms": timings.as_dict(), "coalesced": shared}
+            if context:
+                result["debug"]["context"] = context
+        return result
+
+    async def _compress(self, repo: str, question: str, qvec: np.ndarray, hits):
+        """Keep the line groups of each hit that best match the question (CONTEXT_COMPRESSION)."""
+        per_hit, texts = await run_blocking(split_hits, hits)
+        scores = None
+        if CONTEXT_COMPRESSION == "embedding" and texts:
+            vecs = await self._embedding().embed_texts(texts, repo=repo)
+            if len(vecs) == len(texts):
+                scores = await run_blocking(embedding_scores, qvec, np.asarray(vecs, dtype="float32"))
+        if scores is None:
+            scores = await run_blocking(lexical_scores, question, texts)
+        return await run_blocking(compress_hits, hits, per_hit, scores, COMPRESS_CHUNK_TOKENS, _tok_count)
+
+    async def _answer(self, repo: str, question: str, top_k: int, filters: Optional[Dict] = None,
+                      ref: Optional[str] = None, strategy: str = "fixed"):
+        with stage("query_embed"):
+            qvec = await self._embedding().embed_query(question, repo=repo)
+        if len(qvec) == 0:
             return {"answer": "Query embedding failed. Check LLM config.", "citations": []}
         qvec = np.asarray(qvec, dtype="float32")
-        hits = await self.faiss.search(repo, qvec, top_k)
+        compress = CONTEXT_COMPRESSION in ("lexical", "embedding")
+        # compressed chunks are small: retrieve more distinct sources to fill the budget
+        k = max(top_k, COMPRESS_MAX_SOURCES) if compress else top_k
+        adaptive = strategy == "adaptive"
+        if adaptive:
+            k = max(k, ADAPTIVE_CANDIDATES)
+        hits = await self.faiss.search(repo, qvec, k, filters=filters, ref=ref)
         if not hits:
+            if ref and not self.faiss.has_ref(repo, ref):
+                return {"answer": f"Ref {ref} is not indexed yet. Please index it first.", "citations": []}
+            if filters and self.faiss.has_index(repo):
+                return {"answer": "No indexed files match the given filters.", "citations": []}
             return {"answer": "Index is empty or repo not indexed yet. Please index the repo first.", "citations": []}
 
-        # MMR reranking on the returned candidate set using stored vectors
-        V = self.faiss.vectors_for_repo(repo)
-        cand = [h for h in hits if V.size != 0 and h.get('_vec_index') is not None]
-        selected = []
-        lambda_mul = 0.5
-        if cand:
-            q = qvec / (np.linalg.norm(qvec) + 1e-12)
-            cand_idx = [h['_vec_index'] for h in cand]
-            cand_vecs = V[cand_idx]
-            cand_vecs = cand_vecs / (np.linalg.norm(cand_vecs, axis=1, keepdims=True) + 1e-12)
-            chosen = []
-            remaining = list(range(len(cand)))
-            # pick the best by similarity first
-            sims = cand_vecs @ q
-            if len(remaining) > 0:
-                first = int(np.argmax(sims))
-                chosen.append(first)
-                remaining.remove(first)
-            while remaining and len(chosen) < min(len(cand), top_k):
-                best_i = None
-                best_score = -1e9
-                for ridx in remaining:
-                    sim_q = float(sims[ridx])
-                    sim_div = 0.0
-                    for cidx in chosen:
-                        sim_div = max(sim_div, float(cand_vecs[ridx] @ cand_vecs[cidx]))
-                    score = lambda_mul * sim_q - (1 - lambda_mul) * sim_div
-                    if score > best_score:
-                        best_score = score
-                        best_i = ridx
-                chosen.append(best_i)
-                remaining.remove(best_i)
-            selected = [cand[i] for i in chosen]
-        if not selected:
-            selected = hits
-
-        hits = _dedupe_hits(selected)
-        hits = _limit_per_path(hits, per_path=2)
-        ctx_text, used = _pack_context(hits, question)
-        answer = await self.gemini.generate(question, ctx_text)
+        candidates = len(hits)
+        if adaptive:
+            # one wide retrieval, cut where relevance falls off instead of at a fixed k; hits stay
+            # in score order (MMR would break the gap test) and the per-path cap runs first
+            hits = _limit_per_path(_dedupe_hits(hits), per_path=2)
+            depth, stop = _adaptive_depth(hits, ADAPTIVE_MIN_K, ADAPTIVE_MAX_K, ADAPTIVE_SCORE_GAP, ADAPTIVE_MIN_SCORE,
+                                          budget=None if compress else MAX_CONTEXT_TOKENS)
+            hits = hits[:depth]
+        else:
+            # MMR reranking on the returned candidate set using stored vectors
+            with stage("mmr"):
+                selected = await run_blocking(
+                    lambda: _mmr_select(hits, self.faiss.hit_vectors(repo, hits, ref), qvec, k))
+            if not selected:
+                selected = hits
+            hits = _dedupe_hits(selected)
+            hits = _limit_per_path(hits, per_path=2)
+            stop = "top_k"
+        context = None
+        budget = MAX_CONTEXT_TOKENS
+        if compress:
+            with stage("compress"):
+                hits = await self._compress(repo, question, qvec, hits)
+            budget = COMPRESS_BUDGET_TOKENS
+        with stage("context_pack"):
+            ctx_text, used = _pack_context(hits, question, budget)
+        if compress:
+            before = sum(h["tokens_before"] for h in used)
+            after = sum(h["tokens_after"] for h in used)
+            CONTEXT_TOKENS_SAVED.observe(before - after)
+            context = {"mode": CONTEXT_COMPRESSION, "sources": len(used), "tokens_before": before,
+                       "tokens_after": after, "tokens_saved": before - after}
+        if len(used) < len(hits):
+            stop = "budget"  # the packer ran out of room before the chosen depth
+        context_tokens = _tok_count(ctx_text) if ctx_text else 0
+        RETRIEVAL_DEPTH.observe(len(used), strategy=strategy)
+        CONTEXT_TOKENS.observe(context_tokens, strategy=strategy)
+        retrieval = {"strategy": strategy, "candidates": candidates, "chunks": len(used), "stop": stop,
+                     "min_score": round(float(min(h.get("score", 0.0) for h in used)), 4) if used else None,
+                     "context_tokens": context_tokens}
+        async with self.gen_limiter.slot():
+            with stage("generate"):
+                answer = await self.gemini.generate(question, ctx_text)
         citations = [{
             "path": h.get("path",""),
             "rank": h.get("rank",0),
             "score": h.get("score",0.0),
             "line_start": h.get("line_start"),
             "line_end": h.get("line_end"),
+            "spans": h.get("spans", []),
+            "duplicates": _duplicate_paths(h),
         } for h in used]
-        return {"answer": answer or "No answer generated.", "citations": citations}
+        return {"answer": answer or "No answer generated.", "citations": citations, "retrieval": retrieval,
+                "context": context}
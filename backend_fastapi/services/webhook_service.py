@@ -0,0 +1,112 @@
+"""GitHub push webhooks: signature check, payload parsing and debounced delta reindexing.
+
+A push names the files its commits added, modified and removed. Bursts of pushes
+to one repo are merged while they keep arriving; once the repo has been quiet for
+``debounce`` seconds (or ``max_delay`` after the first push) a single incremental
+``index_repo`` run re-embeds just those paths.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+from typing import Dict, Optional
+
+from config import WEBHOOK_DEBOUNCE, WEBHOOK_MAX_DELAY
+
+ZERO_SHA = "0" * 40
+# GitHub caps the commits listed in a push payload; at the cap the file list may be incomplete
+MAX_PAYLOAD_COMMITS = 2048
+
+
+def verify_signature(secret: str, body: bytes, header: Optional[str]) -> bool:
+    """Check ``X-Hub-Signature-256`` (``sha256=<hex HMAC of the raw body>``)."""
+    if not secret or not header or not header.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(header[len("sha256="):], expected)
+
+
+def parse_push(payload: Dict) -> Optional[Dict]:
+    """{repo, base, tip, paths, exact} for a push to the default branch, else None.
+
+    ``exact`` is False when the payload cannot list every changed path (new branch,
+    force push, truncated commit list); the reindex then diffs against the indexed head.
+    """
+    repository = payload.get("repository") or {}
+    repo = repository.get("full_name")
+    branch = repository.get("default_branch") or repository.get("master_branch") or "main"
+    if not repo or payload.get("ref") != f"refs/heads/{branch}" or payload.get("deleted"):
+        return None
+    base, tip = payload.get("before", ""), payload.get("after", "")
+    if not tip or tip == ZERO_SHA:
+        return None
+    commits = payload.get("commits") or []
+    paths = set()
+    for c in commits:
+        for key in ("added", "modified", "removed"):
+            paths.update(c.get(key) or [])
+    exact = bool(commits) and base != ZERO_SHA and not payload.get("forced") and len(commits) < MAX_PAYLOAD_COMMITS
+    return {"repo": repo, "base": base, "tip": tip, "paths": paths, "exact": exact}
+
+
+class PushReindexer:
+    def __init__(self, rag, debounce: float = WEBHOOK_DEBOUNCE, max_delay: float = WEBHOOK_MAX_DELAY):
+        self.rag = rag
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.logger = logging.getLogger("PushReindexer")
+        self.last_results: Dict[str, Dict] = {}
+        # repo -> merged pushes not yet handed to index_repo
+        self._pending: Dict[str, Dict] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    def submit(self, push: Dict) -> Dict:
+        """Merge a parsed push into the repo's pending batch; returns the batch."""
+        repo = push["repo"]
+        now = asyncio.get_running_loop().time()
+        batch = self._pending.get(repo)
+        if batch is None:
+            batch = self._pending[repo] = {"base": push["base"], "tip": push["tip"], "paths": set(push["paths"]),
+                                           "exact": push["exact"], "pushes": 1, "first": now, "last": now}
+        else:
+            # the path lists only add up if each push continues where the previous one ended
+            batch["exact"] = batch["exact"] and push["exact"] and push["base"] == batch["tip"]
+            batch["paths"] |= push["paths"]
+            batch["tip"] = push["tip"]
+            batch["pushes"] += 1
+            batch["last"] = now
+        if repo not in self._workers:
+            self._workers[repo] = asyncio.create_task(self._drain(repo))
+        return batch
+
+    async def _drain(self, repo: str):
+        loop = asyncio.get_running_loop()
+        try:
+            while repo in self._pending:
+                batch = self._pending[repo]
+                due = min(batch["last"] + self.debounce, batch["first"] + self.max_delay)
+                if loop.time() < due:
+                    await asyncio.sleep(due - loop.time())
+                    continue
+                del self._pending[repo]  # pushes from here on start the next batch
+                paths = batch["paths"] if batch["exact"] else None
+                try:
+                    result = await self.rag.index_repo(repo, paths=paths, base=batch["base"], tip=batch["tip"])
+                    self.last_results[repo] = result
+                    self.logger.info("Reindexed %s after %d push(es): %s", repo, batch["pushes"], result.get("note"))
+                except Exception:
+                    self.logger.exception("Push reindex failed for %s", repo)
+        finally:
+            self._workers.pop(repo, None)
+
+    async def join(self):
+        """Wait until every pending batch has been indexed."""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    async def stop(self):
+        for task in list(self._workers.values()):
+            task.cancel()
+        await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+        self._workers.clear()
+        self._pending.clear()
@@ -0,0 +1,73 @@
+"""Offline stand-ins shared by the RAG tests: a dict-backed source and a fake Gemini.
+
+``make_rag`` wires them (or a test's own variants) into a ``RAGService`` whose
+indexes live under the test's ``tmp_path``.
+"""
+import hashlib
+from typing import Dict, Optional
+
+import pytest
+from services.faiss_service import FaissService
+from services.rag_service import RAGService
+
+
+def blob_sha(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class DictSource:
+    """GitHubService surface over {path: text}; the head is a digest of the files unless ``head`` is set."""
+
+    def __init__(self, files: Dict[str, str], head: Optional[str] = None):
+        self.files = dict(files)
+        self.head = head
+        self.fetched = []
+
+    def commit(self, files: Dict[str, Optional[str]]):
+        """Apply edits; None deletes a path."""
+        for path, text in files.items():
+            if text is None:
+                self.files.pop(path, None)
+            else:
+                self.files[path] = text
+
+    async def get_latest_commit(self, repo, branch_hint="main"):
+        return self.head or hashlib.sha1(repr(sorted(self.files.items())).encode()).hexdigest()
+
+    async def list_files(self, repo, branch):
+        return [{"path": p, "type": "blob", "sha": blob_sha(t), "size": len(t)} for p, t in self.files.items()]
+
+    async def fetch_file(self, repo, path, branch):
+        self.fetched.append(path)
+        return self.files.get(path)
+
+
+class FakeGemini:
+    """3-d embeddings from text length, a constant query vector; counts embedded texts and keeps contexts."""
+
+    def __init__(self):
+        self.embedded = 0
+        self.contexts = []
+
+    async def embed_texts(self, texts):
+        self.embedded += len(texts)
+        return [[1.0, float(len(t) % 97), 1.0] for t in texts]
+
+    async def embed_query(self, text):
+        return [1.0, 1.0, 1.0]
+
+    async def generate(self, question, context):
+        self.contexts.append(context)
+        return "ok"
+
+
+@pytest.fixture
+def make_rag(tmp_path):
+    def make(files: Optional[Dict[str, str]] = None, source=None, embedder=None, base_dir=None) -> RAGService:
+        rag = RAGService()
+        rag.github = source if source is not None else DictSource(files or {})
+        rag.gemini = FakeGemini()
+        rag.faiss = FaissService(base_dir=str(base_dir or tmp_path))
+        rag.embedder = embedder  # None: embed through rag.gemini
+        return rag
+    return make
@@ -0,0 +1,40 @@
+import pytest
+from services.embedding_service import LocalEmbedder
+from services.rag_service import _adaptive_depth
+
+def _hits(*scores, tokens=100):
+    return [{"path": f"f{i}.py", "score": s, "tokens": tokens} for i, s in enumerate(scores)]
+
+def test_adaptive_depth_stops_on_gap_floor_budget_and_bounds():
+    assert _adaptive_depth(_hits(0.9, 0.88, 0.86, 0.5, 0.45), 1, 10, 0.15, 0.0) == (3, "gap")
+    assert _adaptive_depth(_hits(0.9, 0.5, 0.48), 2, 10, 0.15, 0.0) == (3, "candidates")  # min_k wins over the gap
+    assert _adaptive_depth(_hits(0.5, 0.45, 0.42, 0.15), 1, 10, 0.15, 0.2) == (3, "floor")
+    assert _adaptive_depth(_hits(*[0.8] * 20), 1, 6, 0.15, 0.0) == (6, "max_k")
+    assert _adaptive_depth(_hits(*[0.8] * 20, tokens=700), 1, 10, 0.15, 0.0, budget=3500) == (5, "budget")
+    assert _adaptive_depth([], 1, 10, 0.15, 0.0) == (0, "empty")
+
+FILES = {f"handlers/h{i}.py": (f"def handle_request_{i}(request):\n    log_request(request)\n"
+                               f"    response = route_request(request, table_{i})\n    return response\n") * 6
+         for i in range(8)}
+FILES.update({f"models/table{i}.py": f"class Column{i}:\n    width = {i}\n    nullable = False\n\n" * 6 for i in range(6)})
+FILES["auth/jwt.py"] = ("def verify_jwt_signature(token, public_key):\n    header, payload, signature = token.split('.')\n"
+                        "    return rsa_verify(public_key, signature)\n") * 6
+
+@pytest.mark.asyncio
+async def test_adaptive_strategy_sizes_context_to_the_question(make_rag, tmp_path):
+    rag = make_rag(FILES, embedder=LocalEmbedder(dim=256, state_dir=str(tmp_path)))
+    await rag.index_repo("acme/web")
+
+    narrow = "How is the JWT signature verified with the public key?"
+    fixed = await rag.answer_question("acme/web", narrow, strategy="fixed")
+    adaptive = await rag.answer_question("acme/web", narrow, strategy="adaptive")
+    assert fixed["retrieval"]["stop"] == "top_k" and fixed["retrieval"]["chunks"] == 5
+    assert [c["path"] for c in adaptive["citations"]] == ["auth/jwt.py"]
+    assert adaptive["retrieval"]["stop"] == "gap"
+    assert adaptive["retrieval"]["context_tokens"] < fixed["retrieval"]["context_tokens"]
+
+    # a question every handler answers keeps more chunks than the fixed top-5
+    broad = await rag.answer_question("acme/web", "How does each handler route the request?", strategy="adaptive")
+    assert broad["retrieval"]["chunks"] > 5
+    assert {c["path"].split("/")[0] for c in broad["citations"]} == {"handlers"}
+    assert broad["retrieval"]["candidates"] > broad["retrieval"]["chunks"]
@@ -0,0 +1,19 @@
+import pytest
+from benchmarks.fakes import FakeGemini
+from benchmarks.run import parse_args, run_suite
+
+def test_fake_embedder_is_deterministic_and_similarity_preserving():
+    g = FakeGemini(dim=64)
+    a, b, c = g.embed_array(["parse the config file", "parse config", "render html template"])
+    assert (g.embed_array(["parse the config file"])[0] == a).all()
+    assert a @ b > a @ c
+
+@pytest.mark.asyncio
+async def test_benchmark_suite_small_corpus(tmp_path):
+    args = parse_args(["--sizes", "300", "--queries", "5", "--dim", "32", "--quiet"])
+    report = await run_suite([300], args, str(tmp_path))
+    res = report["results"][0]
+    assert res["chunks"] == 300
+    for section in ("chunking", "embedding", "indexing", "index_load", "search", "ask", "index_e2e"):
+        assert section in res
+    assert res["search"]["n"] == 5
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from conftest import DictSource
+from services.embedding_service import LocalEmbedder
+from services.faiss_service import overlay_key
+
+MAIN = {
+    "auth/session.py": "def login(user, password):\n    session = create_session(user)\n    return session.cookie\n" * 8,
+    "billing/invoice.py": "def total(invoice):\n    return sum(line.amount for line in invoice.lines)\n" * 8,
+    "docs/legacy.md": "# Legacy SOAP gateway\nThe SOAP gateway translates XML envelopes for old clients.\n" * 8,
+}
+FEATURE = dict(MAIN)
+FEATURE["auth/session.py"] = "def refresh(token):\n    rotated = rotate_refresh_token(token)\n    return rotated.jwt\n" * 8
+FEATURE["hooks/retry.py"] = "def retry_webhook(delivery):\n    return schedule_backoff(delivery.attempts)\n" * 8
+del FEATURE["docs/legacy.md"]
+
+class RefSource:
+    """A DictSource per ref; listings and fetches go to the ref whose head they were given."""
+    def __init__(self):
+        self.refs = {"main": DictSource(MAIN), "feature/tokens": DictSource(FEATURE)}
+    async def _at(self, head):
+        for src in self.refs.values():
+            if await src.get_latest_commit(None) == head:
+                return src
+    async def get_latest_commit(self, repo, branch_hint="main"):
+        return await self.refs["main"].get_latest_commit(repo)
+    async def resolve_ref(self, repo, ref):
+        return await self.refs[ref].get_latest_commit(repo) if ref in self.refs else None
+    async def list_files(self, repo, head):
+        return await (await self._at(head)).list_files(repo, head)
+    async def fetch_file(self, repo, path, head):
+        return await (await self._at(head)).fetch_file(repo, path, head)
+
+@pytest.fixture
+def rag(make_rag, tmp_path):
+    return make_rag(source=RefSource(), embedder=LocalEmbedder(dim=256, state_dir=str(tmp_path)))
+
+@pytest.mark.asyncio
+async def test_branch_overlay_indexes_only_the_diff(rag):
+    base = await rag.index_repo("acme/app")
+    res = await rag.index_repo("acme/app", ref="feature/tokens")
+    assert res["ref"] == "feature/tokens" and res["note"].startswith("Overlay on ")
+    # only the edited and added files are chunked; the unchanged file is shared with the base
+    overlay_paths = {m["path"] for m in rag.faiss._load(overlay_key("acme/app", "feature/tokens"))[1]}
+    assert overlay_paths == {"auth/session.py", "hooks/retry.py"}
+    assert res["indexed"] < base["indexed"] and res["removed"] == 2  # base chunks of session.py and legacy.md
+    assert rag.faiss.refs("acme/app") == ["feature/tokens"]
+    assert (await rag.index_repo("acme/app", ref="feature/tokens"))["note"] == "No changes"
+
+    q = await rag.embedder.embed_query("how is the refresh token rotated?", repo="acme/app")
+    hits = await rag.faiss.search("acme/app", q, 10, ref="feature/tokens")
+    paths = [h["path"] for h in hits]
+    assert paths[0] == "auth/session.py" and hits[0]["_overlay"] and "docs/legacy.md" not in paths
+    assert all(h.get("_overlay") for h in hits if h["path"] == "auth/session.py")
+    assert "billing/invoice.py" in paths  # unchanged files come from the base index
+    assert [h["rank"] for h in hits] == list(range(len(hits)))
+    assert np.all(np.diff([h["score"] for h in hits]) <= 0)
+    # the default branch is untouched
+    main_paths = {h["path"] for h in await rag.faiss.search("acme/app", q, 10)}
+    assert "docs/legacy.md" in main_paths
+
+    answer = await rag.answer_question("acme/app", "Where is the SOAP gateway?", ref="feature/tokens",
+                                       filters={"path_prefix": ["docs/"]})
+    assert answer["citations"] == []
+    answer = await rag.answer_question("acme/app", "Where is the SOAP gateway?", filters={"path_prefix": ["docs/"]})
+    assert [c["path"] for c in answer["citations"]] == ["docs/legacy.md"]
+
+@pytest.mark.asyncio
+async def test_overlay_reuses_vectors_and_reports_unknown_refs(rag):
+    await rag.index_repo("acme/app")
+    await rag.index_repo("acme/app", ref="feature/tokens")
+    rag.github.refs["feature/tokens"].commit(
+        {"hooks/retry.py": FEATURE["hooks/retry.py"] + "def give_up(delivery):\n    return delivery.dead_letter()\n"})
+    res = await rag.index_repo("acme/app", ref="feature/tokens")
+    assert res["embedded"] >= 1 and res["reused"] >= 1  # session.py chunks keep their overlay vectors
+
+    assert (await rag.index_repo("acme/app", ref="nope"))["note"] == "Ref nope not found"
+    answer = await rag.answer_question("acme/app", "anything?", ref="pull/7")
+    assert answer["answer"].startswith("Ref pull/7 is not indexed")
+
+    rag.faiss.delete("acme/app")
+    assert rag.faiss.refs("acme/app") == [] and not rag.faiss.has_ref("acme/app", "feature/tokens")
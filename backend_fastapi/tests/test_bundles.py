@@ -0,0 +1,101 @@
+import httpx
+import numpy as np
+import pytest
+import config
+from conftest import DictSource
+from main import app
+from routers import admin
+from services.bundle_service import Bundle, BundleError, export_bundle, import_bundle, import_dir
+from services.embedding_service import LocalEmbedder
+from services import faiss_service
+from services.faiss_service import FaissService
+from services.index_shards import shard_files
+
+FILES = {f"src/mod{i}.py": f"def handler_{i}(request):\n    return route_{i}(request.user)\n" * 20 for i in range(12)}
+FILES["README.md"] = "# Service\nRoutes requests to handlers.\n"
+
+async def _indexed(make_rag, base_dir, embedder=None):
+    rag = make_rag(source=DictSource(FILES, head="c0ffee"), embedder=embedder, base_dir=base_dir)
+    await rag.index_repo("acme/svc")
+    return rag
+
+@pytest.mark.asyncio
+async def test_bundle_roundtrip_serves_identical_results(tmp_path, make_rag):
+    src = await _indexed(make_rag, tmp_path / "a", LocalEmbedder(dim=64, state_dir=str(tmp_path / "a")))
+    bundle = str(tmp_path / "acme__svc.ragbundle")
+    header = export_bundle(src.faiss, "acme/svc", bundle)
+    assert header["embedder"] == "local" and header["chunks"] == src.faiss.catalog.get("acme/svc")["chunks"]
+    with Bundle(bundle) as b:
+        assert set(b.header["sections"]) == {"index", "meta", "vectors", "idf"}
+        assert all(s["offset"] % 4096 == 0 for s in b.header["sections"].values())
+        b.verify()
+
+    dst = FaissService(base_dir=str(tmp_path / "b"))
+    import_bundle(dst, bundle, provider="local")
+    assert dst.load_state("acme/svc") == src.faiss.load_state("acme/svc")
+    assert dst.catalog.get("acme/svc")["head"] == "c0ffee"
+    _, meta, vecs = dst._load("acme/svc")
+    assert isinstance(vecs, np.memmap)  # mapped, not read into memory
+    assert meta == src.faiss._load("acme/svc")[1]
+
+    # queries on the replica embed with the bundled IDF and match the origin exactly
+    replica = LocalEmbedder(dim=64, state_dir=str(tmp_path / "b"))
+    q = await replica.embed_query("route handler_3 request", repo="acme/svc")
+    assert np.allclose(q, await src.embedder.embed_query("route handler_3 request", repo="acme/svc"))
+    hits = await dst.search("acme/svc", q, 5)
+    assert [h["key"] for h in hits] == [h["key"] for h in await src.faiss.search("acme/svc", q, 5)]
+
+    assert import_dir(dst, str(tmp_path)) == {"acme__svc.ragbundle": "current"}
+
+@pytest.mark.asyncio
+async def test_corrupt_or_incompatible_bundles_are_rejected(tmp_path, make_rag):
+    src = await _indexed(make_rag, tmp_path / "a", LocalEmbedder(dim=64, state_dir=str(tmp_path / "a")))
+    bundle = tmp_path / "x.ragbundle"
+    header = export_bundle(src.faiss, "acme/svc", str(bundle))
+    dst = FaissService(base_dir=str(tmp_path / "b"))
+    with pytest.raises(BundleError, match="this node uses"):
+        import_bundle(dst, str(bundle), provider="gemini")
+
+    data = bytearray(bundle.read_bytes())
+    data[header["sections"]["vectors"]["offset"] + 200] ^= 0xFF
+    bundle.write_bytes(bytes(data))
+    with pytest.raises(BundleError, match="vectors checksum"):
+        import_bundle(dst, str(bundle), provider="local")
+    assert not dst.has_index("acme/svc")
+    assert import_dir(dst, str(tmp_path))["x.ragbundle"].startswith("skipped")
+
+@pytest.mark.asyncio
+async def test_bundle_api_export_then_import(tmp_path, monkeypatch, make_rag):
+    src = await _indexed(make_rag, tmp_path / "a")
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "t")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t", headers={"X-Admin-Token": "t"}) as client:
+        monkeypatch.setattr(admin, "store", src.faiss)
+        r = await client.get("/admin/bundles/acme/svc")
+        assert r.status_code == 200
+        assert (await client.get("/admin/bundles/acme/missing")).status_code == 404
+
+        monkeypatch.setattr(admin, "store", FaissService(base_dir=str(tmp_path / "b")))
+        res = await client.post("/admin/bundles", content=r.content)
+        assert res.status_code == 200
+        assert res.json()["repo"] == "acme/svc" and res.json()["head"] == "c0ffee"
+        assert admin.store.has_index("acme/svc")
+        assert (await client.post("/admin/bundles", content=b"garbage" * 100)).status_code == 400
+
+@pytest.mark.asyncio
+async def test_import_over_sharded_index_removes_stale_shards(tmp_path, monkeypatch, make_rag):
+    src = await _indexed(make_rag, tmp_path / "a")
+    bundle = str(tmp_path / "acme__svc.ragbundle")
+    export_bundle(src.faiss, "acme/svc", bundle)
+
+    monkeypatch.setattr(faiss_service, "INDEX_SHARD_SIZE", 8)
+    monkeypatch.setattr(faiss_service, "INDEX_BUILD_PROCS", 1)
+    monkeypatch.setattr(faiss_service, "INDEX_SHARD_MODE", "serve")
+    dst = (await _indexed(make_rag, tmp_path / "b")).faiss
+    assert shard_files(dst.base_dir, "acme__svc") and dst.catalog.get("acme/svc")["shards"]
+
+    import_bundle(dst, bundle, provider="gemini")
+    assert shard_files(dst.base_dir, "acme__svc") == [] and dst.catalog.get("acme/svc")["shards"] == 0
+    q = np.array([1.0, 40.0, 0.0], dtype="float32")
+    want = [h["key"] for h in await src.faiss.search("acme/svc", q, 5)]
+    assert [h["key"] for h in await dst.search("acme/svc", q, 5)] == want
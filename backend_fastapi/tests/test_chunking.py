@@ -0,0 +1,42 @@
+import pytest
+from services import chunking_service
+from services.chunking_service import smart_chunk
+
+def _code(n, start=0):
+    return "".join(f"def handler_{i}(event):\n    return dispatch(event, {i * 7 % 13})\n\n" for i in range(start, start + n))
+
+def test_keys_survive_insertions_above(monkeypatch):
+    monkeypatch.setattr(chunking_service, "CHUNK_TOKENS", 120)
+    monkeypatch.setattr(chunking_service, "CHUNK_OVERLAP", 20)
+    before = smart_chunk({"path": "h.py", "text": _code(200)})
+    after = smart_chunk({"path": "h.py", "text": "import os\nimport sys\n\n" + _code(200)})
+    assert len(before) > 5
+    assert all(c["tokens"] <= 120 for c in before)
+    shared = {c["key"] for c in before} & {c["key"] for c in after}
+    assert len(shared) >= len(before) - 2
+    # keys are content hashes, idx stays the ordinal position
+    assert [c["idx"] for c in after] == list(range(len(after)))
+
+def test_duplicate_text_gets_distinct_keys():
+    chunks = smart_chunk({"path": "d.md", "text": "# A\nsame\n# B\nsame\n"})
+    keys = [c["key"] for c in chunks]
+    assert len(keys) == len(set(keys))
+
+@pytest.mark.asyncio
+async def test_reindex_embeds_only_changed_chunks(monkeypatch, make_rag):
+    monkeypatch.setattr(chunking_service, "CHUNK_TOKENS", 120)
+    monkeypatch.setattr(chunking_service, "CHUNK_OVERLAP", 20)
+    rag = make_rag({"h.py": _code(200), "gone.py": _code(3, 500)})
+    src = rag.github
+
+    first = await rag.index_repo("acme/svc")
+    assert first["embedded"] == first["indexed"] and first["reused"] == 0
+
+    src.commit({"h.py": _code(150) + _code(1, 999) + _code(50, 150), "gone.py": None})
+    second = await rag.index_repo("acme/svc")
+    assert second["note"].startswith("Incremental")
+    assert second["reused"] > second["embedded"] > 0
+    assert second["removed"] >= 1
+    meta = rag.faiss._load("acme/svc")[1]
+    assert {m["path"] for m in meta} == {"h.py"}
+    assert second["indexed"] == len(meta) == second["embedded"] + second["reused"]
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+import httpx
+from main import app
+from routers import ask as ask_router
+from utils.concurrency import ConcurrencyLimiter, KeyedLock, Overloaded, SingleFlight
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_one_computation():
+    flight = SingleFlight("t")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"answer": "42"}
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(10)))
+    assert calls == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(r["answer"] == "42" for r, _ in results)
+    # finished keys are forgotten: the next call computes again
+    await flight.do("k", work)
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_keyed_lock_serializes_per_key():
+    locks = KeyedLock()
+    order = []
+
+    async def run(key, name):
+        async with locks.hold(key):
+            order.append(f"{name}+")
+            await asyncio.sleep(0.02)
+            order.append(f"{name}-")
+
+    await asyncio.gather(run("a", "a1"), run("a", "a2"), run("b", "b1"))
+    assert order.index("a1-") < order.index("a2+")  # same key: one after another
+    assert order.index("b1+") < order.index("a1-")  # other keys do not wait
+    assert locks._locks == {}  # released keys are dropped
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_concurrency_and_sheds():
+    limiter = ConcurrencyLimiter("t", limit=2, max_wait=0.05, max_queue=3)
+    peak = 0
+
+    async def job(hold):
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.active)
+            await asyncio.sleep(hold)
+
+    # four fast jobs fit: two run, two wait well under the budget
+    await asyncio.gather(*(job(0.01) for _ in range(4)))
+    assert peak == 2 and limiter.active == 0
+
+    # slow holders: waiters exceed the wait budget, the overflow beyond max_queue is shed at once
+    results = await asyncio.gather(*(job(0.2) for _ in range(6)), return_exceptions=True)
+    shed = [r for r in results if isinstance(r, Overloaded)]
+    assert len(shed) == 4 and all(e.retry_after >= 1 for e in shed)
+    assert limiter.active == 0 and limiter.waiting == 0
+
+class SlowGen:
+    def __init__(self):
+        self.generated = 0
+    async def embed_texts(self, texts):
+        return [[1.0, 0.0, 0.0] for _ in texts]
+    async def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+    async def generate(self, question, context):
+        self.generated += 1
+        await asyncio.sleep(0.2)
+        return "slow answer"
+
+class OneFile:
+    async def get_latest_commit(self, repo, branch_hint="main"):
+        return "h1"
+    async def list_files(self, repo, branch):
+        return [{"path": "a.md", "type": "blob", "sha": "s1"}]
+    async def fetch_file(self, repo, path, branch):
+        return "# A\nalpha beta gamma\n"
+
+@pytest.mark.asyncio
+async def test_ask_coalesces_and_sheds_with_retry_after(tmp_path, monkeypatch):
+    from services.faiss_service import FaissService
+    rag = ask_router.rag
+    gen = SlowGen()
+    monkeypatch.setattr(rag, "gemini", gen)
+    monkeypatch.setattr(rag, "github", OneFile())
+    monkeypatch.setattr(rag, "faiss", FaissService(base_dir=str(tmp_path)))
+    monkeypatch.setattr(rag, "gen_limiter", ConcurrencyLimiter("generate", 1, 0.05, 8))
+    await rag.index_repo("acme/burst")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        same = [client.post("/ask/", json={"repo": "acme/burst", "question": "what is alpha?", "debug": True})
+                for _ in range(5)]
+        responses = await asyncio.gather(*same)
+        assert all(r.status_code == 200 for r in responses)
+        assert gen.generated == 1
+        assert sum(r.json()["debug"]["coalesced"] for r in responses) == 4
+
+        distinct = [client.post("/ask/", json={"repo": "acme/burst", "question": f"q{i}"}) for i in range(3)]
+        responses = await asyncio.gather(*distinct)
+        codes = sorted(r.status_code for r in responses)
+        assert codes[0] == 200 and 503 in codes
+        busy = next(r for r in responses if r.status_code == 503)
+        assert int(busy.headers["Retry-After"]) >= 1
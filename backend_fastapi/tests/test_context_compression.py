@@ -0,0 +1,56 @@
+import pytest
+from services import rag_service
+from services.context_compression import compress_hit, lexical_scores, line_groups, split_hits
+from services.rag_service import _tok_count
+
+def _module(name, focus=None):
+    """A long file of boilerplate functions; ``focus`` marks the one interesting function."""
+    out = []
+    for i in range(60):
+        if i == focus:
+            out.append("def verify_jwt_token(token):\n    claims = decode_jwt(token, SECRET)\n"
+                       "    return claims['sub']\n")
+        else:
+            out.append(f"def {name}_helper_{i}(rows):\n    total = sum(r.amount for r in rows)\n"
+                       f"    return round(total, {i % 4})\n")
+    return "\n".join(out)
+
+def test_compress_hit_keeps_relevant_lines_with_file_line_numbers():
+    text = _module("billing", focus=30)
+    hit = {"path": "auth.py", "text": text, "line_start": 101, "line_end": 100 + text.count("\n")}
+    (groups,), texts = split_hits([hit])
+    assert groups == line_groups(text)
+    scores = lexical_scores("how is the jwt token verified?", texts)
+    out = compress_hit(hit, groups, scores, 60, _tok_count)
+
+    assert "verify_jwt_token" in out["text"] and "billing_helper_5" not in out["text"]
+    assert out["tokens_after"] <= 60 < out["tokens_before"] == _tok_count(text)
+    lines = text.split("\n")
+    for a, b in out["spans"]:
+        # spans are absolute file lines: they round-trip to the original text
+        assert "\n".join(lines[a - 101:b - 100]) in out["text"]
+    def_line = 101 + lines.index("def verify_jwt_token(token):")
+    assert out["line_start"] <= def_line <= out["line_end"]
+
+    # small chunks pass through untouched
+    small = compress_hit(hit, groups, scores, 10_000, _tok_count)
+    assert small["text"] == text and small["spans"] == [[101, hit["line_end"]]]
+
+@pytest.mark.asyncio
+async def test_compressed_context_is_smaller_and_covers_more_sources(make_rag, monkeypatch):
+    rag = make_rag({f"svc/mod_{i}.py": _module(f"mod{i}", focus=i * 7 % 60) for i in range(12)})
+    await rag.index_repo("acme/auth")
+
+    plain = await rag.answer_question("acme/auth", "how is the jwt token verified?", top_k=4)
+    monkeypatch.setattr(rag_service, "CONTEXT_COMPRESSION", "lexical")
+    monkeypatch.setattr(rag_service, "COMPRESS_CHUNK_TOKENS", 80)
+    short = await rag.answer_question("acme/auth", "how is the jwt token verified?", top_k=4, debug=True)
+
+    full_ctx, small_ctx = rag.gemini.contexts
+    assert _tok_count(small_ctx) < _tok_count(full_ctx)
+    assert len({c["path"] for c in short["citations"]}) > len({c["path"] for c in plain["citations"]})
+    assert all(c["spans"] and c["line_start"] <= c["spans"][0][0] for c in short["citations"])
+    assert "verify_jwt_token" in small_ctx and "(lines " in small_ctx
+    ctx = short["debug"]["context"]
+    assert ctx["mode"] == "lexical" and ctx["tokens_saved"] == ctx["tokens_before"] - ctx["tokens_after"] > 0
+    assert "compress" in short["debug"]["timings_ms"]
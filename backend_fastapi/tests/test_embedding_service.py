@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from services.embedding_service import LocalEmbedder, get_embedder
+from services.faiss_service import FaissService
+from services import rag_service
+from services.rag_service import RAGService
+
+DOCS = [
+    "def load_config(path): read the yaml config file and return settings",
+    "class UserSession: stores the login token and expiry for a user",
+    "render the html template with jinja and return the response body",
+]
+
+@pytest.mark.asyncio
+async def test_local_embedder_ranks_related_text_first(tmp_path):
+    emb = LocalEmbedder(dim=128, state_dir=str(tmp_path))
+    V = await emb.embed_texts(DOCS, repo="o/r", fit=True)
+    assert V.shape == (3, 128)
+    # fitted weights are staged until the index built from them is written
+    assert (tmp_path / "o__r.idf.next.npy").exists() and not (tmp_path / "o__r.idf.npy").exists()
+    emb.publish("o/r")
+    assert (tmp_path / "o__r.idf.npy").exists() and not (tmp_path / "o__r.idf.next.npy").exists()
+    q = await emb.embed_query("how is the config file loaded?", repo="o/r")
+    assert int(np.argmax(V @ q)) == 0
+
+def test_get_embedder_rejects_unknown_provider():
+    with pytest.raises(ValueError):
+        get_embedder("nope")
+
+class DummyGitHub:
+    async def get_latest_commit(self, repo, branch_hint="main"):
+        return "sha"
+    async def list_files(self, repo, branch):
+        return [{"path": f"f{i}.py", "type": "blob"} for i in range(len(DOCS))]
+    async def fetch_file(self, repo, path, branch):
+        return DOCS[int(path[1])]
+
+class EditedGitHub(DummyGitHub):
+    async def fetch_file(self, repo, path, branch):
+        return "render the jinja template and stream the response body in chunks" if path == "f2.py" else DOCS[int(path[1])]
+
+class NoNetworkGemini:
+    async def generate(self, question, context):
+        return context
+
+@pytest.mark.asyncio
+async def test_rag_with_local_embedder_needs_no_embedding_calls(tmp_path):
+    rag = RAGService()
+    rag.github, rag.gemini = DummyGitHub(), NoNetworkGemini()
+    rag.faiss = FaissService(base_dir=str(tmp_path))
+    rag.embedder = LocalEmbedder(dim=128, state_dir=str(tmp_path))
+    assert (await rag.index_repo("o/r"))["indexed"] == 3
+    ans = await rag.answer_question("o/r", "where is the user login token stored?", top_k=1)
+    assert ans["citations"][0]["path"] == "f1.py"
+
+@pytest.mark.asyncio
+async def test_query_time_and_incremental_embedding_leave_idf_untouched(tmp_path, monkeypatch):
+    rag = RAGService()
+    rag.github, rag.gemini = DummyGitHub(), NoNetworkGemini()
+    rag.faiss = FaissService(base_dir=str(tmp_path))
+    rag.embedder = LocalEmbedder(dim=128, state_dir=str(tmp_path))
+    await rag.index_repo("o/r")
+    idf = tmp_path / "o__r.idf.npy"
+    before = (idf.stat().st_mtime_ns, idf.read_bytes())
+
+    # CONTEXT_COMPRESSION=embedding embeds prompt line groups with repo=...; that must not refit the IDF
+    monkeypatch.setattr(rag_service, "CONTEXT_COMPRESSION", "embedding")
+    await rag.answer_question("o/r", "where is the user login token stored?", top_k=3)
+    assert (idf.stat().st_mtime_ns, idf.read_bytes()) == before
+    idf.unlink()
+    await rag.answer_question("o/r", "how is the config file loaded?", top_k=3)
+    assert not idf.exists()
+
+    # an incremental batch embeds with the stored weights instead of fitting new ones
+    await rag.embedder.embed_texts(["a changed chunk", "another changed chunk"], repo="o/r")
+    assert not idf.exists()
+
+@pytest.mark.asyncio
+async def test_failed_full_rebuild_keeps_the_live_idf(tmp_path, monkeypatch):
+    rag = RAGService()
+    rag.github, rag.gemini = DummyGitHub(), NoNetworkGemini()
+    rag.faiss = FaissService(base_dir=str(tmp_path))
+    rag.embedder = LocalEmbedder(dim=128, state_dir=str(tmp_path))
+    await rag.index_repo("o/r")
+    idf = tmp_path / "o__r.idf.npy"
+    before = idf.read_bytes()
+
+    async def broken_upsert(*args):
+        # mid-rebuild: new weights are fitted, yet queries still embed with the live ones
+        assert (tmp_path / "o__r.idf.next.npy").exists() and idf.read_bytes() == before
+        raise OSError("disk full")
+    monkeypatch.setattr(rag.faiss, "upsert", broken_upsert)
+    rag.github = EditedGitHub()
+    rag.faiss.save_state("o/r", {})  # forces a full rebuild
+    with pytest.raises(OSError):
+        await rag.index_repo("o/r")
+    assert idf.read_bytes() == before and not (tmp_path / "o__r.idf.next.npy").exists()
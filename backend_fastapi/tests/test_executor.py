@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from services.faiss_service import FaissService
+from utils.executor import run_blocking
+from utils.timing import collect, stage
+
+@pytest.mark.asyncio
+async def test_run_blocking_keeps_request_spans():
+    def work():
+        with stage("busy"):
+            time.sleep(0.01)
+        return threading.current_thread().name
+
+    with collect() as timings:
+        name = await run_blocking(work)
+    assert name.startswith("cpu")
+    assert timings.as_dict()["busy"] >= 10
+
+@pytest.mark.asyncio
+async def test_search_and_upsert_run_off_the_event_loop(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    V = rng.normal(size=(2000, 32)).astype("float32")
+    V /= np.linalg.norm(V, axis=1, keepdims=True)
+    meta = [{"key": f"f{i}.py:{i}", "path": f"f{i % 50}.py", "text": str(i)} for i in range(len(V))]
+    fs = FaissService(base_dir=str(tmp_path))
+    threads = set()
+    for name in ("_write", "_load"):
+        original = getattr(fs, name)
+        def spy(*args, _original=original, **kwargs):
+            threads.add(threading.current_thread().name)
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(fs, name, spy)
+
+    await fs.upsert("acme/big", V, meta)
+    # a ticker on the loop keeps running while queries are in flight
+    ticks = 0
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+    task = asyncio.create_task(ticker())
+    results = await asyncio.gather(*(fs.search("acme/big", V[i], 5) for i in range(20)))
+    task.cancel()
+    assert all(r[0]["_vec_index"] == i for i, r in enumerate(results))
+    assert ticks > 0
+    assert threads and all(t.startswith("cpu") for t in threads)
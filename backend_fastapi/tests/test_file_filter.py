@@ -0,0 +1,79 @@
+import base64
+import os
+import pytest
+from services.file_filter import FileFilter, parse_gitattributes
+
+def test_path_rules():
+    f = FileFilter(gitattributes="proto/** linguist-generated\nvendor/keep/** -linguist-vendored\n")
+    assert f.path_reason("src/app.py") is None
+    assert f.path_reason("web/node_modules/react/index.js") == "vendored"
+    assert f.path_reason("package-lock.json") == "lockfile"
+    assert f.path_reason("static/app.min.js") == "generated"
+    assert f.path_reason("api/user_pb2.py") == "generated"
+    assert f.path_reason("proto/user.ts") == "gitattributes-generated"
+    assert f.path_reason("vendor/lib/x.go") == "vendored"
+    assert f.path_reason("vendor/keep/patched.go") is None  # explicitly un-vendored
+    assert f.path_reason("docs/logo.png") == "binary"
+
+def test_globs_and_gitattributes_parsing():
+    assert parse_gitattributes("*.snap linguist-generated=true\n# c\n*.txt text\n") == [("*.snap", "generated", True)]
+    f = FileFilter(include=["src/**", "README.md"], exclude=["*_test.go"])
+    assert f.path_reason("src/a/b.go") is None
+    assert f.path_reason("src/a/b_test.go") == "excluded"
+    assert f.path_reason("scripts/x.sh") == "not-included"
+    assert f.path_reason("README.md") is None
+
+def test_content_heuristics():
+    f = FileFilter()
+    code = "".join(f"def f{i}(x):\n    return x + {i}\n" for i in range(200))
+    assert f.content_reason("a.py", code) is None
+    assert f.content_reason("a.js", "var a=1;" * 2000) == "minified"
+    assert f.content_reason("blob.txt", base64.b64encode(os.urandom(6000)).decode()) in ("minified", "high-entropy")
+    assert f.content_reason("gen.go", "// Code generated by protoc-gen-go. DO NOT EDIT.\npackage x\n") == "generated"
+    assert f.content_reason("fixtures/big.json", "[" + ",".join(["1"] * 40000) + "]") == "large-json"
+
+def test_legacy_backend_copy_stays_in_sync(monkeypatch):
+    # backend/file_filter.py is a copy for the Flask app: same tables, thresholds and verdicts
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), "..", ".."))
+    legacy = pytest.importorskip("backend.file_filter")
+    from services import file_filter
+    for name in ("VENDOR_DIRS", "LOCKFILES", "GENERATED_GLOBS", "BINARY_EXTS", "MINIFIED_MAX_LINE", "MINIFIED_AVG_LINE",
+                 "HIGH_ENTROPY_BITS", "CONTENT_CHECK_MIN_BYTES"):
+        assert getattr(legacy, name) == getattr(file_filter, name), name
+    assert legacy._GENERATED_MARKER.pattern == file_filter._GENERATED_MARKER.pattern
+
+    attrs = "proto/** linguist-generated\nvendor/keep/** -linguist-vendored\n*.snap linguist-generated=false\n"
+    rules = dict(include=["src/**", "vendor/**", "proto/**", "*.md"], exclude=["*_test.go"], gitattributes=attrs)
+    new, old = FileFilter(**rules), legacy.FileFilter(**rules)
+    for path in ("src/app.py", "src/a/b_test.go", "scripts/x.sh", "README.md", "proto/user.ts", "vendor/lib/x.go",
+                 "vendor/keep/patched.go", "src/node_modules/r/index.js", "src/package-lock.json", "src/app.min.js",
+                 "src/logo.png", "src/api/user_pb2.py"):
+        assert new.path_reason(path) == old.path_reason(path), path
+    samples = {
+        "a.py": "".join(f"def f{i}(x):\n    return x + {i}\n" for i in range(200)),
+        "a.js": "var a=1;" * 2000,
+        "blob.txt": base64.b64encode(os.urandom(6000)).decode(),
+        "gen.go": "// Code generated by protoc-gen-go. DO NOT EDIT.\npackage x\n",
+        "big.json": "[" + ",".join(["1"] * 40000) + "]",
+        "img.txt": "\x00PNG",
+    }
+    for path, text in samples.items():
+        assert new.content_reason(path, text) == old.content_reason(path, text), path
+
+@pytest.mark.asyncio
+async def test_index_reports_skipped(make_rag):
+    rag = make_rag({
+        "README.md": "# Tool\nDoes things.\n",
+        ".gitattributes": "gen/* linguist-generated\n",
+        "gen/api.py": "x = 1\n" * 100,
+        "package-lock.json": "{}" * 500,
+        "dist/bundle.js": "a()" * 300,
+        "app.min.js": "b()" * 10,
+    })
+    res = await rag.index_repo("acme/filtered")
+    paths = {m["path"] for m in rag.faiss._load("acme/filtered")[1]}
+    assert paths == {"README.md", ".gitattributes"}
+    sk = res["skipped"]
+    assert sk["files"] == 4 and sk["bytes"] == 600 + 1000 + 900 + 30
+    assert set(sk["by_reason"]) == {"gitattributes-generated", "lockfile", "vendored", "generated"}
+    assert sk["chunks_estimated"] >= 4
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from services.faiss_service import FaissService, PathFacets
+
+PATHS = ["docs/guide.md", "docs/api/ref.md", "services/billing/app.py", "services/billing/web.ts",
+         "services/auth/app.py", "README.md", "scripts/deploy.sh"]
+
+def _meta(per_path=20):
+    return [{"key": f"{p}:{i}", "path": p, "text": f"{p} {i}"} for p in PATHS for i in range(per_path)]
+
+def _ids(bits, n):
+    return set(np.flatnonzero(np.unpackbits(bits, bitorder="little", count=n)).tolist())
+
+def test_facets_match_brute_force():
+    meta = _meta()
+    facets = PathFacets(meta)
+    cases = [
+        ({"path_prefix": ["docs/"]}, lambda p: p.startswith("docs/")),
+        ({"path_glob": ["*.py"]}, lambda p: p.endswith(".py")),
+        ({"extension": ["md", ".sh"]}, lambda p: p.endswith((".md", ".sh"))),
+        ({"language": ["python"], "path_prefix": ["services/billing"]}, lambda p: p == "services/billing/app.py"),
+        ({"language": ["cobol"]}, lambda p: False),
+    ]
+    for filters, pred in cases:
+        bits, count = facets.select(filters)
+        expected = {i for i, m in enumerate(meta) if pred(m["path"])}
+        assert _ids(bits, len(meta)) == expected and count == len(expected), filters
+    assert facets.select({}) == (None, len(meta))
+
+@pytest.mark.asyncio
+async def test_filtered_search_returns_full_top_k_inside_scope(tmp_path):
+    meta = _meta()
+    rng = np.random.default_rng(0)
+    V = rng.normal(size=(len(meta), 16)).astype("float32")
+    V /= np.linalg.norm(V, axis=1, keepdims=True)
+    fs = FaissService(base_dir=str(tmp_path))
+    await fs.upsert("acme/mono", V, meta)
+
+    q = V[0]  # a docs/guide.md chunk: unfiltered top hits are mostly docs
+    hits = await fs.search("acme/mono", q, 5, filters={"path_prefix": ["services/auth/"]})
+    assert len(hits) == 5
+    assert all(h["path"] == "services/auth/app.py" for h in hits)
+    # same ranking as brute force over the allowed ids
+    allowed = [i for i, m in enumerate(meta) if m["path"] == "services/auth/app.py"]
+    best = sorted(allowed, key=lambda i: -float(V[i] @ q))[:5]
+    assert [h["_vec_index"] for h in hits] == best
+
+    assert await fs.search("acme/mono", q, 5, filters={"extension": [".rs"]}) == []
+    assert len(await fs.search("acme/mono", q, 5, filters={"language": "markdown"})) == 5
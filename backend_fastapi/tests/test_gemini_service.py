@@ -0,0 +1,61 @@
+import asyncio
+import httpx
+import pytest
+from services.gemini_service import GeminiService
+
+def _stub_gemini(delays):
+    """Local stand-in for the Gemini API; the n-th call sleeps delays[n] seconds."""
+    calls = []
+
+    async def handler(request: httpx.Request):
+        n = len(calls)
+        calls.append(request.url.path)
+        await asyncio.sleep(delays[n] if n < len(delays) else 0)
+        if request.url.path.endswith(":batchEmbedContents"):
+            return httpx.Response(200, json={"responses": [{"embedding": {"values": [float(n), 1.0]}}]})
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "stub answer"}]}}]})
+
+    return handler, calls
+
+@pytest.mark.asyncio
+async def test_embed_and_generate_reuse_one_client():
+    handler, calls = _stub_gemini([0, 0])
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        gemini = GeminiService(client=client)
+        assert await gemini.embed_query("q") == [0.0, 1.0]
+        assert await gemini.generate("q", "ctx") == "stub answer"
+    stats = gemini.stats()
+    assert stats["embed_query"]["count"] == 1
+    assert stats["generate"]["count"] == 1
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_hedged_query_embedding_takes_faster_reply():
+    handler, _calls = _stub_gemini([1.0, 0.0])
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        gemini = GeminiService(client=client, hedge_query=True)
+        vec = await gemini.embed_query("q")
+    assert vec == [1.0, 1.0]  # answered by the hedge (second call)
+    assert gemini.stats()["hedges"] == {"fired": 1, "won": 1}
+
+@pytest.mark.asyncio
+async def test_cancelled_hedged_query_cancels_the_request_in_flight():
+    cancelled = []
+
+    async def handler(request: httpx.Request):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(request.url.path)
+            raise
+        return httpx.Response(200, json={"responses": []})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        gemini = GeminiService(client=client, hedge_query=True)
+        caller = asyncio.ensure_future(gemini.embed_query("q"))
+        await asyncio.sleep(0.01)  # still waiting on the primary, before the hedge fires
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+    assert len(cancelled) == 1 and gemini.hedges_fired == 0
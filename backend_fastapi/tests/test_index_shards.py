@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from services import faiss_service
+from services.faiss_service import FaissService
+from services.index_shards import ShardedIndex, shard_files, shard_ranges
+
+PATHS = [f"pkg/mod{i}.py" for i in range(9)] + ["docs/guide.md"]
+
+def _data(n=1000, dim=16):
+    rng = np.random.default_rng(7)
+    V = rng.normal(size=(n, dim)).astype("float32")
+    V /= np.linalg.norm(V, axis=1, keepdims=True)
+    meta = [{"key": f"k{i}", "path": PATHS[i % len(PATHS)], "text": f"chunk {i}"} for i in range(n)]
+    return V, meta
+
+def test_shard_ranges_cover_ids_on_byte_boundaries():
+    ranges = shard_ranges(1000, 300)
+    assert ranges[0] == (0, 304) and ranges[-1][1] == 1000
+    assert all(lo % 8 == 0 and prev[1] == lo for prev, (lo, hi) in zip(ranges, ranges[1:]))
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["serve", "merge"])
+async def test_sharded_build_matches_single_index(tmp_path, monkeypatch, mode):
+    V, meta = _data()
+    flat = FaissService(base_dir=str(tmp_path / "flat"))
+    await flat.upsert("acme/mono", V, meta)
+
+    monkeypatch.setattr(faiss_service, "INDEX_SHARD_SIZE", 300)
+    monkeypatch.setattr(faiss_service, "INDEX_BUILD_PROCS", 2)
+    monkeypatch.setattr(faiss_service, "INDEX_SHARD_MODE", mode)
+    sharded = FaissService(base_dir=str(tmp_path / "sharded"))
+    await sharded.upsert("acme/mono", V, meta)
+    index = sharded._load("acme/mono")[0]
+    files = shard_files(sharded.base_dir, "acme__mono")
+    if mode == "serve":
+        assert isinstance(index, ShardedIndex) and len(index.shards) == len(files) == 4
+    else:
+        assert not isinstance(index, ShardedIndex) and files == []
+    assert index.ntotal == len(V)
+    assert sharded.catalog.get("acme/mono")["shards"] == (4 if mode == "serve" else 0)
+
+    for q, filters in ((V[3], None), (V[500], {"path_prefix": ["docs/"]}), (V[7], {"extension": [".py"]})):
+        want = await flat.search("acme/mono", q, 10, filters=filters)
+        got = await sharded.search("acme/mono", q, 10, filters=filters)
+        assert [h["_vec_index"] for h in got] == [h["_vec_index"] for h in want]
+
+    # a rebuild replaces the previous generation's shard files
+    await sharded.upsert("acme/mono", V[:900], meta[:900])
+    assert len(shard_files(sharded.base_dir, "acme__mono")) == (3 if mode == "serve" else 0)
+    sharded.delete("acme/mono")
+    assert shard_files(sharded.base_dir, "acme__mono") == [] and not sharded.has_index("acme/mono")
@@ -0,0 +1,27 @@
+import pytest
+from benchmarks.loadtest import parse_args, run_load
+from routers import ask, index
+
+@pytest.mark.asyncio
+async def test_loadtest_reports_per_endpoint_percentiles(tmp_path, monkeypatch):
+    # run_load rewires the routers' services to fakes; restore them afterwards
+    for rag in (ask.rag, index.rag):
+        for attr in ("gemini", "github", "faiss"):
+            monkeypatch.setattr(rag, attr, getattr(rag, attr))
+    args = parse_args([
+        "--concurrency", "4", "--duration", "0.3", "--repos", "1", "--repo-chunks", "50",
+        "--embed-latency", "0.001", "--gen-latency", "0.01", "--mix", "ask=1", "--quiet",
+    ])
+    report = await run_load(args, str(tmp_path))
+    step = report["steps"][0]
+    assert step["concurrency"] == 4
+    stats = step["endpoints"]["ask"]
+    assert stats["requests"] > 0 and stats["errors"] == 0
+    assert stats["p50_ms"] <= stats["p99_ms"]
+    assert "event_loop_lag" in step
+
+def test_url_without_repo_names_is_rejected(capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["--url", "http://rag.internal:8000"])
+    assert "--url requires --repo-names" in capsys.readouterr().err
+    assert parse_args(["--url", "http://rag.internal:8000", "--repo-names", "acme/api"]).repo_names == "acme/api"
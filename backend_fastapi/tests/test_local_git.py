@@ -0,0 +1,101 @@
+import asyncio
+import os
+import subprocess
+import git
+import pytest
+from services import local_git_service
+from services.faiss_service import FaissService
+from services.local_git_service import LocalGitService
+from services.mirror_watcher import MirrorWatcher
+from services.rag_service import RAGService
+
+class DummyGemini:
+    async def embed_texts(self, texts):
+        return [[float(len(t)), 1.0, 0.5] for t in texts]
+    async def embed_query(self, text):
+        return [1.0, 1.0, 0.5]
+    async def generate(self, question, context):
+        return "ok"
+
+def _git(cwd, *args):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+def _commit(work, files, msg):
+    for name, text in files.items():
+        path = work / name
+        if text is None:
+            _git(work, "rm", "-q", name)
+        else:
+            path.write_text(text)
+            _git(work, "add", name)
+    _git(work, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", msg)
+
+@pytest.fixture
+def mirror(tmp_path):
+    root = tmp_path / "mirrors"
+    work = root / "acme" / "widgets"
+    work.mkdir(parents=True)
+    _git(work, "init", "-q", "-b", "main")
+    _commit(work, {"README.md": "# Widgets\nBuild widgets.\n", "app.py": "def run():\n    return 1\n"}, "init")
+    return root, work
+
+@pytest.mark.asyncio
+async def test_local_mirror_incremental_reindex(mirror, tmp_path):
+    root, work = mirror
+    rag = RAGService()
+    rag.github = LocalGitService(root=str(root))
+    rag.gemini = DummyGemini()
+    rag.faiss = FaissService(base_dir=str(tmp_path / "vec"))
+
+    first = await rag.index_repo("acme/widgets")
+    assert first["note"] == "Indexed" and first["indexed"] == 2
+    assert (await rag.index_repo("acme/widgets"))["note"] == "No changes"
+
+    _commit(work, {"app.py": "def run():\n    return 2\n", "README.md": None, "new.py": "X = 1\n"}, "edit")
+    watcher = MirrorWatcher(rag, repos=["acme/widgets"], fetch=False)
+    res = (await watcher.poll_once())["acme/widgets"]
+    assert res["note"].startswith("Incremental") and res["updated"] == 2
+    paths = sorted(m["path"] for m in rag.faiss._load("acme/widgets")[1])
+    assert paths == ["app.py", "new.py"]
+    assert await watcher.poll_once() == {}
+
+@pytest.mark.asyncio
+async def test_reads_share_one_git_thread_and_a_bounded_set_of_repos(mirror, monkeypatch):
+    root, work = mirror
+    _commit(work, {f"m{i}.py": f"VALUE = {i}\n" for i in range(24)}, "many")
+    for name in ("a", "b", "c"):
+        _git(root / "acme", "clone", "-q", str(work), name)
+    src = LocalGitService(root=str(root))
+    head = await src.get_latest_commit("acme/widgets")
+    texts = await asyncio.gather(*(src.fetch_file("acme/widgets", f"m{i}.py", head) for i in range(24)))
+    assert texts == [f"VALUE = {i}\n" for i in range(24)]
+    assert len(src._git._threads) == 1
+
+    monkeypatch.setattr(local_git_service, "MAX_OPEN_REPOS", 2)
+    closed = []
+    monkeypatch.setattr(git.Repo, "close", lambda self: closed.append(self.working_dir))
+    for name in ("a", "b", "c"):
+        assert await src.get_latest_commit(f"acme/{name}") == head
+    assert list(src._repos) == ["acme/b", "acme/c"]
+    # Repo.__del__ closes again: count each repo once
+    assert list(dict.fromkeys(os.path.basename(p) for p in closed)) == ["widgets", "a"]
+
+@pytest.mark.asyncio
+async def test_watcher_records_head_of_mirror_with_nothing_to_index(mirror, tmp_path):
+    root, work = mirror
+    _commit(work, {"README.md": None, "app.py": None, "package-lock.json": "{}\n"}, "only a lockfile")
+    rag = RAGService()
+    rag.github = LocalGitService(root=str(root))
+    rag.gemini = DummyGemini()
+    rag.faiss = FaissService(base_dir=str(tmp_path / "vec"))
+    watcher = MirrorWatcher(rag, repos=["acme/widgets"], fetch=False)
+
+    res = (await watcher.poll_once())["acme/widgets"]
+    assert res["indexed"] == 0 and not rag.faiss.has_index("acme/widgets")
+    assert rag.faiss.catalog.get("acme/widgets")["head"] == res["head"]
+    assert await watcher.poll_once() == {}  # the head is recorded: no second full crawl
+    assert (await rag.index_repo("acme/widgets"))["note"] == "No changes"
+
+    _commit(work, {"app.py": "def run():\n    return 3\n"}, "code again")
+    res = (await watcher.poll_once())["acme/widgets"]
+    assert res["indexed"] == 1 and rag.faiss.has_index("acme/widgets")
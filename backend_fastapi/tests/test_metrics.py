@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+from main import app
+from utils.metrics import Histogram, STAGE_SECONDS
+
+def test_metrics_endpoint():
+    STAGE_SECONDS.observe(0.003, stage="mmr")
+    client = TestClient(app)
+    resp = client.get("/metrics/")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "# TYPE rag_stage_seconds histogram" in resp.text
+    assert 'rag_stage_seconds_count{stage="mmr"}' in resp.text
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+    h.observe(0.05, stage="x")
+    h.observe(0.5, stage="x")
+    h.observe(5.0, stage="x")
+    text = "\n".join(h.render())
+    assert 't_seconds_bucket{stage="x",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="x",le="1"} 2' in text
+    assert 't_seconds_bucket{stage="x",le="+Inf"} 3' in text
+    assert h.count(stage="x") == 3
@@ -0,0 +1,38 @@
+import pytest
+from services.near_dup import cluster_near_duplicates, minhash_signature
+
+LIB = "".join(f"def parse_{i}(value):\n    return int(value) * {i} + offset\n\n" for i in range(40))
+LIB_COPY = LIB.replace("* 7 +", "* 8 +")  # vendored copy with one local patch
+OTHER = "".join(f"class Table{i}:\n    name = 'table_{i}'\n    columns = ['id', 'created']\n\n" for i in range(40))
+
+def test_clusters_near_duplicates_only():
+    sim = (minhash_signature(LIB) == minhash_signature(LIB_COPY)).mean()
+    assert sim > 0.85 and (minhash_signature(LIB) == minhash_signature(OTHER)).mean() < 0.2
+    chunks = [{"path": p, "text": t, "tokens": 100, "line_start": 1, "line_end": 120}
+              for p, t in (("a/lib.py", LIB), ("b/lib.py", LIB_COPY), ("c/models.py", OTHER))]
+    reps, report = cluster_near_duplicates(chunks, 0.85)
+    assert [c["path"] for c in reps] == ["a/lib.py", "c/models.py"]
+    assert reps[0]["duplicates"] == [{"path": "b/lib.py", "line_start": 1, "line_end": 120}]
+    assert report["clusters"] == 1 and report["duplicates"] == 1 and report["tokens"] == 100
+    assert cluster_near_duplicates(chunks, 0) == (chunks, {"clusters": 0, "duplicates": 0, "tokens": 0, "bytes": 0})
+
+@pytest.mark.asyncio
+async def test_index_embeds_one_copy_and_keeps_members_citable(make_rag):
+    rag = make_rag({"a/lib.py": LIB, "b/lib.py": LIB_COPY, "c/models.py": OTHER})
+    res = await rag.index_repo("acme/dups")
+    dup = res["near_duplicates"]
+    assert dup["duplicates"] >= 1 and dup["vector_bytes"] == dup["duplicates"] * 3 * 4 * 2
+    assert rag.gemini.embedded == res["indexed"] < res["indexed"] + dup["duplicates"]
+    meta = rag.faiss._load("acme/dups")[1]
+    assert not any(m["path"] == "b/lib.py" for m in meta)
+
+    # the member path stays reachable through filters and citations
+    answer = await rag.answer_question("acme/dups", "how is a value parsed?", filters={"path_prefix": ["b/"]})
+    assert answer["citations"] and all(c["duplicates"] == ["b/lib.py"] for c in answer["citations"])
+
+    # rewriting the representative's file re-chunks the member too, so its content survives
+    rag.github.files["a/lib.py"] = "def main():\n    print('rewritten')\n"
+    res = await rag.index_repo("acme/dups")
+    paths = {m["path"] for m in rag.faiss._load("acme/dups")[1]}
+    assert paths == {"a/lib.py", "b/lib.py", "c/models.py"}
+    assert res["note"] == "Incremental: 2 changed paths"
@@ -1,5 +1,5 @@
-import numpy as np
 import pytest
+from services.faiss_service import FaissService
 from services.rag_service import RAGService
 
 class DummyGitHub:
@@ -25,6 +25,7 @@ async def test_rag_end_to_end(tmp_path):
     # inject dummies
     rag.github = DummyGitHub()
     rag.gemini = DummyGemini()
+    rag.faiss = FaissService(base_dir=str(tmp_path))  # keep the real VECTOR_DIR clean
     # index
     res = await rag.index_repo("owner/repo")
     assert res["indexed"] > 0
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi.testclient import TestClient
 from main import app
 
@@ -7,3 +8,45 @@ def test_repos():
     assert resp.status_code == 200
     data = resp.json()
     assert "repos" in data
+
+def test_repos_served_from_catalog(tmp_path, monkeypatch):
+    import json
+    import numpy as np
+    from routers import repos as repos_router
+    from services.catalog_service import RepoCatalog
+    from services.faiss_service import FaissService
+
+    fs = FaissService(base_dir=str(tmp_path))
+    meta = [{"key": f"a.py:{i}", "path": "a.py" if i < 2 else "b.py", "text": "x"} for i in range(3)]
+    asyncio.run(fs.upsert("acme/one", np.ones((3, 4), dtype="float32"), meta))
+    fs.save_state("acme/one", {"head": "abc123", "embedder": "gemini"})
+    monkeypatch.setattr(repos_router, "catalog", RepoCatalog(str(tmp_path)))
+
+    data = TestClient(app).get("/repos/").json()["repos"]
+    assert len(data) == 1
+    one = data[0]
+    assert (one["repo"], one["head"], one["chunks"], one["files"], one["dim"]) == ("acme/one", "abc123", 3, 2, 4)
+    assert one["index_type"] == "IndexFlatIP" and one["bytes"] > 0 and one["last_indexed"]
+
+    # an index directory from before the catalog existed is picked up once
+    (tmp_path / "catalog.json").unlink()
+    entry = RepoCatalog(str(tmp_path)).get("acme/one")
+    assert (entry["chunks"], entry["files"], entry["head"], entry["dim"]) == (3, 2, "abc123", 4)
+    assert json.loads((tmp_path / "catalog.json").read_text())["repos"]["acme/one"]["chunks"] == 3
+
+    fs.delete("acme/one")
+    assert RepoCatalog(str(tmp_path)).all() == {}
+
+def test_catalog_updates_from_several_processes_are_not_lost(tmp_path):
+    import os
+    import subprocess
+    import sys
+    from services.catalog_service import RepoCatalog
+
+    script = ("import sys\nfrom services.catalog_service import RepoCatalog\n"
+              "c = RepoCatalog(sys.argv[1])\n"
+              "for i in range(30):\n    c.update(f'w{sys.argv[2]}/r{i}', chunks=i)\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workers = [subprocess.Popen([sys.executable, "-c", script, str(tmp_path), str(w)], cwd=root) for w in range(4)]
+    assert [p.wait(timeout=60) for p in workers] == [0] * 4
+    assert len(RepoCatalog(str(tmp_path)).all()) == 4 * 30
@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+import config
+from main import app
+from routers import ask
+
+class DummyGemini:
+    async def embed_query(self, text):
+        return [0.1, 0.2, 0.3]
+
+def test_ask_returns_server_timing_and_debug(monkeypatch):
+    monkeypatch.setattr(ask.rag, "gemini", DummyGemini())
+    client = TestClient(app)
+    resp = client.post("/ask/", json={"repo": "nobody/not-indexed", "question": "q", "debug": True})
+    assert resp.status_code == 200
+    assert "query_embed;dur=" in resp.headers["server-timing"]
+    assert "query_embed" in resp.json()["debug"]["timings_ms"]
+
+def test_admin_profile_requires_token(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "")
+    assert client.post("/admin/profile?seconds=0.05").status_code == 404
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/admin/profile?seconds=0.05", headers={"X-Admin-Token": "nope"}).status_code == 403
+    resp = client.post("/admin/profile?seconds=0.05&mode=stack", headers={"X-Admin-Token": "s3cret"})
+    assert resp.status_code == 200
+    assert resp.text.startswith("# samples=")
@@ -0,0 +1,116 @@
+import asyncio
+import copy
+import hashlib
+import hmac
+import json
+from pathlib import Path
+import httpx
+import pytest
+import config
+from main import app
+from routers import webhooks
+from conftest import DictSource, FakeGemini
+from services.faiss_service import FaissService
+from services.webhook_service import PushReindexer, parse_push
+
+PAYLOAD = json.loads((Path(__file__).parent / "fixtures" / "github_push.json").read_text())
+SECRET = "s3cret"
+H1, H2, H3 = "1" * 40, "2" * 40, "4" * 40
+
+def _source():
+    return DictSource({"README.md": "# Hooks\nv1\n", "src/util.py": "def util():\n    return 1\n",
+                       "src/core.py": "def core():\n    return 0\n"}, head=H1)
+
+def _post(client, payload, event="push", secret=SECRET):
+    body = json.dumps(payload).encode()
+    sig = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return client.post("/webhooks/github", content=body,
+                       headers={"X-GitHub-Event": event, "X-Hub-Signature-256": sig, "Content-Type": "application/json"})
+
+def test_parse_push_marks_incomplete_payloads():
+    push = parse_push(PAYLOAD)
+    assert push["repo"] == "acme/hooks" and push["exact"]
+    assert push["paths"] == {"src/helpers.py", "src/util.py", "README.md"}
+    assert parse_push({**PAYLOAD, "ref": "refs/heads/feature"}) is None
+    assert not parse_push({**PAYLOAD, "forced": True})["exact"]
+    assert not parse_push({**PAYLOAD, "before": "0" * 40})["exact"]
+
+@pytest.mark.asyncio
+async def test_push_burst_is_debounced_into_one_delta_reindex(tmp_path, monkeypatch):
+    rag = webhooks.rag
+    src = _source()
+    monkeypatch.setattr(rag, "github", src)
+    monkeypatch.setattr(rag, "gemini", FakeGemini())
+    monkeypatch.setattr(rag, "embedder", None)
+    monkeypatch.setattr(rag, "faiss", FaissService(base_dir=str(tmp_path)))
+    monkeypatch.setattr(config, "GITHUB_WEBHOOK_SECRET", SECRET)
+    reindexer = PushReindexer(rag, debounce=0.05, max_delay=5)
+    monkeypatch.setattr(webhooks, "reindexer", reindexer)
+    await rag.index_repo("acme/hooks")
+
+    async def no_diff(*args):
+        raise AssertionError("push paths should replace the diff")
+    monkeypatch.setattr(rag, "_changed_paths", no_diff)
+
+    # two pushes land: the recorded one, then a follow-up touching another file
+    src.head = H3
+    src.files = {"README.md": "# Hooks\nv2\n", "src/helpers.py": "def util():\n    return 1\n",
+                 "src/core.py": "def core():\n    return 42\n"}
+    second = copy.deepcopy(PAYLOAD)
+    second.update(before=H2, after=H3)
+    second["commits"][0].update(added=[], removed=[], modified=["src/core.py"])
+
+    src.fetched.clear()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        assert (await _post(client, PAYLOAD, secret="wrong")).status_code == 403
+        assert (await _post(client, {"zen": "hi"}, event="ping")).json()["note"] == "pong"
+        first = await _post(client, PAYLOAD)
+        assert first.status_code == 202 and first.json()["queued"] and first.json()["paths"] == 3
+        body = (await _post(client, second)).json()
+        assert body["pushes"] == 2 and body["paths"] == 4
+        await reindexer.join()
+
+    result = reindexer.last_results["acme/hooks"]
+    assert result["head"] == H3 and result["note"] == "Incremental: 4 changed paths"
+    assert sorted(src.fetched) == ["README.md", "src/core.py", "src/helpers.py"]
+    assert result["reused"] == 1 and result["embedded"] == 2  # helpers.py keeps util.py's vector
+    paths = sorted({m["path"] for m in rag.faiss._load("acme/hooks")[1]})
+    assert paths == ["README.md", "src/core.py", "src/helpers.py"]
+
+@pytest.mark.asyncio
+async def test_webhook_and_index_endpoint_do_not_interleave(tmp_path, monkeypatch):
+    rag = webhooks.rag
+    src = _source()
+    running, overlapped = [], []
+    list_files = src.list_files
+    async def slow_list_files(repo, branch):
+        overlapped.append(bool(running))
+        running.append(branch)
+        await asyncio.sleep(0.05)  # a crawl long enough for the other run to start
+        running.remove(branch)
+        return await list_files(repo, branch)
+    src.list_files = slow_list_files
+    monkeypatch.setattr(rag, "github", src)
+    monkeypatch.setattr(rag, "gemini", FakeGemini())
+    monkeypatch.setattr(rag, "embedder", None)
+    monkeypatch.setattr(rag, "faiss", FaissService(base_dir=str(tmp_path)))
+    monkeypatch.setattr(config, "GITHUB_WEBHOOK_SECRET", SECRET)
+    reindexer = PushReindexer(rag, debounce=0, max_delay=5)
+    monkeypatch.setattr(webhooks, "reindexer", reindexer)
+    await rag.index_repo("acme/hooks")
+
+    src.head = H3
+    src.files = {"README.md": "# Hooks\nv2\n", "src/helpers.py": "def util():\n    return 1\n",
+                 "src/core.py": "def core():\n    return 0\n"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        pushed = await _post(client, PAYLOAD)
+        indexed = await client.post("/index/", json={"repo": "acme/hooks"})
+        await reindexer.join()
+    assert pushed.status_code == 202 and indexed.status_code == 200
+    assert not any(overlapped)
+    # whichever ran second saw the first one's state and had nothing left to do
+    notes = {indexed.json()["note"], reindexer.last_results["acme/hooks"]["note"]}
+    assert "No changes" in notes and rag.faiss.load_state("acme/hooks")["head"] == H3
+    assert sorted({m["path"] for m in rag.faiss._load("acme/hooks")[1]}) == ["README.md", "src/core.py", "src/helpers.py"]
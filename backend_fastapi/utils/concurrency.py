@@ -0,0 +1,147 @@
+"""Request coalescing and admission control for upstream-bound work.
+
+- ``SingleFlight``: concurrent calls with the same key share one in-flight computation.
+- ``KeyedLock``: calls with the same key run one after another (each does its own work).
+- ``ConcurrencyLimiter``: at most ``limit`` holders at once, FIFO queue behind them;
+  a waiter that cannot get a slot within ``max_wait`` (or finds ``max_queue`` ahead
+  of it) is shed with ``Overloaded`` so the caller can answer 503 + Retry-After fast.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Tuple
+
+from utils.metrics import COALESCED_REQUESTS, LIMITER_WAITING, SHED_REQUESTS
+from utils.timing import stage
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing past the wait budget; ``retry_after`` is in whole seconds."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is overloaded; retry after {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def _forget(self, key: Hashable, fut: asyncio.Future):
+        if self._calls.get(key) is fut:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run ``fn()`` once per key at a time; returns (result, shared).
+
+        The computation runs in its own task, so a caller that disconnects does not
+        cancel it for the others waiting on the same key.
+        """
+        loop = asyncio.get_running_loop()
+        fut = self._calls.get(key)
+        if fut is not None and fut.get_loop() is loop:
+            COALESCED_REQUESTS.inc(flight=self.name)
+            return await asyncio.shield(fut), True
+        fut = asyncio.ensure_future(fn())
+        self._calls[key] = fut
+        fut.add_done_callback(lambda f: self._forget(key, f))
+        return await asyncio.shield(fut), False
+
+
+class KeyedLock:
+    """One ``asyncio.Lock`` per key, dropped again once nobody holds or waits on it."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        lock, users = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, name: str, limit: int, max_wait: float, max_queue: int):
+        self.name = name
+        self.limit = limit          # <= 0: unlimited
+        self.max_wait = max_wait    # <= 0: wait indefinitely
+        self.max_queue = max_queue  # <= 0: unbounded queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._hold = 0.0  # EWMA of slot hold time, for Retry-After
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Rough time until the queue ahead drains: hold time x queue depth / slots."""
+        if self.limit <= 0:
+            return 1
+        return max(1, math.ceil(self._hold * (self.waiting + 1) / self.limit))
+
+    def _shed(self):
+        SHED_REQUESTS.inc(limiter=self.name)
+        raise Overloaded(self.name, self.retry_after())
+
+    async def _acquire(self):
+        if self.limit <= 0 or (self.active < self.limit and not self._waiters):
+            self.active += 1
+            return
+        if 0 < self.max_queue <= len(self._waiters):
+            self._shed()
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        LIMITER_WAITING.set(len(self._waiters), limiter=self.name)
+        try:
+            with stage(f"{self.name}_queue"):
+                if self.max_wait > 0:
+                    await asyncio.wait_for(fut, self.max_wait)
+                else:
+                    await fut
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                return  # the slot was handed over as the timeout fired: keep it
+            self._shed()
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release()  # handed a slot we can no longer use
+            raise
+        finally:
+            try:
+                self._waiters.remove(fut)
+            except ValueError:
+                pass
+            LIMITER_WAITING.set(len(self._waiters), limiter=self.name)
+
+    def _release(self):
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)  # hand the slot straight to the next waiter
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - t0
+            self._hold = 0.8 * self._hold + 0.2 * held if self._hold else held
+            self._release()
@@ -0,0 +1,57 @@
+"""Bounded thread pool for CPU- and disk-bound work (FAISS, NumPy, index files).
+
+Coroutines hand blocking calls to ``run_blocking`` so the event loop keeps serving
+other requests; FAISS and NumPy release the GIL in their kernels, so concurrent
+queries use several cores. The caller's context is copied into the worker, which
+keeps ``stage()`` spans attached to the request that started them.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import CPU_WORKERS, FAISS_OMP_THREADS
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def configure_faiss_threads(n: int = FAISS_OMP_THREADS):
+    """Cap OpenMP threads per FAISS call; with several pool workers, more would oversubscribe the cores."""
+    if n <= 0:
+        return
+    try:
+        import faiss
+    except ImportError:
+        return
+    faiss.omp_set_num_threads(n)
+    logger.info("FAISS OpenMP threads per call: %d (cpu workers: %d)", n, CPU_WORKERS)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            configure_faiss_threads()
+            _executor = ThreadPoolExecutor(max_workers=max(1, CPU_WORKERS), thread_name_prefix="cpu")
+        return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run ``fn(*args, **kwargs)`` on the CPU pool and await its result."""
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+
+def shutdown_executor():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -0,0 +1,183 @@
+"""Minimal in-process metrics registry rendered in the Prometheus text format.
+
+Kept dependency-free and lock-light so it can stay enabled in production:
+every update is a dict lookup plus an add under a per-metric lock.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Latency buckets (seconds) spanning sub-millisecond NumPy work to multi-second LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str):
+        super().__init__(name, doc)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        lines += [f"{self.name}{_fmt_labels(k)} {_fmt_num(v)}" for k, v in items]
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = float(value)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(_key(labels), None)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        k = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(k)
+            if row is None:
+                row = self._values[k] = [0.0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels) -> int:
+        row = self._values.get(_key(labels))
+        return int(row[-1]) if row else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for k, row in items:
+            cum = 0.0
+            for b, c in zip(self.buckets, row):
+                cum += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(k, (('le', _fmt_num(b)),))} {_fmt_num(cum)}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(k, (('le', '+Inf'),))} {_fmt_num(row[-1])}")
+            lines.append(f"{self.name}_sum{_fmt_labels(k)} {_fmt_num(row[-2])}")
+            lines.append(f"{self.name}_count{_fmt_labels(k)} {_fmt_num(row[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "rag_stage_seconds",
+    "Time spent per pipeline stage (query_embed, index_load, faiss_search, mmr, context_pack, generate, crawl, chunk, embed, upsert).",
+))
+CHUNKS_PROCESSED: Counter = REGISTRY.register(Counter("rag_chunks_processed_total", "Chunks produced by indexing."))
+FILES_PROCESSED: Counter = REGISTRY.register(Counter("rag_files_processed_total", "Files fetched and chunked by indexing."))
+TOKENS_PROCESSED: Counter = REGISTRY.register(Counter("rag_tokens_processed_total", "Tokens chunked by indexing."))
+EMBEDDING_CALLS: Counter = REGISTRY.register(Counter("rag_embedding_calls_total", "Upstream embedding requests."))
+CACHE_HITS: Counter = REGISTRY.register(Counter("rag_cache_hits_total", "Cache hits by cache name."))
+UPSTREAM_ERRORS: Counter = REGISTRY.register(Counter("rag_upstream_errors_total", "Failed upstream calls by service."))
+INDEX_MEMORY_BYTES: Gauge = REGISTRY.register(Gauge("rag_index_memory_bytes", "Approximate memory held by the loaded index per repo."))
+COALESCED_REQUESTS: Counter = REGISTRY.register(Counter("rag_coalesced_requests_total", "Requests served by joining an identical in-flight computation."))
+SHED_REQUESTS: Counter = REGISTRY.register(Counter("rag_shed_requests_total", "Requests rejected with 503 because the limiter queue was over budget."))
+LIMITER_WAITING: Gauge = REGISTRY.register(Gauge("rag_limiter_waiting", "Callers queued for a limiter slot."))
+FILES_SKIPPED: Counter = REGISTRY.register(Counter("rag_files_skipped_total", "Files left out of indexing by reason (vendored, lockfile, minified, ...)."))
+NEAR_DUP_CHUNKS: Counter = REGISTRY.register(Counter("rag_near_duplicate_chunks_total", "Chunks folded into a near-duplicate representative instead of being embedded."))
+BYTES_SKIPPED: Counter = REGISTRY.register(Counter("rag_bytes_skipped_total", "Bytes of skipped files by reason."))
+WEBHOOK_EVENTS: Counter = REGISTRY.register(Counter("rag_webhook_events_total", "Webhook deliveries by event and outcome (queued, ignored, rejected)."))
+CONTEXT_TOKENS_SAVED: Histogram = REGISTRY.register(Histogram(
+    "rag_context_tokens_saved",
+    "Prompt tokens removed per question by context compression.",
+    buckets=(0, 100, 250, 500, 1000, 2000, 4000, 8000),
+))
+RETRIEVAL_DEPTH: Histogram = REGISTRY.register(Histogram(
+    "rag_retrieval_depth",
+    "Chunks passed to generation per question, by retrieval strategy.",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 20),
+))
+CONTEXT_TOKENS: Histogram = REGISTRY.register(Histogram(
+    "rag_context_tokens",
+    "Context tokens sent to generation per question, by retrieval strategy.",
+    buckets=(250, 500, 1000, 1500, 2000, 2500, 3000, 3500, 5000),
+))
@@ -0,0 +1,78 @@
+"""On-demand profilers for a live worker: cProfile of the event-loop thread, or a sampling stack profile."""
+import asyncio
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+async def profile_cprofile(seconds: float, limit: int = 60) -> str:
+    """Deterministic profile of everything the event loop runs for `seconds`; pstats text sorted by cumtime."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            prof.disable()
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+    finally:
+        _busy.release()
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def _sample(seconds: float, interval: float, skip_thread: int) -> Dict:
+    stacks: Counter = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for tid, frame in sys._current_frames().items():
+            if tid != skip_thread:
+                stacks[_collapse(frame)] += 1
+        samples += 1
+        time.sleep(interval)
+    return {"samples": samples, "stacks": stacks}
+
+
+async def profile_stacks(seconds: float, interval: float = 0.005, limit: int = 200) -> str:
+    """Sample every thread's stack; returns collapsed stacks ("a;b;c count") ready for flamegraph tools."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        sampler = {}
+
+        def run():
+            sampler.update(_sample(seconds, interval, threading.get_ident()))
+
+        # Sample from a helper thread so the event loop keeps serving the traffic being profiled
+        t = threading.Thread(target=run, name="stack-sampler", daemon=True)
+        t.start()
+        while t.is_alive():
+            await asyncio.sleep(min(0.05, seconds))
+        lines = [f"# samples={sampler.get('samples', 0)} interval={interval}s"]
+        lines += [f"{stack} {count}" for stack, count in sampler.get("stacks", Counter()).most_common(limit)]
+        return "\n".join(lines) + "\n"
+    finally:
+        _busy.release()
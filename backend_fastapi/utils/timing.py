@@ -0,0 +1,89 @@
+"""Per-request span timings, exported as a Server-Timing header and into /metrics."""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import STAGE_SECONDS
+
+
+class Timings:
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []  # (name, milliseconds)
+
+    def add(self, name: str, ms: float):
+        self.spans.append((name, ms))
+
+    def as_dict(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for name, ms in self.spans:
+            out[name] = round(out.get(name, 0.0) + ms, 3)
+        return out
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.as_dict().items())
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[Timings]:
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Reuse the request's Timings if one is active, otherwise start a fresh one."""
+    timings = _current.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage: recorded as a request span and in the rag_stage_seconds histogram."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed * 1000.0)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware that opens a Timings per HTTP request and emits it as `Server-Timing`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = Timings()
+        token = _current.set(timings)
+        t0 = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings.spans:
+                total = f"total;dur={(time.perf_counter() - t0) * 1000.0:.1f}"
+                value = f"{timings.header()}, {total}"
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)